@@ -0,0 +1,67 @@
+"""
+Microbenchmark of the static template tag.
+
+Renders a template with many static tags, with and without the URL cache of
+the tag, in a temporary project without running transpile first.
+Usage::
+    python benchmarks/static_tag.py [--tags 50] [--renders 2000]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--renders", type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    project_path = tempfile.mkdtemp()
+    settings.configure(
+        PROJECT_PATH=project_path,
+        INSTALLED_APPS=["django.contrib.staticfiles", "npm_mjs"],
+        STATIC_URL="/static/",
+        STATIC_ROOT=os.path.join(project_path, "static-collected"),
+        TEMPLATES=[{"BACKEND": "django.template.backends.django.DjangoTemplates"}],
+    )
+    django.setup()
+
+    from django.template import engines
+
+    from npm_mjs.templatetags import transpile
+
+    template = engines["django"].from_string(
+        "{% load transpile %}"
+        + "".join(
+            '<script src="{%% static "js/entry%d.mjs" %%}"></script>' % number
+            for number in range(args.tags)
+        ),
+    )
+    results = {}
+    for enabled in (False, True):
+        settings.TRANSPILE_STATIC_URL_CACHE = enabled
+        transpile._urls.values.clear()
+        template.render({})
+        start = time.perf_counter()
+        for _number in range(args.renders):
+            template.render({})
+        results[enabled] = (time.perf_counter() - start) / args.renders
+        sys.stdout.write(
+            "URL cache %s: %.1f µs per render of %d tags\n"
+            % ("on" if enabled else "off", results[enabled] * 1e6, args.tags),
+        )
+    sys.stdout.write("Speedup: %.1fx\n" % (results[False] / results[True]))
+    shutil.rmtree(project_path)
+
+
+if __name__ == "__main__":
+    main()
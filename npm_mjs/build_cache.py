@@ -0,0 +1,135 @@
+"""
+Content-addressed cache of finished transpile outputs.
+
+The key of a build is a digest of everything that goes into it: the rspack
+config, the npm dependencies and the content of all staged sources. The
+outputs of a full build are stored in a folder named after that key, so a
+later build with the same key, for example on a fresh checkout or another CI
+node sharing the cache folder, can restore them without starting rspack.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from .utils import copy_file
+from .utils import hash_file
+from .utils import make_temp_dir
+
+
+def get_build_key(
+    config_digest: str,
+    entries: dict[str, str],
+    staged: dict[str, str],
+    package_hash: str,
+    lockfile_path: str,
+) -> str:
+    """
+    Return the key of a build.
+
+    Args:
+        config_digest: Digest of the rendered rspack config
+        entries: Entry name -> path of the entry file in the staging dir
+        staged: Path in the staging dir -> content hash of every staged file
+        package_hash: Digest of the package.json files of all apps
+        lockfile_path: Path of the lockfile written by the package manager
+    """
+    key = hashlib.sha256()
+    key.update(config_digest.encode())
+    key.update(json.dumps(entries, sort_keys=True).encode())
+    key.update(json.dumps(staged, sort_keys=True).encode())
+    key.update(package_hash.encode())
+    if os.path.isfile(lockfile_path):
+        key.update(hash_file(lockfile_path).encode())
+    return key.hexdigest()
+
+
+class BuildCache:
+    """
+    Usage::
+        cache = BuildCache(cache_dir)
+        meta = cache.restore(key, out_dir)
+        if meta is None:
+            ...  # build
+            cache.store(key, out_dir, {"version": version})
+    """
+
+    def __init__(self, path: str, max_entries: int = 5):
+        self.path = path
+        self.max_entries = max_entries
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    def restore(self, key: str, out_dir: str) -> dict | None:
+        """
+        Copy the outputs stored under key into out_dir, which must be empty.
+        Returns the metadata stored with the outputs or None on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(os.path.join(entry_path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        files_path = os.path.join(entry_path, "files")
+        for root, _dirnames, filenames in os.walk(files_path):
+            out_root = os.path.join(out_dir, os.path.relpath(root, files_path))
+            os.makedirs(out_root, exist_ok=True)
+            for filename in filenames:
+                copy_file(
+                    os.path.join(root, filename),
+                    os.path.join(out_root, filename),
+                )
+        # Mark the entry as recently used.
+        os.utime(entry_path)
+        return meta
+
+    def store(self, key: str, out_dir: str, meta: dict) -> None:
+        """Store the content of out_dir and meta under key."""
+        entry_path = self._entry_path(key)
+        if os.path.exists(entry_path):
+            os.utime(entry_path)
+            return
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = make_temp_dir(entry_path)
+        try:
+            shutil.copytree(
+                out_dir,
+                os.path.join(tmp_path, "files"),
+                copy_function=copy_file,
+            )
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        try:
+            # Renaming is atomic, so other processes sharing the cache never
+            # see a partially written entry.
+            os.rename(tmp_path, entry_path)
+        except OSError:
+            # Another process has stored the same key in the meantime.
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.prune()
+
+    def prune(self) -> None:
+        """Remove the least recently used entries beyond max_entries."""
+        entries = []
+        for prefix in os.listdir(self.path):
+            prefix_path = os.path.join(self.path, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for name in os.listdir(prefix_path):
+                if name.endswith(".tmp"):
+                    continue
+                entry_path = os.path.join(prefix_path, name)
+                try:
+                    entries.append((os.stat(entry_path).st_mtime, entry_path))
+                except OSError:
+                    continue
+        entries.sort(reverse=True)
+        max_entries = self.max_entries
+        for _mtime, entry_path in entries[max_entries:]:
+            shutil.rmtree(entry_path, ignore_errors=True)
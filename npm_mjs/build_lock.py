@@ -0,0 +1,192 @@
+"""
+Lock that keeps concurrent transpile and npm_install runs apart.
+
+Several containers or CI jobs that share a project volume can start
+transpile at the same time. Without coordination, they would all rebuild
+static-transpile and .transpile/js at once. Every run therefore holds an
+advisory lock on a file in the .transpile folder. A second run waits until
+the first has finished and then finds nothing left to do, as the sources,
+the npm dependencies and the outputs are up to date. The lock is released
+by the operating system when its process exits, so there are no stale locks
+to clean up. The process that holds it records who it is in the lock file,
+so that waiting runs can say what they are waiting for.
+
+The lock is reentrant within a process, so that transpile can run
+npm_install while it holds it.
+"""
+
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no advisory locks, so runs are not kept apart there.
+    fcntl = None
+
+# Paths of the locks held by this process
+_held = set()
+
+
+class LockTimeout(Exception):
+    """The lock is held by another process for longer than the timeout."""
+
+    def __init__(self, holder: dict, timeout: float | None):
+        super().__init__(holder, timeout)
+        self.holder = holder
+        self.timeout = timeout
+
+    def __str__(self):
+        return describe_holder(self.holder)
+
+
+def describe_holder(holder: dict) -> str:
+    if not holder:
+        return "another process"
+    command = holder.get("command", "unknown")
+    return f"{command} (pid {holder.get('pid', '?')} on {holder.get('host', '?')})"
+
+
+def read_holder(path: str) -> dict:
+    """Return what the process that holds the lock at path recorded."""
+    try:
+        with open(path) as f:
+            holder = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return holder if isinstance(holder, dict) else {}
+
+
+def try_lock(lock_file) -> bool:
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+@contextmanager
+def build_lock(
+    path: str,
+    command: str,
+    timeout: float | None = None,
+    wait: bool = True,
+    on_wait=None,
+):
+    """
+    Hold the lock at path while the block runs.
+
+    If another process holds it, wait up to timeout seconds, or forever if
+    timeout is None, and call on_wait(holder) once before waiting. Raises
+    LockTimeout if the lock cannot be taken in time, or right away if wait
+    is False.
+    """
+    if path in _held or not fcntl:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, "a+")
+    try:
+        if not try_lock(lock_file):
+            holder = read_holder(path)
+            if not wait:
+                raise LockTimeout(holder, 0)
+            if on_wait:
+                on_wait(holder)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not try_lock(lock_file):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LockTimeout(read_holder(path), timeout)
+                time.sleep(0.2)
+        lock_file.seek(0)
+        lock_file.truncate()
+        json.dump(
+            {
+                "command": command,
+                "pid": os.getpid(),
+                "host": socket.gethostname(),
+                "started": time.time(),
+            },
+            lock_file,
+        )
+        lock_file.flush()
+        _held.add(path)
+        try:
+            yield
+        finally:
+            _held.discard(path)
+            lock_file.truncate(0)
+    finally:
+        # Closing the file releases the lock.
+        lock_file.close()
+
+
+def add_lock_arguments(parser):
+    parser.add_argument(
+        "--lock-timeout",
+        type=float,
+        dest="lock_timeout",
+        default=None,
+        help="Seconds to wait for another transpile or npm_install run to "
+        "finish (default: TRANSPILE_LOCK_TIMEOUT or 1800).",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_false",
+        dest="lock_wait",
+        default=True,
+        help="Fail right away if another transpile or npm_install run is "
+        "in progress.",
+    )
+
+
+@contextmanager
+def hold_build_lock(command, options, stdout):
+    """
+    Hold the build lock while the block runs. Raises CommandError if another
+    run holds it for too long.
+    """
+    # npm_mjs.paths needs the Django settings, unlike the rest of this module.
+    from .paths import BUILD_LOCK_PATH
+
+    timeout = options.get("lock_timeout")
+    if timeout is None:
+        timeout = getattr(settings, "TRANSPILE_LOCK_TIMEOUT", 1800)
+    started = time.monotonic()
+    waited = False
+
+    def on_wait(holder):
+        nonlocal waited
+        waited = True
+        stdout.write("Waiting for %s to finish..." % describe_holder(holder))
+
+    try:
+        with build_lock(
+            BUILD_LOCK_PATH,
+            command,
+            timeout,
+            options.get("lock_wait", True),
+            on_wait,
+        ):
+            if waited:
+                # The other run has most likely done the work already, which
+                # the checks that follow will find.
+                stdout.write(
+                    "Waited %.1f seconds for the build lock."
+                    % (time.monotonic() - started),
+                )
+            yield
+    except LockTimeout as e:
+        if not options.get("lock_wait", True):
+            raise CommandError("%s is already running." % describe_holder(e.holder))
+        raise CommandError(
+            "Gave up after waiting %g seconds for %s to finish. Use "
+            "--lock-timeout or TRANSPILE_LOCK_TIMEOUT to wait longer."
+            % (e.timeout, describe_holder(e.holder)),
+        )
@@ -0,0 +1,204 @@
+"""
+Analysis of the stats that rspack writes after a build.
+
+The rspack config writes the entrypoints, chunks and modules of a build to
+.transpile/stats.json, one file per rspack process. From these, the size of
+every entry and chunk is measured on disk, raw and gzipped, the largest
+modules are listed and npm packages that end up in the outputs more than
+once are found: either because different versions of them are installed or
+because several chunks contain the same module of them. The sizes of the
+entries can be checked against budgets set in TRANSPILE_SIZE_BUDGETS.
+"""
+
+import gzip
+import json
+import os
+import re
+
+from .versioning import replace_all
+
+PACKAGE_RE = re.compile(r"node_modules/((?:@[^/]+/)?[^/]+)/")
+
+# pnpm installs every package at .pnpm/<name>@<version>/node_modules/<name>
+PNPM_VERSION_RE = re.compile(r"\.pnpm/[^/]+?@([^/_(]+)[^/]*/node_modules/$")
+
+
+def format_size(size: float) -> str:
+    for unit in ["bytes", "KiB", "MiB"]:
+        if size < 1024 or unit == "MiB":
+            break
+        size /= 1024
+    return ("%d %s" if unit == "bytes" else "%.1f %s") % (size, unit)
+
+
+def load_stats(paths: list[str]) -> list[dict]:
+    """Return the stats written by the rspack processes of a build."""
+    stats_list = []
+    for path in sorted(paths):
+        try:
+            with open(path) as f:
+                stats_list.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return stats_list
+
+
+def get_package(module_name: str) -> tuple[str, str] | None:
+    """
+    Return the npm package that the module module_name belongs to and the
+    installed copy of it, which is its version if that is known. Returns None
+    for modules that are not part of an npm package.
+    """
+    matches = list(PACKAGE_RE.finditer(module_name))
+    if not matches:
+        return None
+    # The innermost node_modules folder is the package of the module.
+    match = matches[-1]
+    location = module_name[: match.end()]
+    version = PNPM_VERSION_RE.search(location[: match.start(1)])
+    return match.group(1), version.group(1) if version else location
+
+
+def flatten_modules(modules: list[dict], chunks=None):
+    """
+    Yield all modules, replacing modules that rspack has concatenated with
+    the modules that they consist of.
+    """
+    for module in modules:
+        module_chunks = module.get("chunks", chunks or [])
+        if module.get("modules"):
+            yield from flatten_modules(module["modules"], module_chunks)
+        else:
+            yield {**module, "chunks": module_chunks}
+
+
+class FileSizes:
+    """Raw and gzipped sizes of the files in out_dir, each measured once."""
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.sizes: dict[str, tuple[int, int]] = {}
+
+    def get(self, files: list[str]) -> tuple[int, int]:
+        size = gzip_size = 0
+        for file in files:
+            if file not in self.sizes:
+                try:
+                    with open(os.path.join(self.out_dir, file), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    data = b""
+                self.sizes[file] = (len(data), len(gzip.compress(data)))
+            size += self.sizes[file][0]
+            gzip_size += self.sizes[file][1]
+        return size, gzip_size
+
+
+def analyze_stats(
+    stats_list: list[dict],
+    out_dir: str,
+    replacements=(),
+    top: int = 10,
+) -> dict:
+    """
+    Analyze the stats of the rspack processes of a build with its outputs in
+    out_dir. replacements are applied to the file names in the stats, for
+    outputs that have been renamed since rspack wrote them.
+    """
+    file_sizes = FileSizes(out_dir)
+    entries = {}
+    chunks = []
+    modules = []
+    packages = {}
+    for number, stats in enumerate(stats_list):
+        chunk_entries = {}
+        for name, entrypoint in stats.get("entrypoints", {}).items():
+            files = [
+                replace_all(
+                    asset["name"] if isinstance(asset, dict) else asset,
+                    replacements,
+                )
+                for asset in entrypoint.get("assets", [])
+            ]
+            files = [x for x in files if not x.endswith(".map")]
+            size, gzip_size = file_sizes.get(files)
+            entries[name] = {"files": files, "size": size, "gzip": gzip_size}
+            for chunk_id in entrypoint.get("chunks", []):
+                chunk_entries.setdefault(chunk_id, set()).add(name)
+        for chunk in stats.get("chunks", []):
+            files = [
+                replace_all(x, replacements)
+                for x in chunk.get("files", [])
+                if not x.endswith(".map")
+            ]
+            size, gzip_size = file_sizes.get(files)
+            chunks.append(
+                {
+                    "names": chunk.get("names", []),
+                    "files": files,
+                    "size": size,
+                    "gzip": gzip_size,
+                    "entries": sorted(chunk_entries.get(chunk.get("id"), [])),
+                },
+            )
+        for module in flatten_modules(stats.get("modules", [])):
+            name = module.get("name", "")
+            modules.append({"name": name, "size": module.get("size", 0)})
+            package = get_package(name)
+            if not package:
+                continue
+            info = packages.setdefault(
+                package[0],
+                {"copies": set(), "modules": {}, "entries": set()},
+            )
+            info["copies"].add(package[1])
+            module_chunks = info["modules"].setdefault(
+                module.get("identifier", name),
+                set(),
+            )
+            for chunk_id in module["chunks"]:
+                # Chunk ids are only unique within one rspack process.
+                module_chunks.add((number, chunk_id))
+                info["entries"].update(chunk_entries.get(chunk_id, []))
+    modules.sort(key=lambda x: x["size"], reverse=True)
+    return {
+        "entries": entries,
+        "chunks": chunks,
+        "largest_modules": modules[:top],
+        "duplicates": {
+            name: {
+                "copies": sorted(info["copies"]),
+                "entries": sorted(info["entries"]),
+            }
+            for name, info in sorted(packages.items())
+            if len(info["copies"]) > 1
+            or any(len(x) > 1 for x in info["modules"].values())
+        },
+    }
+
+
+def check_budgets(entries: dict, budgets: dict) -> list[str]:
+    """
+    Return a message for every entry that is larger than its budget. A
+    budget is a number of bytes or a dict with the raw "size" and the "gzip"
+    size.
+    """
+    messages = []
+    for name, budget in sorted(budgets.items()):
+        if name not in entries:
+            continue
+        if not isinstance(budget, dict):
+            budget = {"size": budget}
+        for key, label in (("size", ""), ("gzip", " gzipped")):
+            limit = budget.get(key)
+            if limit is not None and entries[name][key] > limit:
+                messages.append(
+                    "%s is %s%s, which exceeds its budget of %s"
+                    % (
+                        name,
+                        format_size(entries[name][key]),
+                        label,
+                        format_size(limit),
+                    ),
+                )
+    return messages
@@ -0,0 +1,177 @@
+"""
+Precompressed copies of the transpile outputs.
+
+Web servers such as nginx (gzip_static, brotli_static) can serve a file
+from a compressed copy next to it instead of compressing it on every
+request. Every output file above a minimum size gets such a copy for every
+enabled format. gzip is always available, brotli needs the brotli package
+and zstd the zstandard package or Python 3.14. The files are compressed in
+a process pool. The compressed data is also kept in .transpile/compressed by
+content hash, so a file that did not change since the last build is not
+compressed again.
+"""
+
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import copy_file
+from .utils import replacing
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        import zstandard as zstd
+    except ImportError:
+        zstd = None
+
+# Format -> file extension of the compressed copy
+FORMATS = {"gzip": ".gz", "brotli": ".br", "zstd": ".zst"}
+
+SIDECAR_EXTENSIONS = tuple(FORMATS.values())
+
+COMPRESSIBLE_EXTENSIONS = (".js", ".mjs", ".map", ".css", ".json")
+
+
+def get_available_formats() -> list[str]:
+    formats = ["gzip"]
+    if brotli:
+        formats.append("brotli")
+    if zstd:
+        formats.append("zstd")
+    return formats
+
+
+def get_formats(setting) -> list[str]:
+    """
+    Return the formats selected by the TRANSPILE_COMPRESS setting: True for
+    all available formats or a list of format names. Raises ValueError for
+    unknown or unavailable formats.
+    """
+    if not setting:
+        return []
+    if setting is True:
+        return get_available_formats()
+    formats = list(setting)
+    for name in formats:
+        if name not in FORMATS:
+            raise ValueError("Unknown compression format: %s" % name)
+        if name not in get_available_formats():
+            raise ValueError(
+                "Compression with %s needs the %s package."
+                % (name, "brotli" if name == "brotli" else "zstandard"),
+            )
+    return formats
+
+
+def compress(data: bytes, name: str) -> bytes:
+    if name == "gzip":
+        # Without a timestamp, the same input always gives the same output.
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if name == "brotli":
+        return brotli.compress(data, quality=11)
+    if hasattr(zstd, "ZstdCompressor"):
+        return zstd.ZstdCompressor(level=19).compress(data)
+    return zstd.compress(data, level=19)
+
+
+def compress_file(path: str, formats: list[str], cache_path: str) -> None:
+    """
+    Write a compressed copy of the file at path for every format to
+    cache_path with the extension of the format.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    for name in formats:
+        compressed_path = cache_path + FORMATS[name]
+        with replacing(compressed_path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(compress(data, name))
+
+
+def remove_sidecars(out_dir: str, keep: set[str]) -> None:
+    """
+    Remove the compressed copies in out_dir that are not in keep, such as
+    those of files that no longer exist.
+    """
+    for root, _dirnames, filenames in os.walk(out_dir):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if (
+                filename.endswith(SIDECAR_EXTENSIONS)
+                and os.path.relpath(path, out_dir) not in keep
+            ):
+                os.remove(path)
+
+
+def compress_outputs(
+    out_dir: str,
+    files: dict[str, dict],
+    formats: list[str],
+    cache_dir: str,
+    min_size: int = 1024,
+    jobs: int | None = None,
+) -> dict[str, dict]:
+    """
+    Write compressed copies of the files in out_dir, which are given by their
+    path relative to out_dir along with their "hash" and "size".
+
+    The compressed data is kept in cache_dir by content hash, so files that
+    are unchanged since the last build, even if the output dir has been
+    rebuilt from scratch, are not compressed again. Returns the size of the
+    copies of every file, by format, and whether they were reused.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    selected = {}
+    pending = {}
+    for name, file_info in sorted(files.items()):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or file_info["size"] < min_size:
+            continue
+        cache_path = os.path.join(cache_dir, file_info["hash"])
+        selected[name] = cache_path
+        if not all(os.path.isfile(cache_path + FORMATS[x]) for x in formats):
+            pending.setdefault(cache_path, os.path.join(out_dir, name))
+    if len(pending) > 1 and jobs != 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(
+                executor.map(
+                    compress_file,
+                    pending.values(),
+                    [formats] * len(pending),
+                    pending.keys(),
+                ),
+            )
+    else:
+        for cache_path, path in pending.items():
+            compress_file(path, formats, cache_path)
+    results = {}
+    for name, cache_path in selected.items():
+        sizes = {}
+        for x in formats:
+            sidecar_path = os.path.join(out_dir, name + FORMATS[x])
+            size = os.path.getsize(cache_path + FORMATS[x])
+            if (
+                not os.path.isfile(sidecar_path)
+                or os.path.getsize(sidecar_path) != size
+            ):
+                copy_file(cache_path + FORMATS[x], sidecar_path)
+            sizes[x] = size
+        results[name] = {"sizes": sizes, "reused": cache_path not in pending}
+    remove_sidecars(
+        out_dir,
+        {name + FORMATS[x] for name in results for x in formats},
+    )
+    # Only the compressed data of the current outputs is kept.
+    keep = {
+        os.path.basename(x) + FORMATS[y] for x in selected.values() for y in formats
+    }
+    for filename in os.listdir(cache_dir):
+        if filename not in keep:
+            os.remove(os.path.join(cache_dir, filename))
+    return results
@@ -0,0 +1,108 @@
+"""
+Discovery of the JavaScript entries and sources of all Django apps.
+
+The static js folders are read once by the source index. The files found
+below each folder are then classified by the kind of folder they were found
+in rather than by substrings of their paths.
+"""
+
+import os
+
+from .source_index import Changes
+from .source_index import SourceIndex
+
+SOURCE_ROOT = ("static", "js")
+LIB_ROOT = ("static-libs", "js")
+
+# Metadata of a plugin module, which lazy plugin indexes include
+PLUGIN_META_SUFFIX = ".meta.json"
+
+
+def get_root_kind(root: str) -> tuple[str, str]:
+    """Return the last two components of the folder root."""
+    parent, name = os.path.split(os.path.normpath(root))
+    return os.path.basename(parent), name
+
+
+class Discovery:
+    """
+    The result of discovering the JavaScript files in js_paths.
+
+    Attributes:
+        entries: Paths of all *.mjs entry files
+        sources: Paths of all JavaScript files in static/js folders
+        lib_sources: Paths of all JavaScript files in static-libs/js folders
+        staged_files: Path inside the staging dir -> source path. Files in
+            static/js override files in static-libs/js and files of apps
+            mentioned earlier in js_paths are overridden by later ones.
+        plugin_dirs: Plugin dir inside the staging dir -> module names
+        plugin_meta: Plugin dir inside the staging dir -> names of the
+            modules that have a metadata file
+        changes: Files added, changed or removed since the last scan
+    """
+
+    def __init__(self):
+        self.entries: list[str] = []
+        self.sources: list[str] = []
+        self.lib_sources: list[str] = []
+        self.staged_files: dict[str, str] = {}
+        self.plugin_dirs: dict[str, list[str]] = {}
+        self.plugin_meta: dict[str, list[str]] = {}
+        self.changes = Changes([], [], [])
+
+
+def discover(js_paths: list[str], source_index: SourceIndex, jobs: int = 1):
+    """
+    Scan js_paths with source_index and classify all files found.
+
+    Args:
+        js_paths: The js folders of all apps, in reverse order of precedence
+        source_index: The index used to read the folders and detect changes
+        jobs: Number of threads used to check the files
+
+    Returns:
+        A Discovery instance
+    """
+    discovery = Discovery()
+    discovery.changes = source_index.scan(js_paths, jobs)
+    lib_files = {}
+    source_files = {}
+    for root, files in source_index.roots.items():
+        kind = get_root_kind(root)
+        root = os.path.normpath(root)
+        for path in files:
+            if path.endswith(".mjs"):
+                discovery.entries.append(path)
+            relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+            if not path.endswith("js") and not (
+                kind == SOURCE_ROOT
+                and relative_path.startswith("plugins/")
+                and path.endswith(PLUGIN_META_SUFFIX)
+            ):
+                continue
+            if kind == SOURCE_ROOT:
+                discovery.sources.append(path)
+                source_files[relative_path] = path
+            elif kind == LIB_ROOT:
+                discovery.lib_sources.append(path)
+                lib_files[relative_path] = path
+    discovery.staged_files = {**lib_files, **source_files}
+    # Note all plugin dirs and the modules inside of them to create index.js
+    # files inside of them.
+    for relative_path in source_files:
+        if relative_path[:8] == "plugins/":
+            dirname = os.path.dirname(relative_path)
+            if relative_path.endswith(PLUGIN_META_SUFFIX):
+                discovery.plugin_meta.setdefault(dirname, []).append(
+                    os.path.basename(relative_path).removesuffix(PLUGIN_META_SUFFIX),
+                )
+                continue
+            if dirname not in discovery.plugin_dirs:
+                discovery.plugin_dirs[dirname] = []
+            module_name = os.path.splitext(os.path.basename(relative_path))[0]
+            if (
+                module_name != "init"
+                and module_name not in discovery.plugin_dirs[dirname]
+            ):
+                discovery.plugin_dirs[dirname].append(module_name)
+    return discovery
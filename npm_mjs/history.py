@@ -0,0 +1,195 @@
+"""
+History of transpile and npm_install runs.
+
+Every run appends a record to a small SQLite database in the .transpile
+folder, with the durations of its phases, the number of entries and sources,
+the size of the outputs of every entry, the hits of the rspack cache and the
+git revision of the project. ./manage.py transpile_history lists the records
+and compares every run with the median of the runs before it, so that a
+dependency update that makes builds slower or bundles larger stands out.
+"""
+
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+from contextlib import closing
+
+from django.conf import settings
+
+# Older records are removed once there are more.
+MAX_RECORDS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    command TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    phases TEXT NOT NULL,
+    entries INTEGER,
+    sources INTEGER,
+    output_bytes TEXT NOT NULL,
+    cache_hits INTEGER,
+    cache_modules INTEGER,
+    revision TEXT
+)
+"""
+
+
+def get_git_revision(path: str) -> str | None:
+    """Return the git revision checked out at path or None."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short=12", "HEAD"],
+            cwd=path,
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def get_entry_bytes(manifest: dict) -> dict[str, int]:
+    """Return the size of all files of every entry in manifest."""
+    files = manifest["files"]
+    return {
+        name: sum(files[x]["size"] for x in entry_files if x in files)
+        for name, entry_files in manifest["entrypoints"].items()
+    }
+
+
+def add_history(command, kind, trace, stdout, **values):
+    """Append a record of a run to the build history."""
+    if not getattr(settings, "TRANSPILE_HISTORY", True):
+        return
+    # npm_mjs.paths needs the Django settings, unlike the rest of this module.
+    from .paths import HISTORY_PATH
+    from .paths import PROJECT_PATH
+
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    try:
+        BuildHistory(HISTORY_PATH).add(
+            command,
+            kind,
+            trace,
+            revision=get_git_revision(PROJECT_PATH),
+            **values,
+        )
+    except sqlite3.Error as e:
+        stdout.write("Could not record the build history: %s" % e)
+
+
+class BuildHistory:
+    """
+    Usage::
+        history = BuildHistory(HISTORY_PATH)
+        history.add("transpile", "full", trace, entries=12)
+        builds = history.get_builds("transpile")
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        connection.execute(SCHEMA)
+        return connection
+
+    def add(
+        self,
+        command: str,
+        kind: str,
+        trace,
+        entries: int | None = None,
+        sources: int | None = None,
+        output_bytes: dict[str, int] | None = None,
+        cache_hits: int | None = None,
+        cache_modules: int | None = None,
+        revision: str | None = None,
+    ) -> None:
+        """
+        Append a record of a run of command, which did what kind says, for
+        example "full" or "restored", and was timed by trace.
+        """
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO builds (command, kind, started, duration, phases, "
+                "entries, sources, output_bytes, cache_hits, cache_modules, "
+                "revision) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    command,
+                    kind,
+                    trace.started,
+                    trace.duration,
+                    json.dumps({x["name"]: x["duration"] for x in trace.phases}),
+                    entries,
+                    sources,
+                    json.dumps(output_bytes or {}),
+                    cache_hits,
+                    cache_modules,
+                    revision,
+                ),
+            )
+            connection.execute(
+                "DELETE FROM builds WHERE id <= (SELECT MAX(id) FROM builds) - ?",
+                (MAX_RECORDS,),
+            )
+
+    def get_builds(self, command: str | None = None) -> list[dict]:
+        """Return all records, or those of command, oldest first."""
+        query = "SELECT * FROM builds"
+        params = ()
+        if command:
+            query += " WHERE command = ?"
+            params = (command,)
+        with closing(self.connect()) as connection:
+            rows = connection.execute(query + " ORDER BY id", params).fetchall()
+        builds = []
+        for row in rows:
+            build = dict(row)
+            build["phases"] = json.loads(build["phases"])
+            build["output_bytes"] = json.loads(build["output_bytes"])
+            builds.append(build)
+        return builds
+
+
+def find_regressions(
+    builds: list[dict],
+    window: int = 5,
+    threshold: float = 0.3,
+) -> dict[int, list[tuple[str, float, float]]]:
+    """
+    Compare every build, oldest first, with the median of the window builds
+    before it. Durations are only compared with runs of the same command and
+    kind, output sizes with all runs of the same command that produced the
+    entry. Returns build id -> (what, value, baseline) for every value that
+    is more than threshold above its baseline.
+    """
+    regressions = {}
+    for number, build in enumerate(builds):
+        previous = [x for x in builds[:number] if x["command"] == build["command"]]
+        found = []
+        durations = [x["duration"] for x in previous if x["kind"] == build["kind"]]
+        if durations:
+            baseline = statistics.median(durations[-window:])
+            if baseline and build["duration"] > baseline * (1 + threshold):
+                found.append(("duration", build["duration"], baseline))
+        for name, size in sorted(build["output_bytes"].items()):
+            sizes = [
+                x["output_bytes"][name] for x in previous if name in x["output_bytes"]
+            ]
+            if sizes:
+                baseline = statistics.median(sizes[-window:])
+                if baseline and size > baseline * (1 + threshold):
+                    found.append((name, size, baseline))
+        if found:
+            regressions[build["id"]] = found
+    return regressions
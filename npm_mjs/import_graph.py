@@ -0,0 +1,150 @@
+"""
+Import graph of the JavaScript files in the .transpile/js staging dir.
+
+The import specifiers of every staged file are found with regular
+expressions that cover static imports, re-exports, dynamic imports and
+worker URLs. They are stored together with the content hash of the file, so
+that only changed files have to be read again. Specifiers are resolved
+against the names in the staging dir, which stand for the files that win
+cross-app overrides.
+"""
+
+import json
+import os
+import posixpath
+import re
+
+from .utils import write_json_atomic
+
+GRAPH_VERSION = 1
+
+IMPORT_RE = re.compile(
+    r"""
+    \bimport\s*(?:[\w*{}\s,$]+?\s*from\s*)?["']([^"'\n]+)["']
+    | \bexport\s*(?:\*\s*(?:as\s+[\w$]+\s*)?|\{[^}]*\}\s*)from\s*["']([^"'\n]+)["']
+    | \bimport\s*\(\s*(?:/\*.*?\*/\s*)*["']([^"'\n]+)["']\s*\)
+    | \bnew\s+URL\s*\(\s*["']([^"'\n]+)["']\s*,\s*import\.meta\.url
+    """,
+    re.VERBOSE,
+)
+
+RESOLVE_SUFFIXES = ("", ".js", ".mjs", ".json", "/index.js", "/index.mjs")
+
+
+def find_imports(source: str) -> list[str]:
+    """Return all relative import specifiers in JavaScript source code."""
+    specifiers = []
+    for match in IMPORT_RE.finditer(source):
+        specifier = next(x for x in match.groups() if x)
+        if specifier.startswith("./") or specifier.startswith("../"):
+            if specifier not in specifiers:
+                specifiers.append(specifier)
+    return specifiers
+
+
+class ImportGraph:
+    """
+    Usage::
+        graph = ImportGraph(IMPORT_GRAPH_PATH)
+        graph.update(cache_path, staging.staged)
+        entry_names = graph.affected(changed_files, {"index": "index.mjs"})
+        graph.save()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # relative path -> [content hash, [import specifiers]]
+        self.files: dict[str, list] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == GRAPH_VERSION:
+            self.files = data.get("files", {})
+
+    def save(self) -> None:
+        write_json_atomic(self.path, {"version": GRAPH_VERSION, "files": self.files})
+
+    def update(
+        self,
+        root: str,
+        staged: dict[str, str],
+        sources: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Bring the graph up to date with the files in the staging dir root.
+        staged maps the relative path of every staged file to its hash.
+        Files listed in sources, by relative path, are read from there
+        instead, as they are not copied to root with every method.
+        """
+        sources = sources or {}
+        for relative_path in [x for x in self.files if x not in staged]:
+            del self.files[relative_path]
+        for relative_path, file_hash in staged.items():
+            entry = self.files.get(relative_path)
+            if entry and entry[0] == file_hash:
+                continue
+            try:
+                with open(
+                    sources.get(relative_path) or os.path.join(root, relative_path),
+                    encoding="utf-8",
+                ) as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError):
+                source = ""
+            self.files[relative_path] = [file_hash, find_imports(source)]
+
+    def resolve(self, importer: str, specifier: str) -> str | None:
+        """Return the staged file that importer refers to with specifier."""
+        target = posixpath.normpath(
+            posixpath.join(posixpath.dirname(importer), specifier),
+        )
+        for suffix in RESOLVE_SUFFIXES:
+            if target + suffix in self.files:
+                return target + suffix
+        return None
+
+    def get_importers(self) -> dict[str, set[str]]:
+        """Return the reverse index: file -> files importing it."""
+        importers = {}
+        for importer, (_file_hash, specifiers) in self.files.items():
+            for specifier in specifiers:
+                target = self.resolve(importer, specifier)
+                if target:
+                    importers.setdefault(target, set()).add(importer)
+        return importers
+
+    def affected(
+        self,
+        changed: set[str],
+        entries: dict[str, str],
+    ) -> set[str] | None:
+        """
+        Return the names of the entries that can reach one of the changed
+        files. entries maps entry names to their relative path. Returns None
+        if a changed file cannot be reached from any entry, as it may be
+        loaded in a way that is not understood and everything needs to be
+        rebuilt to be safe.
+        """
+        importers = self.get_importers()
+        entry_names = {}
+        for name, relative_path in entries.items():
+            entry_names.setdefault(relative_path, set()).add(name)
+        affected = set()
+        for changed_file in changed:
+            reached = {changed_file}
+            stack = [changed_file]
+            while stack:
+                for importer in importers.get(stack.pop(), ()):
+                    if importer not in reached:
+                        reached.add(importer)
+                        stack.append(importer)
+            names = set().union(*(entry_names.get(x, set()) for x in reached))
+            if not names:
+                return None
+            affected |= names
+        return affected
@@ -9,8 +9,12 @@ from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
 from npm_mjs import signals
+from npm_mjs.build_lock import add_lock_arguments
+from npm_mjs.build_lock import hold_build_lock
+from npm_mjs.history import add_history
 from npm_mjs.paths import SETTINGS_PATHS
 from npm_mjs.paths import TRANSPILE_CACHE_PATH
+from npm_mjs.timing import BuildTrace
 from npm_mjs.tools import get_last_run
 from npm_mjs.tools import set_last_run
 
@@ -27,7 +31,9 @@ def get_package_hash():
     return hash_md5.hexdigest()
 
 
-def install_npm(force, stdout, post_npm_signal=True):
+def install_npm(force, stdout, post_npm_signal=True, trace=None):
+    if trace is None:
+        trace = BuildTrace()
     change_times = [0]
     for path in SETTINGS_PATHS:
         change_times.append(os.path.getmtime(path))
@@ -50,17 +56,25 @@ def install_npm(force, stdout, post_npm_signal=True):
         stdout.write("Installing pnpm dependencies...")
         os.makedirs(TRANSPILE_CACHE_PATH, exist_ok=True)
         set_last_run("npm_install", int(round(time.time())))
-        call_command("create_package_json")
+        with trace.phase("create_package_json"):
+            call_command("create_package_json")
 
         stdout.write("Installing dependencies...")
-        call(["npx", "-y", "pnpm", "install"], cwd=TRANSPILE_CACHE_PATH)
+        with trace.phase("pnpm_install") as counts:
+            counts["returncode"] = call(
+                ["npx", "-y", "pnpm", "install"],
+                cwd=TRANSPILE_CACHE_PATH,
+            )
 
         # Update cache
         with open(cache_file, "w") as f:
             json.dump({"hash": package_hash}, f)
 
         if post_npm_signal:
-            signals.post_npm_install.send(sender=None)
+            signals.post_npm_install.send(
+                sender=None,
+                phases=list(trace.phases),
+            )
         npm_install = True
     else:
         stdout.write("No changes detected, skipping pnpm install.")
@@ -87,6 +101,20 @@ class Command(BaseCommand):
             default=True,
             help="Send a signal after finishing npm install.",
         )
+        add_lock_arguments(parser)
 
     def handle(self, *args, **options):
-        install_npm(options["force"], self.stdout, options["post_npm_signal"])
+        trace = BuildTrace()
+        with hold_build_lock("npm_install", options, self.stdout):
+            npm_install = install_npm(
+                options["force"],
+                self.stdout,
+                options["post_npm_signal"],
+                trace,
+            )
+        add_history(
+            "npm_install",
+            "install" if npm_install else "skipped",
+            trace,
+            self.stdout,
+        )
@@ -1,3 +1,5 @@
+const fs = require("fs") // eslint-disable-line no-undef
+const path = require("path") // eslint-disable-line no-undef
 const rspack = require("@rspack/core") // eslint-disable-line no-undef
 
 const settings = window.settings // Replaced by django-npm-mjs
@@ -22,17 +24,219 @@ if (settings.DEBUG) {
     )} + url + "?v=" + ${transpile.VERSION})`
 }
 
-module.exports = {
-    // eslint-disable-line no-undef
+// Writes the files that need to be loaded for every entry, in order, and
+// the files of the chunks that every entry loads on demand.
+class EntrypointsPlugin {
+    apply(compiler) {
+        compiler.hooks.done.tap("EntrypointsPlugin", stats => {
+            const {entrypoints, chunks} = stats.toJson({
+                all: false,
+                entrypoints: true,
+                chunks: true,
+                chunkRelations: true,
+                ids: true
+            })
+            const chunksById = new Map(chunks.map(chunk => [chunk.id, chunk]))
+            const files = {}
+            const lazyFiles = {}
+            Object.entries(entrypoints).forEach(([name, entrypoint]) => {
+                files[name] = entrypoint.assets
+                    .map(asset => asset.name || asset)
+                    .filter(file => !file.endsWith(".map"))
+                const seen = new Set(entrypoint.chunks)
+                const queue = [...entrypoint.chunks]
+                lazyFiles[name] = []
+                while (queue.length) {
+                    const chunk = chunksById.get(queue.shift())
+                    if (!chunk) {
+                        continue
+                    }
+                    if (!entrypoint.chunks.includes(chunk.id)) {
+                        lazyFiles[name].push(
+                            ...chunk.files.filter(file => !file.endsWith(".map"))
+                        )
+                    }
+                    ;(chunk.children || []).forEach(id => {
+                        if (!seen.has(id)) {
+                            seen.add(id)
+                            queue.push(id)
+                        }
+                    })
+                }
+            })
+            fs.writeFileSync(transpile.ENTRYPOINTS_PATH, JSON.stringify(files))
+            fs.writeFileSync(transpile.LAZY_CHUNKS_PATH, JSON.stringify(lazyFiles))
+        })
+    }
+}
+
+// Writes how many modules were restored from the persistent cache.
+class CacheStatsPlugin {
+    apply(compiler) {
+        compiler.hooks.done.tap("CacheStatsPlugin", stats => {
+            const {modules} = stats.toJson({
+                all: false,
+                modules: true,
+                cachedModules: true
+            })
+            fs.writeFileSync(
+                transpile.CACHE_STATS_PATH,
+                JSON.stringify({
+                    modules: modules.length,
+                    cached: modules.filter(module => module.cached).length
+                })
+            )
+        })
+    }
+}
+
+// Writes the entrypoints, chunks and modules of the build, which
+// django-npm-mjs uses to report the sizes of the outputs.
+class StatsPlugin {
+    apply(compiler) {
+        compiler.hooks.done.tap("StatsPlugin", stats => {
+            fs.writeFileSync(
+                transpile.STATS_PATH,
+                JSON.stringify(
+                    stats.toJson({
+                        all: false,
+                        entrypoints: true,
+                        chunks: true,
+                        modules: true,
+                        nestedModules: true,
+                        ids: true
+                    })
+                )
+            )
+        })
+    }
+}
+
+// Resolves the names in the staging dir to the source files in the apps when
+// sources are not copied there (TRANSPILE_COPY_METHOD = "none"). Relative
+// imports are resolved against the staged name of the importing module, so
+// that modules can import each other across apps, and overrides are followed
+// as in a copied staging dir. The modules keep the paths of their source
+// files, so that source maps and watching refer to the real files.
+class StagedSourcesPlugin {
+    apply(compiler) {
+        const suffixes = ["", ".js", ".mjs", ".json", "/index.js", "/index.mjs"]
+        let files = new Map()
+        let names = new Map()
+        compiler.hooks.thisCompilation.tap("StagedSourcesPlugin", compilation => {
+            // Read again for every compilation, as sources may have been
+            // added or removed in watch mode.
+            const stagedSources = JSON.parse(
+                fs.readFileSync(transpile.STAGED_SOURCES_PATH, "utf8")
+            )
+            files = new Map(Object.entries(stagedSources))
+            names = new Map(
+                Object.entries(stagedSources).map(([name, file]) => [file, name])
+            )
+            compilation.fileDependencies.add(transpile.STAGED_SOURCES_PATH)
+        })
+        compiler.hooks.normalModuleFactory.tap("StagedSourcesPlugin", factory => {
+            factory.hooks.beforeResolve.tap("StagedSourcesPlugin", data => {
+                let name
+                if (path.isAbsolute(data.request)) {
+                    if (!data.request.startsWith(transpile.STAGING_DIR)) {
+                        return
+                    }
+                    name = path
+                        .relative(transpile.STAGING_DIR, data.request)
+                        .split(path.sep)
+                        .join("/")
+                } else if (
+                    data.request.startsWith("./") ||
+                    data.request.startsWith("../")
+                ) {
+                    const issuer = names.get(data.contextInfo.issuer)
+                    if (issuer === undefined) {
+                        return
+                    }
+                    name = path.posix.join(path.posix.dirname(issuer), data.request)
+                } else {
+                    return
+                }
+                const suffix = suffixes.find(x => files.has(name + x))
+                if (suffix !== undefined) {
+                    data.request = files.get(name + suffix)
+                }
+            })
+        })
+    }
+}
+
+const optimization = {
+    // Ids that do not shift when modules are added keep the content hashes
+    // of unchanged chunks stable.
+    moduleIds: "deterministic",
+    chunkIds: "deterministic"
+}
+
+if (settings.TRANSPILE_SPLIT_CHUNKS) {
+    // npm dependencies change less often than the app code, so they are
+    // kept in a chunk of their own, as is the runtime.
+    optimization.runtimeChunk = {name: "runtime"}
+    optimization.splitChunks = {
+        cacheGroups: {
+            vendor: {
+                test: /[\\/]node_modules[\\/]/,
+                name: "vendor",
+                chunks: "all",
+                filename: "vendor-[contenthash].js"
+            }
+        }
+    }
+}
+
+const config = {
     mode: settings.DEBUG ? "development" : "production",
     // module: {
     //     rules: [] // [baseRule]
     // },
     output: {
         path: transpile.OUT_DIR,
-        chunkFilename: transpile.VERSION + "-[id].js",
-        publicPath: transpile.BASE_URL
+        filename: pathData =>
+            pathData.chunk && pathData.chunk.name === "runtime"
+                ? "runtime-[contenthash].js"
+                : "[name].js",
+        chunkFilename: "[id]-[contenthash].js",
+        publicPath: transpile.BASE_URL,
+        uniqueName: transpile.UNIQUE_NAME
     },
-    plugins: [new rspack.DefinePlugin(predefinedVariables)],
+    optimization,
+    plugins: [new rspack.DefinePlugin(predefinedVariables), new EntrypointsPlugin()],
     entry: transpile.ENTRIES
 }
+
+if (transpile.CACHE_DIR) {
+    // The cache folder and its version are managed by django-npm-mjs.
+    config.cache = true
+    config.experiments = {
+        cache: {
+            type: "persistent",
+            version: transpile.CACHE_VERSION,
+            storage: {
+                type: "filesystem",
+                directory: transpile.CACHE_DIR
+            }
+        }
+    }
+    config.plugins.push(new CacheStatsPlugin())
+}
+
+if (transpile.STATS_PATH) {
+    config.plugins.push(new StatsPlugin())
+}
+
+if (transpile.STAGED_SOURCES_PATH) {
+    config.plugins.push(new StagedSourcesPlugin())
+    // Modules keep the paths of their source files, so npm packages are not
+    // found by looking for node_modules folders above them.
+    config.resolve = {
+        modules: [transpile.NODE_MODULES_DIR, "node_modules"]
+    }
+}
+
+module.exports = config // eslint-disable-line no-undef
@@ -1,7 +1,12 @@
+import glob
+import hashlib
 import json
 import os
-import shutil
+import re
+import signal
 import subprocess
+import sys
+import threading
 import time
 from subprocess import call
 from urllib.parse import urljoin
@@ -9,29 +14,163 @@ from urllib.parse import urljoin
 from django.apps import apps
 from django.conf import settings
 from django.contrib.staticfiles import finders
+from django.core.files.storage import FileSystemStorage
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 from django.templatetags.static import PrefixNode
+from django.utils import autoreload
 
 from .collectstatic import Command as CSCommand
+from .npm_install import get_package_hash
 from .npm_install import install_npm
 from npm_mjs import signals
+from npm_mjs.build_cache import BuildCache
+from npm_mjs.build_cache import get_build_key
+from npm_mjs.build_lock import add_lock_arguments
+from npm_mjs.build_lock import hold_build_lock
+from npm_mjs.bundle_stats import analyze_stats
+from npm_mjs.bundle_stats import check_budgets
+from npm_mjs.bundle_stats import format_size
+from npm_mjs.bundle_stats import load_stats
+from npm_mjs.compression import compress_outputs
+from npm_mjs.compression import get_formats
+from npm_mjs.discovery import discover
+from npm_mjs.history import add_history
+from npm_mjs.history import get_entry_bytes
+from npm_mjs.import_graph import ImportGraph
+from npm_mjs.manifest import build_manifest
+from npm_mjs.manifest import load_manifest
+from npm_mjs.manifest import write_manifest
+from npm_mjs.output_dirs import OutputDirs
+from npm_mjs.paths import BUILD_CACHE_PATH
+from npm_mjs.paths import BUILD_REPORT_PATH
+from npm_mjs.paths import BUILD_STATE_PATH
+from npm_mjs.paths import BUNDLE_REPORT_PATH
+from npm_mjs.paths import CACHE_STATS_PATH
+from npm_mjs.paths import COMPRESSION_CACHE_PATH
+from npm_mjs.paths import ENTRYPOINTS_PATH
+from npm_mjs.paths import IMPORT_GRAPH_PATH
+from npm_mjs.paths import LAZY_CHUNKS_PATH
+from npm_mjs.paths import LOCKFILE_PATH
+from npm_mjs.paths import MANIFEST_PATH
+from npm_mjs.paths import OUTPUTS_PATH
 from npm_mjs.paths import PROJECT_PATH
+from npm_mjs.paths import RSPACK_CACHE_PATH
+from npm_mjs.paths import SETTINGS_PATHS
+from npm_mjs.paths import SOURCE_INDEX_PATH
+from npm_mjs.paths import STAGED_SOURCES_PATH
+from npm_mjs.paths import STAGING_MANIFEST_PATH
+from npm_mjs.paths import STATIC_LISTING_PATH
 from npm_mjs.paths import STATIC_ROOT
+from npm_mjs.paths import STATS_PATH
 from npm_mjs.paths import TRANSPILE_CACHE_PATH
+from npm_mjs.plugin_index import PLUGIN_INDEX_FORMATS
+from npm_mjs.plugin_index import render_plugin_index
+from npm_mjs.rspack_cache import RspackCache
+from npm_mjs.rspack_cache import get_cache_version
+from npm_mjs.rspack_cache import load_cache_stats
+from npm_mjs.source_index import SourceIndex
+from npm_mjs.staging import StagingArea
+from npm_mjs.staging import get_staged_sources
+from npm_mjs.static_listing import StaticListing
+from npm_mjs.timing import BuildTrace
+from npm_mjs.tools import batch_last_runs
+from npm_mjs.tools import get_last_run
 from npm_mjs.tools import set_last_run
+from npm_mjs.utils import write_json_atomic
+from npm_mjs.versioning import VERSION_MODES
+from npm_mjs.versioning import VERSION_PLACEHOLDER
+from npm_mjs.versioning import apply_version
+from npm_mjs.versioning import get_key_version
+from npm_mjs.versioning import get_output_version
+from npm_mjs.watch import create_watcher
+from npm_mjs.watch import wait_for_changes
 
 # Run this script every time you update an *.mjs file or any of the
 # modules it loads.
 
-OLD_RSPACK_CONFIG_JS = ""
-
 RSPACK_CONFIG_JS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.js")
 
-try:
-    with open(RSPACK_CONFIG_JS_PATH) as file:
-        OLD_RSPACK_CONFIG_JS = file.read()
-except OSError:
-    pass
+# The line rspack prints after a compilation without errors, such as
+# "Rspack compiled successfully in 1.2 s" or "compiled with 2 warnings".
+RSPACK_COMPILED_RE = re.compile(
+    r"\bcompiled (successfully|with \d+ warnings?)\b",
+    re.IGNORECASE,
+)
+
+# Colors in the output of rspack
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def compiled_successfully(line):
+    """Return whether line is the report of a compilation without errors."""
+    return bool(RSPACK_COMPILED_RE.search(ANSI_ESCAPE_RE.sub("", line)))
+
+
+def get_unique_name(entries):
+    """
+    Return a name for the chunk loading global of a build of entries. Builds
+    of different sets of entries must not share it when their outputs are
+    loaded on the same page.
+    """
+    return "npm_mjs_" + hashlib.md5(",".join(sorted(entries)).encode()).hexdigest()[:8]
+
+
+def split_entries(entries, entry_sizes, jobs):
+    """
+    Split entries into at most jobs groups of about the same total size.
+    Entries are weighted with their output size from the previous build.
+    Entries without a known size are assumed to have the average size.
+    """
+    jobs = max(1, min(jobs, len(entries)))
+    known_sizes = [entry_sizes[x] for x in entries if x in entry_sizes]
+    default_size = sum(known_sizes) // len(known_sizes) if known_sizes else 1
+    shards = [({}, [0]) for _i in range(jobs)]
+    for name in sorted(
+        entries,
+        key=lambda x: entry_sizes.get(x, default_size),
+        reverse=True,
+    ):
+        shard_entries, shard_size = min(shards, key=lambda x: x[1][0])
+        shard_entries[name] = entries[name]
+        shard_size[0] += entry_sizes.get(name, default_size)
+    return [x[0] for x in shards if x[0]]
+
+
+def remove_build_reports():
+    """Remove the files that the rspack processes of the last build wrote."""
+    for pattern in (
+        "entrypoints*.json",
+        "lazy_chunks*.json",
+        "cache_stats*.json",
+        "stats*.json",
+    ):
+        for path in glob.glob(os.path.join(TRANSPILE_CACHE_PATH, pattern)):
+            os.remove(path)
+
+
+def load_entrypoints(name="entrypoints"):
+    """
+    Return the files of every entry as written to name*.json by the rspack
+    processes of the last build: "entrypoints" for the files that are loaded
+    directly and "lazy_chunks" for those loaded on demand.
+    """
+    entrypoints = {}
+    for path in glob.glob(os.path.join(TRANSPILE_CACHE_PATH, name + "*.json")):
+        try:
+            with open(path) as f:
+                entrypoints.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+    return entrypoints
+
+
+def load_build_state():
+    try:
+        with open(BUILD_STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 
 class Command(BaseCommand):
@@ -47,170 +186,266 @@ class Command(BaseCommand):
             default=False,
             help="Force transpile even if no change is detected.",
         )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            dest="no_cache",
+            default=False,
+            help=(
+                "Build without restoring outputs from the build cache and "
+                "without the persistent rspack cache."
+            ),
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            dest="jobs",
+            default=None,
+            help=(
+                "Number of rspack processes to run in parallel, each building "
+                "a share of the entries. Defaults to the TRANSPILE_JOBS setting "
+                "or 1."
+            ),
+        )
+        parser.add_argument(
+            "--cache-key",
+            action="store_true",
+            dest="cache_key",
+            default=False,
+            help=(
+                "Print the key of the build cache for the current sources and "
+                "exit without building."
+            ),
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            dest="strict",
+            default=False,
+            help="Fail if an entry exceeds its budget in TRANSPILE_SIZE_BUDGETS.",
+        )
+        parser.add_argument(
+            "--trace",
+            dest="trace",
+            default=None,
+            metavar="FILE",
+            help=(
+                "Write the timings of all phases to FILE in the Chrome trace "
+                "event format."
+            ),
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            dest="watch",
+            default=False,
+            help="Keep running and rebuild whenever a source file changes.",
+        )
+        parser.add_argument(
+            "--poll",
+            action="store_true",
+            dest="poll",
+            default=False,
+            help="Poll for changes in watch mode instead of using inotify.",
+        )
+        parser.add_argument(
+            "--debounce",
+            type=int,
+            dest="debounce",
+            default=200,
+            help="Milliseconds to wait for further changes in watch mode.",
+        )
+        add_lock_arguments(parser)
 
-    def handle(self, *args, **options):
-        if options["force"]:
-            force = True
-        else:
-            force = False
-        start = int(round(time.time()))
-        npm_install = install_npm(force, self.stdout)
+    def find_js_paths(self, transpile_path):
         js_paths = finders.find("js/", True)
-        # Remove paths inside of collection dir
-        js_paths = [x for x in js_paths if not x.startswith(STATIC_ROOT)]
+        # Remove paths inside of collection dir and our own output dir
+        js_paths = [
+            x
+            for x in js_paths
+            if not x.startswith(STATIC_ROOT) and not x.startswith(transpile_path)
+        ]
         # Reverse list so that overrides function as expected. Static file from
         # first app mentioned in INSTALLED_APPS has preference.
         js_paths.reverse()
+        return js_paths
 
-        transpile_path = os.path.join(PROJECT_PATH, "static-transpile")
-
-        if os.path.exists(transpile_path):
-            files = []
-            for js_path in js_paths:
-                for root, _dirnames, filenames in os.walk(js_path):
-                    for filename in filenames:
-                        files.append(os.path.join(root, filename))
-            newest_file = max(files, key=os.path.getmtime)
-            if (
-                os.path.commonprefix([newest_file, transpile_path]) == transpile_path
-                and not npm_install
-                and not force
-            ):
-                # Transpile not needed as nothing has changed and not forced
-                return
-            # Remove any previously created static output dirs
-            shutil.rmtree(transpile_path, ignore_errors=True)
-        self.stdout.write("Transpiling...")
-        os.makedirs(TRANSPILE_CACHE_PATH, exist_ok=True)
-        # We reload the file as other values may have changed in the meantime
-        set_last_run("transpile", start)
-        # Create a static output dir
-        out_dir = os.path.join(transpile_path, "js/")
-        os.makedirs(out_dir, exist_ok=True)
-        with open(os.path.join(transpile_path, "README.txt"), "w") as f:
-            f.write(
-                "These files have been automatically generated. "
-                "DO NOT EDIT THEM! \n Changes will be overwritten. Edit "
-                "the original files in one of the django apps, and run "
-                "./manage.py transpile.",
-            )
+    def discover(self, js_paths, source_index, verbosity):
+        # Find all sources in a single pass and compare them with the index of
+        # the last successful run. Only files with a different size or
+        # modification time are hashed.
+        discovery = discover(
+            js_paths,
+            source_index,
+            getattr(settings, "TRANSPILE_SCAN_THREADS", 1),
+        )
+        changes = discovery.changes
+        if changes and verbosity > 0:
+            self.stdout.write(f"Source changes: {changes}")
+            if verbosity > 1:
+                for label, paths in zip(("Added", "Changed", "Removed"), changes):
+                    for path in paths:
+                        self.stdout.write(f"{label} {path}")
+        return discovery
 
-        mainfiles = []
-        sourcefiles = []
-        lib_sourcefiles = []
-        for path in js_paths:
-            for mainfile in (
-                subprocess.check_output(
-                    ["find", path, "-type", "f", "-name", "*.mjs", "-print"],
-                )
-                .decode("utf-8")
-                .split("\n")[:-1]
-            ):
-                mainfiles.append(mainfile)
-            for sourcefile in (
-                subprocess.check_output(
-                    ["find", path, "-type", "f", "-wholename", "*js"],
-                )
-                .decode("utf-8")
-                .split("\n")[:-1]
-            ):
-                if "static/js" in sourcefile:
-                    sourcefiles.append(sourcefile)
-                if "static-libs/js" in sourcefile:
-                    lib_sourcefiles.append(sourcefile)
+    def stage_sources(self, discovery, source_index, cache_path, force, verbosity=1):
         # Collect all JavaScript in a temporary dir (similar to
         # ./manage.py collectstatic).
         # This allows for the modules to import from oneanother, across Django
         # Apps.
-
-        cache_path = os.path.join(TRANSPILE_CACHE_PATH, "js/")
         os.makedirs(cache_path, exist_ok=True)
-        # Note all cache files so that we can remove outdated files that no
-        # longer are in the prject.
-        cache_files = []
-        # Note all plugin dirs and the modules inside of them to crate index.js
-        # files inside of them.
-        plugin_dirs = {}
-        for sourcefile in sourcefiles:
-            relative_path = sourcefile.split("static/js/")[1]
-            outfile = os.path.join(cache_path, relative_path)
-            cache_files.append(outfile)
-            dirname = os.path.dirname(outfile)
-            os.makedirs(dirname, exist_ok=True)
-            shutil.copyfile(sourcefile, outfile)
-            # Check for plugin connectors
-            if relative_path[:8] == "plugins/":
-                if dirname not in plugin_dirs:
-                    plugin_dirs[dirname] = []
-                module_name = os.path.splitext(os.path.basename(relative_path))[0]
-                if module_name != "init" and module_name not in plugin_dirs[dirname]:
-                    plugin_dirs[dirname].append(module_name)
-
-        for sourcefile in lib_sourcefiles:
-            relative_path = sourcefile.split("static-libs/js/")[1]
-            outfile = os.path.join(cache_path, relative_path)
-            cache_files.append(outfile)
-            dirname = os.path.dirname(outfile)
-            if not os.path.exists(dirname):
-                os.makedirs(dirname)
-                shutil.copyfile(sourcefile, outfile)
-            elif not os.path.isfile(outfile):
-                shutil.copyfile(sourcefile, outfile)
-            elif os.path.getmtime(outfile) < os.path.getmtime(sourcefile):
-                shutil.copyfile(sourcefile, outfile)
+        # Only copy files whose content differs from the staged copy.
+        staging = StagingArea(
+            cache_path,
+            STAGING_MANIFEST_PATH,
+            getattr(settings, "TRANSPILE_COPY_METHOD", "auto"),
+            reset=force,
+        )
+        staging.sync(discovery.staged_files, source_index)
 
         # Write an index.js file for every plugin dir
-        for plugin_dir in plugin_dirs:
-            index_js = ""
-            for module_name in plugin_dirs[plugin_dir]:
-                index_js += 'export * from "./%s"\n' % module_name
-            outfile = os.path.join(plugin_dir, "index.js")
-            cache_files.append(outfile)
-            if not os.path.isfile(outfile):
-                index_file = open(outfile, "w")
-                index_file.write(index_js)
-                index_file.close()
-            else:
-                index_file = open(outfile)
-                old_index_js = index_file.read()
-                index_file.close()
-                if old_index_js != index_js:
-                    index_file = open(outfile, "w")
-                    index_file.write(index_js)
-                    index_file.close()
-
-        # Check for outdated files that should be removed
-        for existing_file in (
-            subprocess.check_output(["find", cache_path, "-type", "f"])
-            .decode("utf-8")
-            .split("\n")[:-1]
-        ):
-            if existing_file not in cache_files:
-                self.stdout.write("Removing %s" % existing_file)
-                os.remove(existing_file)
-        if apps.is_installed("django.contrib.staticfiles"):
-            from django.contrib.staticfiles.storage import staticfiles_storage
+        plugin_indexes = self.get_plugin_indexes(discovery)
+        for relative_path, index_js in plugin_indexes.items():
+            staging.write_text(relative_path, index_js)
 
-            static_base_url = staticfiles_storage.base_url
-        else:
-            static_base_url = PrefixNode.handle_simple("STATIC_URL")
-        transpile_base_url = urljoin(static_base_url, "js/")
-        if (
-            hasattr(settings, "RSPACK_CONFIG_TEMPLATE")
-            and settings.RSPACK_CONFIG_TEMPLATE
-        ):
-            rspack_config_template_path = settings.RSPACK_CONFIG_TEMPLATE
-        else:
-            rspack_config_template_path = os.path.join(
-                os.path.dirname(os.path.realpath(__file__)),
-                "rspack.config.template.js",
+        # Remove outdated files that no longer are in the project.
+        for removed_file in staging.remove_stale():
+            if verbosity > 0:
+                self.stdout.write("Removing %s" % removed_file)
+        staging.save()
+        if staging.method == "none":
+            # rspack resolves the staged names with this map.
+            write_json_atomic(
+                STAGED_SOURCES_PATH,
+                get_staged_sources(cache_path, discovery.staged_files, plugin_indexes),
             )
+        if verbosity > 0:
+            self.stdout.write(f"Staged sources: {staging.stats}")
+        return staging
+
+    def get_plugin_indexes(self, discovery):
+        index_format = getattr(settings, "TRANSPILE_PLUGIN_INDEX", "eager")
+        indexes = {}
+        for plugin_dir in discovery.plugin_dirs:
+            indexes[os.path.join(plugin_dir, "index.js")] = render_plugin_index(
+                plugin_dir,
+                discovery.plugin_dirs[plugin_dir],
+                discovery.plugin_meta.get(plugin_dir, []),
+                index_format,
+            )
+        return indexes
+
+    def get_build_key(self, discovery, source_index, cache_path, config_digest):
+        """
+        Return the key of the build cache. It is computed from the hashes the
+        staged files will have, so the staging dir does not need to be
+        synced first.
+        """
+        staged = {
+            relative_path: source_index.files[source_path][2]
+            for relative_path, source_path in discovery.staged_files.items()
+        }
+        for relative_path, index_js in self.get_plugin_indexes(discovery).items():
+            staged[relative_path] = hashlib.md5(index_js.encode("utf-8")).hexdigest()
+        entries = {
+            name: os.path.relpath(path, cache_path)
+            for name, path in self.get_entries(discovery, cache_path).items()
+        }
+        return get_build_key(
+            config_digest,
+            entries,
+            staged,
+            get_package_hash(),
+            LOCKFILE_PATH,
+        )
+
+    def get_build_cache(self):
+        cache_dir = getattr(settings, "TRANSPILE_BUILD_CACHE", BUILD_CACHE_PATH)
+        if not cache_dir:
+            return None
+        return BuildCache(
+            cache_dir,
+            getattr(settings, "TRANSPILE_BUILD_CACHE_ENTRIES", 5),
+        )
+
+    def print_cache_key(self):
+        # The lockfile is part of the key, but unlike a build, printing the key
+        # does not install the npm dependencies.
+        if not os.path.exists(LOCKFILE_PATH):
+            raise CommandError(
+                "%s does not exist. Run ./manage.py npm_install first." % LOCKFILE_PATH,
+            )
+        # Neither the staging dir nor the index of the last build are touched,
+        # so that printing the key does not affect the next build.
+        transpile_path = os.path.join(PROJECT_PATH, "static-transpile")
+        source_index = SourceIndex(SOURCE_INDEX_PATH)
+        discovery = self.discover(self.find_js_paths(transpile_path), source_index, 0)
+        cache_path = os.path.join(TRANSPILE_CACHE_PATH, "js/")
+        entries = self.get_entries(discovery, cache_path)
+        transpile = self.get_transpile_vars(
+            entries,
+            os.path.join(transpile_path, "js/"),
+            0,
+        )
+        self.stdout.write(
+            self.get_build_key(
+                discovery,
+                source_index,
+                cache_path,
+                self.get_config_digest(transpile),
+            ),
+        )
+
+    def restore_build(self, build_cache, build_key, output_dirs):
+        """
+        Copy the outputs stored under build_key into a new output dir.
+        Returns the dir and the metadata of the stored build or None on a
+        miss.
+        """
+        if not build_cache:
+            return None
+        path = output_dirs.create()
+        meta = build_cache.restore(build_key, self.create_out_dir(path))
+        if meta is None:
+            output_dirs.discard(path)
+            return None
+        return path, meta
+
+    def activate_outputs(self, output_dirs, path, manifest, trace):
+        """
+        Switch static-transpile to the outputs in path and write their
+        manifest right after, so that templates use the new versions as soon
+        as the new files are served.
+        """
+        with trace.phase("activate") as counts:
+            counts["carried"] = output_dirs.activate(path, list(manifest["files"]))
+            write_json_atomic(MANIFEST_PATH, manifest)
+
+    def set_version(self, version):
+        # Only move the version when it really changes, so that templates
+        # keep pointing to the same URLs otherwise.
+        if get_last_run("transpile") != version:
+            set_last_run("transpile", version)
+        else:
+            self.stdout.write("Transpile version unchanged: %s" % version)
+
+    def get_entries(self, discovery, cache_path):
         entries = {}
-        for mainfile in mainfiles:
+        for mainfile in discovery.entries:
             basename = os.path.basename(mainfile)
             modulename = basename.split(".")[0]
             file_path = os.path.join(cache_path, basename)
             entries[modulename] = file_path
+        return entries
+
+    def get_transpile_vars(self, entries, out_dir, version):
+        if apps.is_installed("django.contrib.staticfiles"):
+            from django.contrib.staticfiles.storage import staticfiles_storage
+
+            static_base_url = staticfiles_storage.base_url
+        else:
+            static_base_url = PrefixNode.handle_simple("STATIC_URL")
+        transpile_base_url = urljoin(static_base_url, "js/")
         find_static = CSCommand()
         find_static.set_options(
             **{
@@ -221,24 +456,80 @@ class Command(BaseCommand):
                 "dry_run": True,
                 "ignore_patterns": ["js/", "admin/"],
                 "use_default_ignore_patterns": True,
-                "post_process": True,
+                "post_process": False,
             },
         )
-        found_files = find_static.collect()
-        static_frontend_files = (
-            found_files["modified"]
-            + found_files["unmodified"]
-            + found_files["post_processed"]
-        )
-        transpile = {
+        static_frontend_files = self.list_static_files(find_static.ignore_patterns)
+        # The README of our own output dir is not a frontend file. Leaving it
+        # out keeps the config the same whether the output dir exists or not.
+        readme_path = finders.find("README.txt")
+        if readme_path and readme_path.startswith(os.path.dirname(out_dir.rstrip("/"))):
+            static_frontend_files.remove("README.txt")
+        copy_method = getattr(settings, "TRANSPILE_COPY_METHOD", "auto")
+        return {
             "OUT_DIR": out_dir,
-            "VERSION": start,
+            "VERSION": version,
             "BASE_URL": transpile_base_url,
             "ENTRIES": entries,
+            "UNIQUE_NAME": get_unique_name(entries),
+            "CHUNK_PREFIX": str(version),
+            "ENTRYPOINTS_PATH": ENTRYPOINTS_PATH,
+            "LAZY_CHUNKS_PATH": LAZY_CHUNKS_PATH,
+            "CACHE_DIR": "",
+            "CACHE_VERSION": "",
+            "CACHE_STATS_PATH": CACHE_STATS_PATH,
+            "STATS_PATH": "",
+            "STAGED_SOURCES_PATH": STAGED_SOURCES_PATH if copy_method == "none" else "",
+            "STAGING_DIR": os.path.join(TRANSPILE_CACHE_PATH, "js/"),
+            "NODE_MODULES_DIR": os.path.join(TRANSPILE_CACHE_PATH, "node_modules"),
             "STATIC_FRONTEND_FILES": [
                 urljoin(static_base_url, x) for x in static_frontend_files
             ],
         }
+
+    def list_static_files(self, ignore_patterns):
+        """
+        Return the names of the static files that collectstatic would collect,
+        without comparing them to STATIC_ROOT or post-processing them.
+        """
+        os.makedirs(TRANSPILE_CACHE_PATH, exist_ok=True)
+        listing = StaticListing(STATIC_LISTING_PATH, ignore_patterns)
+        found_files = {}
+        for finder in finders.get_finders():
+            storages = getattr(finder, "storages", None)
+            if isinstance(storages, dict) and all(
+                isinstance(x, FileSystemStorage) for x in storages.values()
+            ):
+                # The folders of the default finders are listed from the cache.
+                found = (
+                    (path, storage)
+                    for storage in storages.values()
+                    if os.path.isdir(storage.location)
+                    for path in listing.get_files(storage.location)
+                )
+            else:
+                found = finder.list(ignore_patterns)
+            for path, storage in found:
+                if getattr(storage, "prefix", None):
+                    path = os.path.join(storage.prefix, path)
+                # The first file of a name is the one that is collected.
+                found_files.setdefault(path, None)
+        listing.save()
+        # Sorted, so that the rspack config does not depend on the order in
+        # which the file system lists files.
+        return sorted(found_files)
+
+    def render_rspack_config(self, transpile):
+        if (
+            hasattr(settings, "RSPACK_CONFIG_TEMPLATE")
+            and settings.RSPACK_CONFIG_TEMPLATE
+        ):
+            rspack_config_template_path = settings.RSPACK_CONFIG_TEMPLATE
+        else:
+            rspack_config_template_path = os.path.join(
+                os.path.dirname(os.path.realpath(__file__)),
+                "rspack.config.template.js",
+            )
         with open(rspack_config_template_path) as f:
             rspack_config_template = f.read()
         settings_dict = {}
@@ -246,19 +537,824 @@ class Command(BaseCommand):
             if var in ["DATABASES", "SECRET_KEY"]:
                 # For extra security, we do not copy DATABASES or SECRET_KEY
                 continue
+            if var.startswith("_"):
+                # Internals of the settings object, such as its __dict__,
+                # depend on which settings have been accessed so far.
+                continue
             try:
                 settings_dict[var] = getattr(settings, var)
             except AttributeError:
                 pass
-        rspack_config_js = rspack_config_template.replace(
+        return rspack_config_template.replace(
             "window.transpile",
             json.dumps(transpile),
         ).replace("window.settings", json.dumps(settings_dict, default=lambda x: False))
 
-        if rspack_config_js is not OLD_RSPACK_CONFIG_JS:
+    def write_rspack_config(self, rspack_config_js):
+        try:
+            with open(RSPACK_CONFIG_JS_PATH) as f:
+                old_rspack_config_js = f.read()
+        except OSError:
+            old_rspack_config_js = None
+        if rspack_config_js != old_rspack_config_js:
             with open(RSPACK_CONFIG_JS_PATH, "w") as f:
                 f.write(rspack_config_js)
-        call(["./node_modules/.bin/rspack"], cwd=TRANSPILE_CACHE_PATH)
-        end = int(round(time.time()))
-        self.stdout.write("Time spent transpiling: " + str(end - start) + " seconds")
-        signals.post_transpile.send(sender=None)
+
+    def create_out_dir(self, transpile_path):
+        # Create a static output dir
+        out_dir = os.path.join(transpile_path, "js/")
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(transpile_path, "README.txt"), "w") as f:
+            f.write(
+                "These files have been automatically generated. "
+                "DO NOT EDIT THEM! \n Changes will be overwritten. Edit "
+                "the original files in one of the django apps, and run "
+                "./manage.py transpile.",
+            )
+        return out_dir
+
+    def handle(self, *args, **options):
+        if options["watch"]:
+            with hold_build_lock("transpile --watch", options, self.stdout):
+                return self.watch(options)
+        if options["cache_key"]:
+            return self.print_cache_key()
+        # The times of this run, including that of npm_install, are written
+        # at once at its end.
+        with hold_build_lock("transpile", options, self.stdout), batch_last_runs():
+            return self.transpile(options)
+
+    def transpile(self, options):
+        if options["force"]:
+            force = True
+        else:
+            force = False
+        version_mode = getattr(settings, "TRANSPILE_VERSION", "time")
+        if version_mode not in VERSION_MODES:
+            raise CommandError(
+                "TRANSPILE_VERSION must be one of %s." % ", ".join(VERSION_MODES),
+            )
+        if (
+            getattr(settings, "TRANSPILE_PLUGIN_INDEX", "eager")
+            not in PLUGIN_INDEX_FORMATS
+        ):
+            raise CommandError(
+                "TRANSPILE_PLUGIN_INDEX must be one of %s."
+                % ", ".join(PLUGIN_INDEX_FORMATS),
+            )
+        try:
+            compress_formats = get_formats(
+                getattr(settings, "TRANSPILE_COMPRESS", False),
+            )
+        except ValueError as e:
+            raise CommandError("TRANSPILE_COMPRESS: %s" % e)
+        trace = BuildTrace()
+        start = int(round(time.time()))
+        with trace.phase("npm_install"):
+            npm_install = install_npm(force, self.stdout, trace=trace)
+        transpile_path = os.path.join(PROJECT_PATH, "static-transpile")
+        with trace.phase("discovery") as counts:
+            js_paths = self.find_js_paths(transpile_path)
+            source_index = SourceIndex(SOURCE_INDEX_PATH)
+            discovery = self.discover(js_paths, source_index, options["verbosity"])
+            counts["files"] = len(source_index.files)
+            counts["entries"] = len(discovery.entries)
+            for label, paths in zip(("added", "changed", "removed"), discovery.changes):
+                counts[label] = len(paths)
+        out_dir = os.path.join(transpile_path, "js/")
+        cache_path = os.path.join(TRANSPILE_CACHE_PATH, "js/")
+        entries = self.get_entries(discovery, cache_path)
+        with trace.phase("collectstatic") as counts:
+            transpile = self.get_transpile_vars(entries, out_dir, start)
+            counts["files"] = len(transpile["STATIC_FRONTEND_FILES"])
+        transpile["STATS_PATH"] = STATS_PATH
+        # Settings and the config template can change without any source
+        # changing, so the config is compared with that of the last build.
+        config_digest = self.get_config_digest(transpile)
+        build_state = load_build_state()
+        if (
+            not discovery.changes
+            and not npm_install
+            and not force
+            and build_state.get("config") == config_digest
+            and self.outputs_intact(transpile_path, entries)
+        ):
+            # Transpile not needed as nothing has changed and not forced
+            return self.finish(
+                trace,
+                options,
+                "unchanged",
+                entries=len(discovery.entries),
+                sources=len(source_index.files),
+            )
+        self.stdout.write("Transpiling...")
+        os.makedirs(TRANSPILE_CACHE_PATH, exist_ok=True)
+        with trace.phase("staging") as counts:
+            staging = self.stage_sources(discovery, source_index, cache_path, force)
+            counts.update(staging.stats._asdict())
+        with trace.phase("import_graph") as counts:
+            import_graph = ImportGraph(IMPORT_GRAPH_PATH)
+            import_graph.update(cache_path, staging.staged, discovery.staged_files)
+            counts["files"] = len(import_graph.files)
+        with trace.phase("build_key") as counts:
+            build_cache = self.get_build_cache()
+            build_key = self.get_build_key(
+                discovery,
+                source_index,
+                cache_path,
+                config_digest,
+            )
+            counts["files"] = len(discovery.staged_files)
+        if version_mode == "inputs":
+            version = get_key_version(build_key)
+        elif version_mode == "outputs":
+            # Replaced once the outputs are known.
+            version = VERSION_PLACEHOLDER
+        else:
+            version = start
+        transpile["VERSION"] = version
+        transpile["CHUNK_PREFIX"] = str(version)
+        rspack_cache = None
+        cache_hits = cache_modules = None
+        exceeded = []
+        if not options["no_cache"] and getattr(
+            settings,
+            "TRANSPILE_RSPACK_CACHE",
+            True,
+        ):
+            rspack_cache = RspackCache(
+                RSPACK_CACHE_PATH,
+                getattr(settings, "TRANSPILE_RSPACK_CACHE_MAX_SIZE", 500 * 1024 * 1024),
+                getattr(settings, "TRANSPILE_RSPACK_CACHE_MAX_AGE", 30 * 24 * 60 * 60),
+            )
+            cache_version = get_cache_version(config_digest, LOCKFILE_PATH)
+            transpile["CACHE_VERSION"] = cache_version
+            transpile["CACHE_DIR"] = rspack_cache.get_dir(cache_version, "default")
+        if (
+            not force
+            and build_state.get("key") == build_key
+            and self.outputs_intact(transpile_path, entries)
+        ):
+            # Sources may have been touched or moved without changing their
+            # content, so the index is updated but rspack does not need to run.
+            source_index.save()
+            import_graph.save()
+            self.stdout.write("Outputs are up to date, rspack not needed.")
+            return self.finish(
+                trace,
+                options,
+                "up-to-date",
+                entries=len(entries),
+                sources=len(source_index.files),
+            )
+        output_dirs = OutputDirs(
+            transpile_path,
+            OUTPUTS_PATH,
+            getattr(settings, "TRANSPILE_OUTPUT_VERSIONS", 3),
+        )
+        restored = None
+        if not force and not options["no_cache"]:
+            with trace.phase("restore") as counts:
+                restored = self.restore_build(build_cache, build_key, output_dirs)
+                counts["hit"] = restored is not None
+        if restored:
+            path, meta = restored
+            out_dir = os.path.join(path, "js/")
+            self.stdout.write("Restored build %s from the build cache" % build_key)
+            self.set_version(meta["version"])
+            with trace.phase("manifest") as counts:
+                manifest = build_manifest(
+                    out_dir,
+                    meta.get("entrypoints", {}),
+                    lazy_chunks=meta.get("lazy_chunks", {}),
+                )
+                counts["files"] = len(manifest["files"])
+                counts["bytes"] = sum(x["size"] for x in manifest["files"].values())
+            if compress_formats:
+                self.compress_outputs(out_dir, manifest, compress_formats, trace)
+            self.activate_outputs(output_dirs, path, manifest, trace)
+            source_index.save()
+            import_graph.save()
+            write_json_atomic(
+                BUILD_STATE_PATH,
+                {
+                    "config": config_digest,
+                    "entries": entries,
+                    "entry_sizes": meta.get("entry_sizes", {}),
+                    "version": meta["version"],
+                    "entrypoints": meta.get("entrypoints", {}),
+                    "lazy_chunks": meta.get("lazy_chunks", {}),
+                    "key": build_key,
+                },
+            )
+            return self.finish(
+                trace,
+                options,
+                "restored",
+                entries=len(entries),
+                sources=len(source_index.files),
+            )
+        if version_mode == "time":
+            set_last_run("transpile", start)
+        build_entries = None
+        if not force and not npm_install:
+            build_entries = self.select_entries(
+                entries,
+                out_dir,
+                cache_path,
+                build_state,
+                config_digest,
+                import_graph,
+                staging,
+            )
+        if build_entries is not None and not self.outputs_intact(transpile_path, {}):
+            # Outputs of the last build have been removed or changed since,
+            # so they cannot be kept.
+            build_entries = None
+        if build_entries is None:
+            # A complete build starts from an empty output dir.
+            path = output_dirs.create()
+        else:
+            # The outputs of the entries that are not rebuilt are kept.
+            path = output_dirs.create(list(load_manifest(MANIFEST_PATH)["files"]))
+            self.stdout.write(
+                "Rebuilding %d of %d entries: %s"
+                % (len(build_entries), len(entries), ", ".join(sorted(build_entries))),
+            )
+            transpile["ENTRIES"] = {
+                name: path for name, path in entries.items() if name in build_entries
+            }
+            transpile["UNIQUE_NAME"] = get_unique_name(transpile["ENTRIES"])
+        out_dir = self.create_out_dir(path)
+        transpile["OUT_DIR"] = out_dir
+        remove_build_reports()
+        jobs = options["jobs"] or getattr(settings, "TRANSPILE_JOBS", 1)
+        entry_sizes = build_state.get("entry_sizes", {})
+        shards = split_entries(transpile["ENTRIES"], entry_sizes, jobs)
+        with trace.phase("rspack") as counts:
+            counts["entries"] = len(transpile["ENTRIES"])
+            counts["processes"] = len(shards)
+            if len(shards) > 1:
+                returncode = self.run_shards(transpile, shards)
+            else:
+                self.write_rspack_config(self.render_rspack_config(transpile))
+                returncode = call(
+                    ["./node_modules/.bin/rspack"],
+                    cwd=TRANSPILE_CACHE_PATH,
+                )
+            counts["returncode"] = returncode
+        if returncode == 0:
+            if rspack_cache:
+                cache_hits, cache_modules = self.report_rspack_cache(
+                    rspack_cache,
+                    cache_version,
+                )
+            if version_mode == "outputs":
+                with trace.phase("versioning"):
+                    previous_version = None
+                    if build_entries is not None:
+                        # Outputs that were not rebuilt contain the old version.
+                        previous_version = build_state.get("version")
+                    version = get_output_version(out_dir, previous_version)
+                    apply_version(out_dir, version, previous_version)
+            with trace.phase("bundle_analysis") as counts:
+                replacements = []
+                if version_mode == "outputs":
+                    replacements.append((str(VERSION_PLACEHOLDER), str(version)))
+                exceeded = self.report_bundles(
+                    out_dir,
+                    entries,
+                    replacements,
+                    options["verbosity"],
+                )
+                counts["exceeded"] = len(exceeded)
+            if exceeded and options["strict"]:
+                # The outputs are neither used nor recorded, so that the next
+                # run builds and checks them again.
+                returncode = 1
+        if returncode == 0:
+            # Only store the index and the build state once the build has
+            # succeeded so that a failed or interrupted build is repeated next
+            # time.
+            source_index.save()
+            import_graph.save()
+            if version_mode != "time":
+                self.set_version(version)
+            entrypoints = {}
+            lazy_chunks = {}
+            if build_entries is not None:
+                entrypoints = {
+                    name: files
+                    for name, files in build_state.get("entrypoints", {}).items()
+                    if name in entries
+                }
+                lazy_chunks = {
+                    name: files
+                    for name, files in build_state.get("lazy_chunks", {}).items()
+                    if name in entries
+                }
+            entrypoints.update(load_entrypoints())
+            lazy_chunks.update(load_entrypoints("lazy_chunks"))
+            with trace.phase("manifest") as counts:
+                manifest = build_manifest(
+                    out_dir,
+                    entrypoints,
+                    lazy_chunks=lazy_chunks,
+                )
+                counts["files"] = len(manifest["files"])
+                counts["bytes"] = sum(x["size"] for x in manifest["files"].values())
+            if compress_formats:
+                self.compress_outputs(out_dir, manifest, compress_formats, trace)
+            for name in entries:
+                try:
+                    entry_sizes[name] = os.path.getsize(
+                        os.path.join(out_dir, name + ".js"),
+                    )
+                except OSError:
+                    pass
+            if build_cache and build_entries is None:
+                # Only complete builds are stored, as the outputs of a partial
+                # build depend on the builds before it.
+                with trace.phase("build_cache_store"):
+                    build_cache.store(
+                        build_key,
+                        out_dir,
+                        {
+                            "version": version,
+                            "entrypoints": entrypoints,
+                            "lazy_chunks": lazy_chunks,
+                            "entry_sizes": {
+                                x: entry_sizes[x] for x in entries if x in entry_sizes
+                            },
+                        },
+                    )
+            self.activate_outputs(output_dirs, path, manifest, trace)
+            write_json_atomic(
+                BUILD_STATE_PATH,
+                {
+                    "config": config_digest,
+                    "entries": entries,
+                    "entry_sizes": {
+                        x: entry_sizes[x] for x in entries if x in entry_sizes
+                    },
+                    "version": version,
+                    "entrypoints": entrypoints,
+                    "lazy_chunks": lazy_chunks,
+                    "key": build_key,
+                },
+            )
+        else:
+            output_dirs.discard(path)
+        if returncode != 0:
+            kind = "failed"
+        elif build_entries is None:
+            kind = "full"
+        else:
+            kind = "partial"
+        self.finish(
+            trace,
+            options,
+            kind,
+            entries=len(entries),
+            sources=len(source_index.files),
+            cache_hits=cache_hits,
+            cache_modules=cache_modules,
+        )
+        if exceeded and options["strict"]:
+            raise CommandError(
+                "%d entries exceed their size budgets." % len(exceeded),
+            )
+
+    def finish(self, trace, options, kind, **values):
+        """
+        Write the timing report of the run, add it to the build history and,
+        if something was built, send the post_transpile signal with the timed
+        phases.
+        """
+        trace.write_report(BUILD_REPORT_PATH)
+        if options["trace"]:
+            trace.write_trace(options["trace"])
+        if options["verbosity"] > 1:
+            for phase in trace.phases:
+                self.stdout.write(
+                    f"{phase['name']}: {phase['duration']:.3f} seconds",
+                )
+        add_history(
+            "transpile",
+            kind,
+            trace,
+            self.stdout,
+            output_bytes=get_entry_bytes(load_manifest(MANIFEST_PATH)),
+            **values,
+        )
+        if kind not in ("unchanged", "up-to-date"):
+            self.stdout.write("Time spent transpiling: %.2f seconds" % trace.duration)
+            signals.post_transpile.send(sender=None, phases=list(trace.phases))
+
+    def run_shards(self, transpile, shards):
+        """
+        Build every group of entries in shards with its own rspack process,
+        all of them running at the same time. Returns 0 if all succeeded.
+        """
+        for old_config_path in glob.glob(
+            os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.shard-*.js"),
+        ):
+            os.remove(old_config_path)
+        processes = []
+        for number, shard_entries in enumerate(shards, 1):
+            config_path = os.path.join(
+                TRANSPILE_CACHE_PATH,
+                "rspack.config.shard-%d.js" % number,
+            )
+            shard_transpile = {
+                **transpile,
+                "ENTRIES": shard_entries,
+                "UNIQUE_NAME": get_unique_name(shard_entries),
+                # Chunk ids are only unique within one shard.
+                "CHUNK_PREFIX": "%s-%d" % (transpile["VERSION"], number),
+                "ENTRYPOINTS_PATH": os.path.join(
+                    TRANSPILE_CACHE_PATH,
+                    "entrypoints.shard-%d.json" % number,
+                ),
+                "LAZY_CHUNKS_PATH": os.path.join(
+                    TRANSPILE_CACHE_PATH,
+                    "lazy_chunks.shard-%d.json" % number,
+                ),
+                "CACHE_STATS_PATH": os.path.join(
+                    TRANSPILE_CACHE_PATH,
+                    "cache_stats.shard-%d.json" % number,
+                ),
+            }
+            if transpile["STATS_PATH"]:
+                shard_transpile["STATS_PATH"] = os.path.join(
+                    TRANSPILE_CACHE_PATH,
+                    "stats.shard-%d.json" % number,
+                )
+            if transpile["CACHE_DIR"]:
+                # Processes running at the same time cannot share a cache.
+                shard_transpile["CACHE_DIR"] = os.path.join(
+                    os.path.dirname(transpile["CACHE_DIR"]),
+                    "shard-%d" % number,
+                )
+                os.makedirs(shard_transpile["CACHE_DIR"], exist_ok=True)
+            with open(config_path, "w") as f:
+                f.write(self.render_rspack_config(shard_transpile))
+            processes.append(
+                (
+                    number,
+                    shard_entries,
+                    time.perf_counter(),
+                    subprocess.Popen(
+                        ["./node_modules/.bin/rspack", "--config", config_path],
+                        cwd=TRANSPILE_CACHE_PATH,
+                    ),
+                ),
+            )
+        returncode = 0
+        while processes:
+            time.sleep(0.05)
+            for shard in list(processes):
+                number, shard_entries, shard_start, process = shard
+                shard_returncode = process.poll()
+                if shard_returncode is None:
+                    continue
+                processes.remove(shard)
+                returncode = returncode or shard_returncode
+                self.stdout.write(
+                    "Shard %d/%d (%s): %.2f seconds%s"
+                    % (
+                        number,
+                        len(shards),
+                        ", ".join(shard_entries),
+                        time.perf_counter() - shard_start,
+                        "" if shard_returncode == 0 else ", failed",
+                    ),
+                )
+        return returncode
+
+    def outputs_intact(self, transpile_path, entries):
+        """
+        Check that the files listed in the manifest of the last build, and
+        the files of all entries, still exist with the recorded size.
+        """
+        files = load_manifest(MANIFEST_PATH)["files"]
+        if any("js/%s.js" % name not in files for name in entries):
+            return False
+        for name, file_info in files.items():
+            try:
+                size = os.path.getsize(os.path.join(transpile_path, name))
+            except OSError:
+                return False
+            if size != file_info["size"]:
+                return False
+        return True
+
+    def report_rspack_cache(self, rspack_cache, cache_version):
+        cached, total = load_cache_stats(
+            glob.glob(os.path.join(TRANSPILE_CACHE_PATH, "cache_stats*.json")),
+        )
+        if total:
+            self.stdout.write(
+                "rspack cache: %d of %d modules restored (%d%%)"
+                % (cached, total, round(100 * cached / total)),
+            )
+        for version in rspack_cache.prune(cache_version):
+            self.stdout.write("Removed outdated rspack cache %s" % version)
+        return cached, total
+
+    def compress_outputs(self, out_dir, manifest, formats, trace):
+        """
+        Write compressed copies of the outputs next to them and add their
+        compression ratios to the build report.
+        """
+        files = {
+            name.split("/", 1)[1]: file_info
+            for name, file_info in manifest["files"].items()
+        }
+        with trace.phase("compression") as counts:
+            results = compress_outputs(
+                out_dir,
+                files,
+                formats,
+                COMPRESSION_CACHE_PATH,
+                getattr(settings, "TRANSPILE_COMPRESS_MIN_SIZE", 1024),
+                getattr(settings, "TRANSPILE_COMPRESS_JOBS", None),
+            )
+            counts["files"] = len(results)
+            counts["reused"] = len([x for x in results.values() if x["reused"]])
+        trace.results["compression"] = {
+            name: {
+                "size": files[name]["size"],
+                **{
+                    x: {
+                        "size": size,
+                        "ratio": round(size / max(files[name]["size"], 1), 3),
+                    }
+                    for x, size in result["sizes"].items()
+                },
+            }
+            for name, result in results.items()
+        }
+
+    def report_bundles(self, out_dir, entries, replacements, verbosity):
+        """
+        Report the sizes of the outputs of the build and the packages that are
+        bundled more than once. Returns the messages for exceeded budgets.
+        """
+        analysis = analyze_stats(
+            load_stats(glob.glob(os.path.join(TRANSPILE_CACHE_PATH, "stats*.json"))),
+            out_dir,
+            replacements,
+        )
+        write_json_atomic(BUNDLE_REPORT_PATH, analysis)
+        if verbosity > 1:
+            for name, entry in sorted(analysis["entries"].items()):
+                self.stdout.write(
+                    "Entry %s: %s (%s gzipped)"
+                    % (name, format_size(entry["size"]), format_size(entry["gzip"])),
+                )
+            for chunk in analysis["chunks"]:
+                self.stdout.write(
+                    "Chunk %s: %s (%s gzipped)"
+                    % (
+                        ", ".join(chunk["files"]),
+                        format_size(chunk["size"]),
+                        format_size(chunk["gzip"]),
+                    ),
+                )
+            self.stdout.write("Largest modules:")
+            for module in analysis["largest_modules"]:
+                self.stdout.write(
+                    f"  {module['name']}: {format_size(module['size'])}",
+                )
+        for name, duplicate in analysis["duplicates"].items():
+            self.stdout.write(
+                self.style.WARNING(
+                    "Bundled more than once: %s (%s) in %s"
+                    % (
+                        name,
+                        ", ".join(duplicate["copies"]),
+                        ", ".join(duplicate["entries"]) or "chunks loaded on demand",
+                    ),
+                ),
+            )
+        budgets = getattr(settings, "TRANSPILE_SIZE_BUDGETS", {})
+        for name in budgets:
+            if name not in entries:
+                self.stderr.write(
+                    self.style.WARNING(
+                        "TRANSPILE_SIZE_BUDGETS has a budget for the unknown "
+                        "entry %s." % name,
+                    ),
+                )
+        exceeded = check_budgets(analysis["entries"], budgets)
+        for message in exceeded:
+            self.stderr.write(self.style.WARNING(message))
+        return exceeded
+
+    def get_config_digest(self, transpile):
+        """
+        Return a digest of the rspack config apart from the values that
+        change with every build or with the selection of entries.
+        """
+        config_js = self.render_rspack_config(
+            {
+                **transpile,
+                "VERSION": 0,
+                "ENTRIES": {},
+                "UNIQUE_NAME": "",
+                "CHUNK_PREFIX": "",
+                "CACHE_DIR": "",
+                "CACHE_VERSION": "",
+                "STATS_PATH": "",
+            },
+        )
+        digest = hashlib.md5(config_js.encode("utf-8"))
+        # Settings that change the outputs without changing the config
+        for name, default in (
+            ("TRANSPILE_VERSION", "time"),
+            ("TRANSPILE_COMPRESS", False),
+            ("TRANSPILE_PLUGIN_INDEX", "eager"),
+        ):
+            digest.update(repr(getattr(settings, name, default)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def select_entries(
+        self,
+        entries,
+        out_dir,
+        cache_path,
+        build_state,
+        config_digest,
+        import_graph,
+        staging,
+    ):
+        """
+        Return the names of the entries that need to be rebuilt, or None if
+        all of them need to be rebuilt.
+        """
+        if build_state.get("config") != config_digest or staging.deleted:
+            return None
+        old_entries = build_state.get("entries", {})
+        if any(name not in entries for name in old_entries):
+            return None
+        build_entries = import_graph.affected(
+            staging.updated,
+            {
+                name: os.path.relpath(path, cache_path).replace(os.sep, "/")
+                for name, path in entries.items()
+            },
+        )
+        if build_entries is None:
+            return None
+        for name, path in entries.items():
+            if old_entries.get(name) != path or not os.path.exists(
+                os.path.join(out_dir, name + ".js"),
+            ):
+                build_entries.add(name)
+        if not build_entries:
+            # The changes reach no entry in a way that can be detected.
+            return None
+        return build_entries
+
+    def start_rspack_watch(self):
+        process = subprocess.Popen(
+            ["./node_modules/.bin/rspack", "--watch"],
+            cwd=TRANSPILE_CACHE_PATH,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+
+        def read_output():
+            # rspack reports every finished compilation, successful or not.
+            # Failed compilations keep the last outputs in use.
+            for line in process.stdout:
+                self.stdout.write(line.rstrip("\n"))
+                if compiled_successfully(line):
+                    # rspack itself is not timed here, as it rebuilds by
+                    # itself, so the manifest is the only phase.
+                    trace = BuildTrace()
+                    with trace.phase("manifest"):
+                        write_manifest(
+                            MANIFEST_PATH,
+                            os.path.join(PROJECT_PATH, "static-transpile", "js/"),
+                            load_entrypoints(),
+                            lazy_chunks=load_entrypoints("lazy_chunks"),
+                        )
+                    set_last_run("transpile", int(round(time.time())))
+                    signals.post_transpile.send(
+                        sender=None,
+                        phases=list(trace.phases),
+                    )
+
+        threading.Thread(target=read_output, daemon=True).start()
+        return process
+
+    def stop_rspack_watch(self, process):
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def watch(self, options):
+        transpile_path = os.path.join(PROJECT_PATH, "static-transpile")
+        cache_path = os.path.join(TRANSPILE_CACHE_PATH, "js/")
+        package_files = [
+            os.path.join(config.path, filename)
+            for config in apps.get_app_configs()
+            for filename in ["package.json", "package.json5"]
+        ]
+        settings_files = [x for x in SETTINGS_PATHS if not os.path.isdir(x)]
+        settings_dirs = [x for x in SETTINGS_PATHS if os.path.isdir(x)]
+        debounce = options["debounce"] / 1000
+        rspack_process = None
+        watcher = None
+        restart = True
+        # Make sure that the rspack process is stopped on SIGTERM as well.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            while True:
+                if restart:
+                    # (Re)start everything: npm dependencies, discovery,
+                    # staging, rspack config and the rspack watch process.
+                    if rspack_process:
+                        self.stop_rspack_watch(rspack_process)
+                    if watcher:
+                        watcher.close()
+                    install_npm(options["force"], self.stdout)
+                    options["force"] = False
+                    js_paths = self.find_js_paths(transpile_path)
+                    source_index = SourceIndex(SOURCE_INDEX_PATH)
+                    discovery = self.discover(
+                        js_paths,
+                        source_index,
+                        options["verbosity"],
+                    )
+                    out_dir = self.create_out_dir(transpile_path)
+                    self.stage_sources(discovery, source_index, cache_path, False)
+                    source_index.save()
+                    entries = self.get_entries(discovery, cache_path)
+                    self.write_rspack_config(
+                        self.render_rspack_config(
+                            self.get_transpile_vars(
+                                entries,
+                                out_dir,
+                                int(round(time.time())),
+                            ),
+                        ),
+                    )
+                    watcher = create_watcher(
+                        js_paths + settings_dirs,
+                        package_files + settings_files,
+                        options["poll"],
+                    )
+                    remove_build_reports()
+                    rspack_process = self.start_rspack_watch()
+                    self.stdout.write(
+                        "Watching %d folders for changes..." % len(js_paths),
+                    )
+                    restart = False
+                changed = wait_for_changes(watcher, debounce)
+                if any(
+                    path == x or path.startswith(x.rstrip(os.sep) + os.sep)
+                    for path in changed
+                    for x in SETTINGS_PATHS
+                ):
+                    # Settings cannot be reloaded in a running process.
+                    self.stdout.write("Settings changed, restarting...")
+                    self.stop_rspack_watch(rspack_process)
+                    watcher.close()
+                    args = autoreload.get_child_arguments()
+                    os.execv(args[0], args)
+                if any(path in package_files for path in changed):
+                    self.stdout.write("Package files changed.")
+                    restart = True
+                    continue
+                if rspack_process.poll() is not None:
+                    self.stdout.write("rspack stopped, restarting...")
+                    restart = True
+                    continue
+                discovery = self.discover(
+                    js_paths,
+                    source_index,
+                    options["verbosity"],
+                )
+                if not discovery.changes:
+                    continue
+                # rspack notices the changed files in the staging dir by itself.
+                self.stage_sources(discovery, source_index, cache_path, False)
+                source_index.save()
+                if self.get_entries(discovery, cache_path) != entries:
+                    self.stdout.write("Entries changed.")
+                    restart = True
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if rspack_process:
+                self.stop_rspack_watch(rspack_process)
+            if watcher:
+                watcher.close()
@@ -0,0 +1,109 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand
+
+from npm_mjs.bundle_stats import format_size
+from npm_mjs.history import BuildHistory
+from npm_mjs.history import find_regressions
+from npm_mjs.paths import HISTORY_PATH
+
+
+class Command(BaseCommand):
+    help = (
+        "List recent transpile and npm_install runs and point out durations "
+        "and output sizes that regressed against the runs before them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            dest="limit",
+            default=20,
+            help="Number of runs to list.",
+        )
+        parser.add_argument(
+            "--command",
+            dest="command",
+            choices=["transpile", "npm_install"],
+            default=None,
+            help="Only list runs of this command.",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=int,
+            dest="baseline",
+            default=5,
+            help="Number of earlier runs whose median is the baseline.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            dest="threshold",
+            default=30,
+            help="Percentage above the baseline that counts as a regression.",
+        )
+        parser.add_argument(
+            "--regressions",
+            action="store_true",
+            dest="regressions",
+            default=False,
+            help="Only list runs with regressions.",
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(HISTORY_PATH):
+            self.stdout.write("No builds have been recorded yet.")
+            return
+        builds = BuildHistory(HISTORY_PATH).get_builds(options["command"])
+        regressions = find_regressions(
+            builds,
+            options["baseline"],
+            options["threshold"] / 100,
+        )
+        if options["regressions"]:
+            builds = [x for x in builds if x["id"] in regressions]
+        limit = options["limit"]
+        for build in builds[-limit:]:
+            self.stdout.write(self.format_build(build))
+            for what, value, baseline in regressions.get(build["id"], []):
+                if what == "duration":
+                    formatted = ("%.2fs" % value, "%.2fs" % baseline)
+                else:
+                    formatted = (format_size(value), format_size(baseline))
+                self.stdout.write(
+                    self.style.WARNING(
+                        "    %s: %s, %d%% above the baseline of %s"
+                        % (
+                            what,
+                            formatted[0],
+                            round(100 * (value - baseline) / baseline),
+                            formatted[1],
+                        ),
+                    ),
+                )
+
+    def format_build(self, build):
+        started = datetime.datetime.fromtimestamp(build["started"])
+        parts = [
+            "#%d" % build["id"],
+            started.strftime("%Y-%m-%d %H:%M:%S"),
+            build["command"],
+            build["kind"],
+            "%.2fs" % build["duration"],
+        ]
+        if build["entries"] is not None:
+            parts.append("%d entries" % build["entries"])
+        if build["sources"] is not None:
+            parts.append("%d sources" % build["sources"])
+        if build["output_bytes"]:
+            parts.append(format_size(sum(build["output_bytes"].values())))
+        if build["cache_modules"]:
+            parts.append(
+                "cache %d%%"
+                % round(100 * build["cache_hits"] / build["cache_modules"]),
+            )
+        if build["revision"]:
+            parts.append(build["revision"])
+        return "  ".join(parts)
@@ -0,0 +1,139 @@
+"""
+Manifest of the files generated by ./manage.py transpile.
+
+After every build, the content hash and size of every file in the output dir
+are written to .transpile/manifest.json. The static template tag uses it to
+give every generated file its own ?v= query string, so that a change to one
+entry file does not invalidate the cached copies of all other files. It
+also lists the files that have to be loaded for every entry, in order, for
+the transpile_scripts template tag, and the chunks that every entry loads on
+demand, which the transpile_preload template tag preloads.
+
+The manifest is read once per process and read again only when the file on
+disk changes.
+"""
+
+import json
+import os
+import posixpath
+
+from .compression import SIDECAR_EXTENSIONS
+from .stat_cache import get_signature
+from .utils import hash_file
+from .utils import write_json_atomic
+
+MANIFEST_VERSION = 1
+
+# Length of the hash prefix used in URLs.
+HASH_LENGTH = 12
+
+# path -> (stat signature, manifest)
+_manifests: dict[str, tuple[tuple | None, dict]] = {}
+
+
+def write_manifest(
+    path: str,
+    out_dir: str,
+    entrypoints: dict[str, list[str]] | None = None,
+    prefix: str = "js/",
+    lazy_chunks: dict[str, list[str]] | None = None,
+) -> dict:
+    """
+    Write the manifest for the files in out_dir. Their names in the
+    manifest are relative to the static root, which out_dir is at prefix.
+    entrypoints maps entry names to the files in out_dir that they consist
+    of, lazy_chunks to the files that they load on demand.
+    """
+    manifest = build_manifest(out_dir, entrypoints, prefix, lazy_chunks)
+    write_json_atomic(path, manifest)
+    return manifest
+
+
+def build_manifest(
+    out_dir: str,
+    entrypoints: dict[str, list[str]] | None = None,
+    prefix: str = "js/",
+    lazy_chunks: dict[str, list[str]] | None = None,
+) -> dict:
+    """Return the manifest for the files in out_dir without writing it."""
+    files = {}
+    for root, _dirnames, filenames in os.walk(out_dir):
+        for filename in filenames:
+            if filename.endswith(SIDECAR_EXTENSIONS):
+                # Compressed copies are served in place of their file.
+                continue
+            file_path = os.path.join(root, filename)
+            name = posixpath.join(
+                prefix,
+                os.path.relpath(file_path, out_dir).replace(os.sep, "/"),
+            )
+            files[name] = {
+                "hash": hash_file(file_path)[:HASH_LENGTH],
+                "size": os.path.getsize(file_path),
+            }
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "files": files,
+        "entrypoints": {
+            name: [posixpath.join(prefix, x) for x in entry_files]
+            for name, entry_files in (entrypoints or {}).items()
+        },
+        "lazy_chunks": {
+            name: [posixpath.join(prefix, x) for x in chunk_files]
+            for name, chunk_files in (lazy_chunks or {}).items()
+        },
+    }
+    return manifest
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Return the manifest at path, reading it again if it has changed since it
+    was last read.
+    """
+    signature = get_signature(path)
+    cached = _manifests.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    manifest = {"files": {}, "entrypoints": {}, "lazy_chunks": {}}
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if data.get("version") == MANIFEST_VERSION:
+        manifest["files"] = data.get("files", {})
+        manifest["entrypoints"] = data.get("entrypoints", {})
+        manifest["lazy_chunks"] = data.get("lazy_chunks", {})
+    _manifests[path] = (signature, manifest)
+    return manifest
+
+
+def get_file_hash(path: str, name: str) -> str | None:
+    """
+    Return the hash of the generated file name in the manifest at path or
+    None if it is not known.
+    """
+    entry = load_manifest(path)["files"].get(name)
+    return entry["hash"] if entry else None
+
+
+def get_entrypoint_files(path: str, name: str) -> list[str] | None:
+    """
+    Return the generated files that make up the entry name, relative to the
+    static root, or None if they are not known.
+    """
+    return load_manifest(path)["entrypoints"].get(name)
+
+
+def get_preload_files(path: str, name: str) -> list[str]:
+    """
+    Return the files that the entry name loads, directly or on demand,
+    relative to the static root.
+    """
+    manifest = load_manifest(path)
+    files = list(manifest["entrypoints"].get(name, []))
+    for file_path in manifest["lazy_chunks"].get(name, []):
+        if file_path not in files:
+            files.append(file_path)
+    return files
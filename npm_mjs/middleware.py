@@ -0,0 +1,83 @@
+"""
+Link headers for the transpiled entries that a response refers to.
+
+TranspileLinkMiddleware records the paths that the static, transpile_scripts
+and transpile_preload template tags render while a response is created. For
+every transpiled entry among them, it adds the files that the entry needs
+to the Link header of the response with rel=preload, so that a CDN or proxy
+can send them to the browser as 103 Early Hints before the page itself.
+
+The Link header values are computed from the manifest once and kept until
+transpile replaces the manifest or the time file. Like the URLs of the
+static tag, they are checked for changes at most once every
+TRANSPILE_STATIC_CHECK_INTERVAL seconds, so most requests do not touch the
+file system.
+"""
+
+import posixpath
+
+from django.conf import settings
+
+from npm_mjs.manifest import load_manifest
+from npm_mjs.paths import MANIFEST_PATH
+from npm_mjs.paths import TRANSPILE_TIME_PATH
+from npm_mjs.stat_cache import StatCache
+from npm_mjs.templatetags.transpile import get_static_url
+from npm_mjs.templatetags.transpile import referenced_paths
+
+
+def get_entry_links():
+    """
+    Return the preload links of the files of every entry, by the path of the
+    entry file.
+    """
+    manifest = load_manifest(MANIFEST_PATH)
+    entry_links = {}
+    for name, files in manifest["entrypoints"].items():
+        # The URLs are computed directly, as the URL cache of the static tag
+        # may not have noticed a new manifest yet.
+        entry_links[posixpath.join("js", name + ".js")] = [
+            "<%s>; rel=preload; as=script" % get_static_url(x)[1] for x in files
+        ]
+    return entry_links
+
+
+class TranspileLinkMiddleware:
+    """
+    Usage::
+        MIDDLEWARE = [
+            ...
+            "npm_mjs.middleware.TranspileLinkMiddleware",
+        ]
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # The links contain the ?v= values of the static tag, which change
+        # with the time file as well as with the manifest.
+        self.entry_links = StatCache(
+            [TRANSPILE_TIME_PATH, MANIFEST_PATH],
+            max_size=1,
+            interval=getattr(settings, "TRANSPILE_STATIC_CHECK_INTERVAL", 1),
+        )
+
+    def __call__(self, request):
+        token = referenced_paths.set([])
+        try:
+            response = self.get_response(request)
+            paths = referenced_paths.get()
+        finally:
+            referenced_paths.reset(token)
+        if not paths or response.streaming:
+            return response
+        entry_links = self.entry_links.get(None, lambda key: get_entry_links())
+        links = []
+        for path in paths:
+            for link in entry_links.get(path, []):
+                if link not in links:
+                    links.append(link)
+        if links:
+            if response.has_header("Link"):
+                links.insert(0, response["Link"])
+            response["Link"] = ", ".join(links)
+        return response
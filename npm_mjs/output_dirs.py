@@ -0,0 +1,128 @@
+"""
+Versioned output dirs of transpile.
+
+Every build writes its outputs to a new folder in .transpile/outputs instead
+of deleting and refilling static-transpile. Once the build has succeeded,
+static-transpile, which is a symlink to the current folder, is switched to
+the new folder with an atomic rename, so a server that serves the outputs
+never sees a missing or half written file. A failed build leaves the
+previous outputs in place.
+
+The last few folders are kept. When a folder is activated, the files of the
+kept older builds that it does not contain are copied into it, so that
+pages that were loaded before the switch can still load the chunks that
+they request on demand. Older folders are removed.
+"""
+
+import json
+import os
+import shutil
+import time
+
+from .utils import copy_file
+from .utils import replacing
+from .utils import write_json_atomic
+
+
+class OutputDirs:
+    """
+    Usage::
+        output_dirs = OutputDirs(transpile_path, OUTPUTS_PATH, keep=3)
+        path = output_dirs.create()
+        ... build into path ...
+        output_dirs.activate(path, files)
+
+    Args:
+        link_path: The symlink that points to the current outputs
+        versions_path: Folder with one folder per build
+        keep: Number of folders that are kept, including the current one
+    """
+
+    def __init__(self, link_path: str, versions_path: str, keep: int = 3):
+        self.link_path = link_path.rstrip(os.sep)
+        self.versions_path = versions_path
+        self.keep = max(keep, 1)
+        self.index_path = os.path.join(versions_path, "index.json")
+
+    def get_current(self) -> str | None:
+        """Return the folder that link_path points to, if it is a symlink."""
+        if not os.path.islink(self.link_path):
+            return None
+        return os.path.realpath(self.link_path)
+
+    def load_index(self) -> dict[str, list[str]]:
+        # Folder name -> files of the build in it
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def create(self, files: list[str] = ()) -> str:
+        """
+        Create the folder for a new build and copy the given files of the
+        current outputs into it, for a build that only replaces some of them.
+        """
+        os.makedirs(self.versions_path, exist_ok=True)
+        path = os.path.join(self.versions_path, str(time.time_ns()))
+        os.makedirs(path)
+        for name in files:
+            dst = os.path.join(path, name)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            copy_file(os.path.join(self.link_path, name), dst)
+        return path
+
+    def discard(self, path: str) -> None:
+        """Remove the folder of a build that has failed."""
+        shutil.rmtree(path, ignore_errors=True)
+
+    def activate(self, path: str, files: list[str]) -> int:
+        """
+        Make path, with the given files of its build, the current outputs and
+        remove the folders that are no longer kept. Returns the number of
+        files of older builds that were copied into path.
+        """
+        index = self.load_index()
+        kept = sorted(
+            (x for x in index if os.path.isdir(os.path.join(self.versions_path, x))),
+            reverse=True,
+        )[: self.keep - 1]
+        carried = 0
+        for name in kept:
+            for file_name in index[name]:
+                dst = os.path.join(path, file_name)
+                if os.path.exists(dst):
+                    continue
+                src = os.path.join(self.versions_path, name, file_name)
+                try:
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    copy_file(src, dst)
+                except OSError:
+                    continue
+                carried += 1
+        index = {x: index[x] for x in kept}
+        index[os.path.basename(path)] = sorted(files)
+        write_json_atomic(self.index_path, index)
+        target = os.path.relpath(path, os.path.dirname(self.link_path))
+        with replacing(self.link_path) as tmp_path:
+            # The symlink takes the name of the temporary file.
+            os.remove(tmp_path)
+            os.symlink(target, tmp_path)
+            if os.path.isdir(self.link_path) and not os.path.islink(self.link_path):
+                # Output dir of a version that did not keep versions
+                shutil.rmtree(self.link_path)
+        self.prune(index)
+        return carried
+
+    def prune(self, index: dict[str, list[str]]) -> None:
+        """Remove all folders that are not in index."""
+        current = self.get_current()
+        for name in os.listdir(self.versions_path):
+            path = os.path.join(self.versions_path, name)
+            if (
+                name in index
+                or os.path.realpath(path) == current
+                or not os.path.isdir(path)
+            ):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
@@ -8,6 +8,26 @@ PROJECT_PATH = str(
 
 TRANSPILE_CACHE_PATH = os.path.join(PROJECT_PATH, ".transpile/")
 TRANSPILE_TIME_PATH = os.path.join(TRANSPILE_CACHE_PATH, "time")
+SOURCE_INDEX_PATH = os.path.join(TRANSPILE_CACHE_PATH, "source_index.json")
+STAGING_MANIFEST_PATH = os.path.join(TRANSPILE_CACHE_PATH, "staging.json")
+STAGED_SOURCES_PATH = os.path.join(TRANSPILE_CACHE_PATH, "sources.json")
+IMPORT_GRAPH_PATH = os.path.join(TRANSPILE_CACHE_PATH, "import_graph.json")
+BUILD_STATE_PATH = os.path.join(TRANSPILE_CACHE_PATH, "build.json")
+BUILD_REPORT_PATH = os.path.join(TRANSPILE_CACHE_PATH, "build_report.json")
+HISTORY_PATH = os.path.join(TRANSPILE_CACHE_PATH, "history.sqlite3")
+BUILD_LOCK_PATH = os.path.join(TRANSPILE_CACHE_PATH, "build.lock")
+BUILD_CACHE_PATH = os.path.join(TRANSPILE_CACHE_PATH, "build-cache")
+MANIFEST_PATH = os.path.join(TRANSPILE_CACHE_PATH, "manifest.json")
+ENTRYPOINTS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "entrypoints.json")
+LAZY_CHUNKS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "lazy_chunks.json")
+CACHE_STATS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "cache_stats.json")
+STATS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "stats.json")
+BUNDLE_REPORT_PATH = os.path.join(TRANSPILE_CACHE_PATH, "bundle_report.json")
+STATIC_LISTING_PATH = os.path.join(TRANSPILE_CACHE_PATH, "static_listing.json")
+COMPRESSION_CACHE_PATH = os.path.join(TRANSPILE_CACHE_PATH, "compressed")
+OUTPUTS_PATH = os.path.join(TRANSPILE_CACHE_PATH, "outputs")
+RSPACK_CACHE_PATH = os.path.join(TRANSPILE_CACHE_PATH, "rspack-cache")
+LOCKFILE_PATH = os.path.join(TRANSPILE_CACHE_PATH, "pnpm-lock.yaml")
 
 SETTINGS_PATHS = [str(x) for x in getattr(settings, "SETTINGS_PATHS", [])]
 
@@ -0,0 +1,47 @@
+"""
+The index.js files that transpile writes for every plugins/<name>/ folder.
+
+The "eager" format, the default, re-exports everything of every plugin
+module, so all plugins are bundled into every entry that imports the folder.
+The "lazy" format exports a registry of loaders instead, one per module,
+which import the module on demand, so that rspack puts every plugin in a
+chunk of its own that is only loaded on the pages that use it::
+
+    import {plugins, meta} from "../plugins/menu"
+    const {default: Plugin} = await plugins.items()
+
+A module can have metadata in a <module>.meta.json file next to it, which
+the lazy format exports without loading the module, for example to decide
+whether to load it at all.
+"""
+
+import json
+
+PLUGIN_INDEX_FORMATS = ("eager", "lazy")
+
+
+def render_plugin_index(
+    plugin_dir: str,
+    module_names: list[str],
+    meta_names: list[str] = (),
+    index_format: str = "eager",
+) -> str:
+    """Return the index.js of the plugin dir plugin_dir."""
+    if index_format == "eager":
+        return "".join('export * from "./%s"\n' % x for x in module_names)
+    index_js = ""
+    meta_names = [x for x in meta_names if x in module_names]
+    for number, module_name in enumerate(meta_names):
+        index_js += f'import meta{number} from "./{module_name}.meta.json"\n'
+    index_js += "export const plugins = {\n"
+    for module_name in module_names:
+        chunk_name = f"{plugin_dir}/{module_name}"
+        index_js += (
+            f"    {json.dumps(module_name)}: () => "
+            f'import(/* webpackChunkName: {json.dumps(chunk_name)} */ "./{module_name}"),\n'
+        )
+    index_js += "}\nexport const meta = {\n"
+    for number, module_name in enumerate(meta_names):
+        index_js += f"    {json.dumps(module_name)}: meta{number},\n"
+    index_js += "}\n"
+    return index_js
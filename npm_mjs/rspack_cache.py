@@ -0,0 +1,124 @@
+"""
+Persistent rspack cache kept in the .transpile folder.
+
+rspack stores what it learned about every module in a folder that survives
+between runs, so that unchanged modules are not built again. Every cache
+version gets a folder of its own below the cache root. The version is
+derived from the rendered rspack config, which covers the config template
+and the settings, and from the lockfile, so a cache is never used with
+different dependencies or options. Folders of older versions are removed
+once they are too old or take up too much space, least recently used first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .utils import hash_file
+
+
+def get_cache_version(config_digest: str, lockfile_path: str) -> str:
+    """Return the version of the rspack cache for a config and a lockfile."""
+    version = hashlib.md5(config_digest.encode())
+    if os.path.isfile(lockfile_path):
+        version.update(hash_file(lockfile_path).encode())
+    return version.hexdigest()
+
+
+def get_dir_size(path: str) -> int:
+    size = 0
+    for root, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class RspackCache:
+    """
+    Usage::
+        cache = RspackCache(RSPACK_CACHE_PATH)
+        cache_dir = cache.get_dir(version, "default")
+        ...  # run rspack with cache_dir
+        cache.prune(version)
+
+    Args:
+        path: Folder that contains one folder per cache version
+        max_size: Bytes that the folders of older versions may take up
+        max_age: Seconds after the last use at which a folder is removed
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 500 * 1024 * 1024,
+        max_age: int = 30 * 24 * 60 * 60,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get_dir(self, version: str, name: str) -> str:
+        """
+        Return the cache folder of version for the rspack process name and
+        mark the version as recently used.
+        """
+        version_dir = os.path.join(self.path, version)
+        cache_dir = os.path.join(version_dir, name)
+        os.makedirs(cache_dir, exist_ok=True)
+        os.utime(version_dir)
+        return cache_dir
+
+    def prune(self, current_version: str) -> list[str]:
+        """
+        Remove the folders of versions other than current_version that have
+        not been used for max_age seconds, and then the least recently used
+        ones until the rest fits into max_size. Returns the removed versions.
+        """
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        versions = []
+        for name in names:
+            version_dir = os.path.join(self.path, name)
+            if name == current_version or not os.path.isdir(version_dir):
+                continue
+            versions.append((os.stat(version_dir).st_mtime, name))
+        # Most recently used first
+        versions.sort(reverse=True)
+        removed = []
+        total_size = 0
+        now = time.time()
+        for mtime, name in versions:
+            version_dir = os.path.join(self.path, name)
+            if now - mtime <= self.max_age:
+                size = get_dir_size(version_dir)
+                if total_size + size <= self.max_size:
+                    total_size += size
+                    continue
+            shutil.rmtree(version_dir, ignore_errors=True)
+            removed.append(name)
+        return removed
+
+
+def load_cache_stats(paths: list[str]) -> tuple[int, int]:
+    """
+    Return the number of modules that were restored from the cache and the
+    total number of modules, as written by the rspack processes of a build.
+    """
+    cached = 0
+    total = 0
+    for path in paths:
+        try:
+            with open(path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        cached += stats.get("cached", 0)
+        total += stats.get("modules", 0)
+    return cached, total
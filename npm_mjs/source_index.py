@@ -0,0 +1,177 @@
+"""
+Persistent index of the source files that transpile works on.
+
+For every source file the index stores its size, modification time and a
+hash of its content. For every directory it stores the modification time and
+the names it contained. A scan stats the directories first and only lists the
+ones whose modification time changed. Files are re-hashed only if their size
+or modification time differ from what is stored, so an unchanged tree costs
+one stat per file and no reads.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from .utils import hash_file
+from .utils import write_json_atomic
+
+INDEX_VERSION = 1
+
+
+class Changes(NamedTuple):
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self):
+        return "%d added, %d changed, %d removed" % (
+            len(self.added),
+            len(self.changed),
+            len(self.removed),
+        )
+
+
+class SourceIndex:
+    """
+    Index of (path, size, mtime, hash) for all files below a set of roots.
+
+    Usage::
+        index = SourceIndex(SOURCE_INDEX_PATH)
+        changes = index.scan(js_paths)
+        ...  # build
+        index.save()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # file path -> [size, mtime_ns, hash]
+        self.files: dict[str, list] = {}
+        # dir path -> [mtime_ns, [subdir names], [file names]]
+        self.dirs: dict[str, list] = {}
+        # root -> file paths found below the root during the last scan
+        self.roots: dict[str, list[str]] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.files = data.get("files", {})
+        self.dirs = data.get("dirs", {})
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        write_json_atomic(
+            self.path,
+            {"version": INDEX_VERSION, "files": self.files, "dirs": self.dirs},
+        )
+
+    def _list_dir(self, dir_path: str) -> tuple[list[str], list[str]] | None:
+        """
+        Return the subdirectory and file names of dir_path, reusing the
+        stored listing if the directory has not been modified since.
+        """
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.dirs.get(dir_path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+        subdirs = []
+        filenames = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    filenames.append(entry.name)
+        subdirs.sort()
+        filenames.sort()
+        self.dirs[dir_path] = [mtime, subdirs, filenames]
+        return subdirs, filenames
+
+    def _walk(self, root: str, seen_dirs: set[str]) -> list[str]:
+        """Return the paths of all files below root in a stable order."""
+        files = []
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            if dir_path in seen_dirs:
+                continue
+            listing = self._list_dir(dir_path)
+            if listing is None:
+                continue
+            seen_dirs.add(dir_path)
+            subdirs, filenames = listing
+            files += [os.path.join(dir_path, x) for x in filenames]
+            stack.extend(os.path.join(dir_path, x) for x in reversed(subdirs))
+        return files
+
+    def _check_file(self, file_path: str) -> list | None:
+        """
+        Return the up to date index entry of file_path, or None if the file
+        has disappeared. The file is only hashed if it looks different.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        entry = self.files.get(file_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry
+        try:
+            file_hash = hash_file(file_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns, file_hash]
+
+    def scan(self, roots: list[str], jobs: int = 1) -> Changes:
+        """
+        Update the index with the current state of all files below roots
+        and return which files were added, changed or removed.
+
+        The directories are walked first. Afterwards the files are checked,
+        spread across a pool of jobs threads if jobs is larger than 1. The
+        files found below each root are available in self.roots afterwards.
+        """
+        seen_dirs = set()
+        self.roots = {}
+        for root in roots:
+            self.roots[root] = self._walk(os.path.normpath(root), seen_dirs)
+        files = list(dict.fromkeys(x for y in self.roots.values() for x in y))
+        if jobs > 1 and len(files) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                entries = list(executor.map(self._check_file, files))
+        else:
+            entries = [self._check_file(x) for x in files]
+        added = []
+        changed = []
+        seen_files = set()
+        for file_path, entry in zip(files, entries):
+            if entry is None:
+                continue
+            seen_files.add(file_path)
+            old_entry = self.files.get(file_path)
+            if not old_entry:
+                added.append(file_path)
+            elif old_entry[2] != entry[2]:
+                changed.append(file_path)
+            self.files[file_path] = entry
+        for root in self.roots:
+            self.roots[root] = [x for x in self.roots[root] if x in seen_files]
+        removed = [x for x in self.files if x not in seen_files]
+        for file_path in removed:
+            del self.files[file_path]
+        for dir_path in [x for x in self.dirs if x not in seen_dirs]:
+            del self.dirs[dir_path]
+        return Changes(sorted(added), sorted(changed), sorted(removed))
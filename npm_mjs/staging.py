@@ -0,0 +1,245 @@
+"""
+Incremental synchronization of the .transpile/js staging tree.
+
+The staging tree contains the JavaScript sources of all Django apps merged
+into one folder so that modules can import each other across apps. A small
+manifest records the content hash of every staged file, so that a sync only
+writes files whose source content changed and only deletes files that are no
+longer part of the project.
+
+With the method "none", sources are not copied at all. Only generated files
+are written to the staging tree, and rspack resolves every staged name to
+the source file it stands for (see get_staged_sources).
+"""
+
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+from .source_index import SourceIndex
+from .utils import copy_file
+from .utils import write_json_atomic
+
+
+class SyncStats(NamedTuple):
+    copied: int
+    skipped: int
+    removed: int
+    bytes_copied: int
+    bytes_skipped: int
+
+    def __str__(self):
+        return "%d files copied (%d bytes), %d unchanged (%d bytes), %d removed" % (
+            self.copied,
+            self.bytes_copied,
+            self.skipped,
+            self.bytes_skipped,
+            self.removed,
+        )
+
+
+class StagingArea:
+    """
+    A directory that mirrors a set of source files.
+
+    Usage::
+        staging = StagingArea(cache_path, manifest_path)
+        staging.sync({"modules/a.js": source_path, ...}, source_index)
+        staging.write_text("plugins/x/index.js", index_js)
+        staging.remove_stale()
+        staging.save()
+    """
+
+    def __init__(
+        self,
+        path: str,
+        manifest_path: str,
+        method: str = "auto",
+        reset: bool = False,
+    ):
+        self.path = path
+        self.manifest_path = manifest_path
+        self.method = method
+        # relative path -> content hash of the staged file
+        self.staged: dict[str, str] = {}
+        # relative paths that were synced or written during this run
+        self.current: set[str] = set()
+        # relative paths whose content was updated or that were deleted
+        self.updated: set[str] = set()
+        self.deleted: set[str] = set()
+        self.copied = 0
+        self.skipped = 0
+        self.bytes_copied = 0
+        self.bytes_skipped = 0
+        self.removed = 0
+        self.complete = False
+        if not reset and os.path.isdir(path):
+            self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("path") != self.path:
+            return
+        if data.get("copied", True) != (self.method != "none"):
+            # The files were staged with a method that does not match.
+            return
+        self.staged = data.get("files", {})
+        # Only a manifest that has been saved after a full sync lists every
+        # file in the staging dir.
+        self.complete = True
+
+    def save(self) -> None:
+        write_json_atomic(
+            self.manifest_path,
+            {
+                "path": self.path,
+                "files": self.staged,
+                "copied": self.method != "none",
+            },
+        )
+
+    def _is_staged(self, relative_path: str, file_hash: str, size: int) -> bool:
+        """
+        Return whether the file at relative_path has been staged with the
+        given hash and is still in place with the given size, as the staging
+        dir can be changed outside of transpile.
+        """
+        if self.staged.get(relative_path) != file_hash:
+            return False
+        try:
+            return os.stat(os.path.join(self.path, relative_path)).st_size == size
+        except OSError:
+            return False
+
+    def _prepare(self, relative_path: str) -> str:
+        outfile = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(outfile), exist_ok=True)
+        return outfile
+
+    def sync(self, files: dict[str, str], source_index: SourceIndex) -> None:
+        """
+        Bring the staged copies of files up to date. files maps the relative
+        path inside the staging dir to the source path. Sizes and hashes are
+        taken from source_index.
+        """
+        for relative_path, source_path in files.items():
+            self.current.add(relative_path)
+            size, _mtime, file_hash = source_index.files[source_path]
+            if self.method == "none":
+                up_to_date = self.staged.get(relative_path) == file_hash
+            else:
+                up_to_date = self._is_staged(relative_path, file_hash, size)
+            if up_to_date:
+                self.skipped += 1
+                self.bytes_skipped += size
+                continue
+            if self.method == "none":
+                # A copy staged by another method would be out of date.
+                try:
+                    os.remove(os.path.join(self.path, relative_path))
+                except FileNotFoundError:
+                    pass
+            else:
+                copy_file(source_path, self._prepare(relative_path), self.method)
+                self.copied += 1
+                self.bytes_copied += size
+            self.staged[relative_path] = file_hash
+            self.updated.add(relative_path)
+
+    def write_text(self, relative_path: str, content: str) -> bool:
+        """
+        Write a generated file into the staging dir unless it already has the
+        given content. Returns whether the file was written.
+        """
+        self.current.add(relative_path)
+        data = content.encode("utf-8")
+        file_hash = hashlib.md5(data).hexdigest()
+        if self._is_staged(relative_path, file_hash, len(data)):
+            return False
+        with open(self._prepare(relative_path), "wb") as f:
+            f.write(data)
+        self.staged[relative_path] = file_hash
+        self.updated.add(relative_path)
+        return True
+
+    def remove_stale(self) -> list[str]:
+        """
+        Remove all files that were neither synced nor written in this run.
+        Without a manifest from an earlier run, the staging dir is scanned
+        for files left behind by older versions.
+        """
+        stale = {x for x in self.staged if x not in self.current}
+        if not self.complete and os.path.isdir(self.path):
+            for root, _dirnames, filenames in os.walk(self.path):
+                for filename in filenames:
+                    relative_path = os.path.relpath(
+                        os.path.join(root, filename),
+                        self.path,
+                    )
+                    if relative_path not in self.current:
+                        stale.add(relative_path)
+        removed = []
+        for relative_path in sorted(stale):
+            if self.staged.pop(relative_path, None) is not None:
+                # Without copies, there is no file to remove, but the
+                # source is gone all the same.
+                self.deleted.add(relative_path)
+            outfile = os.path.join(self.path, relative_path)
+            try:
+                os.remove(outfile)
+            except FileNotFoundError:
+                continue
+            removed.append(outfile)
+            self.deleted.add(relative_path)
+            # Remove directories that have become empty.
+            dirname = os.path.dirname(outfile)
+            while dirname != os.path.normpath(self.path):
+                try:
+                    os.rmdir(dirname)
+                except OSError:
+                    break
+                dirname = os.path.dirname(dirname)
+        self.removed += len(removed)
+        self.complete = True
+        return removed
+
+    @property
+    def stats(self) -> SyncStats:
+        return SyncStats(
+            self.copied,
+            self.skipped,
+            self.removed,
+            self.bytes_copied,
+            self.bytes_skipped,
+        )
+
+
+def get_staged_sources(
+    path: str,
+    files: dict[str, str],
+    generated: list[str],
+) -> dict[str, str]:
+    """
+    Return the file that every name in the staging dir at path stands for
+    when sources are not copied: the real path of the source for files, so
+    that rspack finds the modules at the same path as the files they come
+    from, and the staged path for generated files.
+    """
+    real_dirs = {}
+    staged_sources = {}
+    for relative_path, source_path in files.items():
+        dirname, filename = os.path.split(source_path)
+        if dirname not in real_dirs:
+            real_dirs[dirname] = os.path.realpath(dirname)
+        staged_sources[relative_path] = os.path.join(real_dirs[dirname], filename)
+    for relative_path in generated:
+        staged_sources[relative_path.replace(os.sep, "/")] = os.path.join(
+            os.path.realpath(path),
+            relative_path,
+        )
+    return staged_sources
@@ -0,0 +1,87 @@
+"""
+In-process cache that is cleared when files change.
+
+The static template tag computes the same URLs on every render. They only
+change when transpile runs, which replaces the time file and the manifest
+in the .transpile folder. StatCache keeps computed values until one of the
+files it watches changes. To keep lookups cheap, the files are only checked
+with a stat once every interval seconds, so a change is picked up after at
+most that long.
+"""
+
+import os
+import threading
+import time
+
+
+def get_signature(path: str) -> tuple | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Files are replaced rather than written to, so a new inode is a change
+    # even if the modification time has not moved on.
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+class StatCache:
+    """
+    Usage::
+        cache = StatCache([TRANSPILE_TIME_PATH, MANIFEST_PATH])
+        url = cache.get(path, compute_url)
+
+    Args:
+        paths: Files whose changes clear the cache
+        max_size: Number of values kept. The oldest are removed first.
+        interval: Seconds between two checks of the files
+        on_change: Called when the files have changed
+    """
+
+    def __init__(
+        self,
+        paths: list[str],
+        max_size: int = 1024,
+        interval: float = 1.0,
+        on_change=None,
+    ):
+        self.paths = paths
+        self.max_size = max_size
+        self.interval = interval
+        self.on_change = on_change
+        self.values: dict = {}
+        self.signature = None
+        self.next_check = 0.0
+        self.lock = threading.Lock()
+
+    def check(self) -> None:
+        """Clear the cache if one of the files has changed."""
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        with self.lock:
+            if now < self.next_check:
+                return
+            signature = [get_signature(x) for x in self.paths]
+            if signature != self.signature:
+                self.values.clear()
+                if self.signature is not None and self.on_change:
+                    self.on_change()
+                self.signature = signature
+            self.next_check = now + self.interval
+
+    def get(self, key, compute):
+        """Return the value for key, calling compute(key) if it is unknown."""
+        self.check()
+        try:
+            return self.values[key]
+        except KeyError:
+            pass
+        value = compute(key)
+        if len(self.values) >= self.max_size:
+            try:
+                del self.values[next(iter(self.values))]
+            except (KeyError, StopIteration):
+                # Another thread has removed it first.
+                pass
+        self.values[key] = value
+        return value
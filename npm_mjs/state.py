@@ -0,0 +1,104 @@
+"""
+Small JSON state store shared between processes.
+
+transpile and npm_install record the time of their last run in
+.transpile/time, which the static template tag reads in every web server
+process. The file is only ever replaced by an atomic rename, so readers
+always see a complete file. Writers hold an advisory lock on a lock file
+next to it while they read, update and replace it, so that concurrent
+writers do not lose each other's values. Readers keep the values in memory
+and only read the file again once a stat shows that it has been replaced.
+"""
+
+import json
+import os
+import pickle
+from contextlib import contextmanager
+
+from .stat_cache import get_signature
+from .utils import write_json_atomic
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no advisory locks. Writes are still atomic.
+    fcntl = None
+
+
+def read_values(path: str) -> dict:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    try:
+        values = json.loads(data)
+    except ValueError:
+        # Older versions wrote a pickle, which is replaced on the next write.
+        try:
+            values = pickle.loads(data)
+        except Exception:
+            return {}
+    return values if isinstance(values, dict) else {}
+
+
+class StateStore:
+    """
+    Usage::
+        store = StateStore(TRANSPILE_TIME_PATH)
+        store.get("transpile", 0)
+        with store.batch():
+            store.update({"npm_install": timestamp})
+            store.update({"transpile": timestamp})
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.values: dict = {}
+        self.signature = None
+        # Values waiting to be written at the end of a batch
+        self.pending: dict | None = None
+
+    def load(self) -> dict:
+        signature = get_signature(self.path)
+        if signature is None or signature != self.signature:
+            self.values = read_values(self.path)
+            self.signature = signature
+        return self.values
+
+    def get(self, name: str, default=None):
+        if self.pending and name in self.pending:
+            return self.pending[name]
+        return self.load().get(name, default)
+
+    def update(self, values: dict) -> None:
+        """Store values, or remember them until the end of a batch."""
+        if self.pending is not None:
+            self.pending.update(values)
+        else:
+            self.write(values)
+
+    def write(self, values: dict) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            # The lock is released when the file is closed.
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = {**read_values(self.path), **values}
+            write_json_atomic(self.path, data)
+            self.values = data
+            self.signature = get_signature(self.path)
+
+    @contextmanager
+    def batch(self):
+        """Write all values updated within the block at once at its end."""
+        if self.pending is not None:
+            yield
+            return
+        self.pending = {}
+        try:
+            yield
+        finally:
+            pending, self.pending = self.pending, None
+            if pending:
+                self.write(pending)
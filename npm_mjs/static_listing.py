@@ -0,0 +1,127 @@
+"""
+Cached listing of the static files that are passed to rspack.
+
+transpile passes the names of all static files, apart from the JavaScript
+sources, to rspack as STATIC_FRONTEND_FILES. Instead of a dry run of
+collectstatic, which checks every file against STATIC_ROOT, the folders of
+the static file finders are walked directly. The names found in every
+folder are cached together with the modification times of its directories.
+Adding, removing or renaming a file changes the modification time of the
+directory that contains it, so a folder is only walked again once one of its
+directories has changed. Checking an unchanged folder costs one stat per
+directory.
+"""
+
+import fnmatch
+import json
+import os
+
+from .utils import write_json_atomic
+
+LISTING_VERSION = 1
+
+
+def matches_patterns(path: str, patterns: list[str]) -> bool:
+    return any(fnmatch.fnmatchcase(path, pattern) for pattern in patterns)
+
+
+def list_dir(root: str, ignore_patterns: list[str]):
+    """
+    Return the files below root that are not ignored, as
+    django.contrib.staticfiles.utils.get_files lists them for a
+    FileSystemStorage, and the modification times of all directories that
+    were listed.
+    """
+    files = []
+    dirs = {}
+
+    def walk(location):
+        path = os.path.join(root, location)
+        dirs[location] = os.stat(path).st_mtime_ns
+        directories = []
+        filenames = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    directories.append(entry.name)
+                else:
+                    filenames.append(entry.name)
+        for filename in filenames:
+            if matches_patterns(filename, ignore_patterns):
+                continue
+            if location:
+                filename = os.path.join(location, filename)
+                if matches_patterns(filename, ignore_patterns):
+                    continue
+            files.append(filename)
+        for directory in directories:
+            if matches_patterns(directory, ignore_patterns):
+                continue
+            if location:
+                directory = os.path.join(location, directory)
+            walk(directory)
+
+    walk("")
+    return files, dirs
+
+
+class StaticListing:
+    """
+    Usage::
+        listing = StaticListing(STATIC_LISTING_PATH, ignore_patterns)
+        for root in roots:
+            files = listing.get_files(root)
+        listing.save()
+    """
+
+    def __init__(self, path: str, ignore_patterns: list[str]):
+        self.path = path
+        self.ignore_patterns = sorted(ignore_patterns)
+        self.roots: dict[str, dict] = {}
+        self.used: set[str] = set()
+        self.changed = False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            data.get("version") == LISTING_VERSION
+            and data.get("ignore_patterns") == self.ignore_patterns
+        ):
+            self.roots = data.get("roots", {})
+
+    def is_current(self, root: str, dirs: dict[str, int]) -> bool:
+        for location, mtime in dirs.items():
+            try:
+                if os.stat(os.path.join(root, location)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def get_files(self, root: str) -> list[str]:
+        """Return the files below root that are not ignored."""
+        self.used.add(root)
+        cached = self.roots.get(root)
+        if cached and self.is_current(root, cached["dirs"]):
+            return cached["files"]
+        files, dirs = list_dir(root, self.ignore_patterns)
+        self.roots[root] = {"files": files, "dirs": dirs}
+        self.changed = True
+        return files
+
+    def save(self) -> None:
+        """Store the listings of the folders that have been used."""
+        if not self.changed and self.used == set(self.roots):
+            return
+        self.roots = {x: self.roots[x] for x in self.used}
+        write_json_atomic(
+            self.path,
+            {
+                "version": LISTING_VERSION,
+                "ignore_patterns": self.ignore_patterns,
+                "roots": self.roots,
+            },
+        )
+        self.changed = False
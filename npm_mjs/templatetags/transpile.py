@@ -1,36 +1,84 @@
+import posixpath
 import re
+from contextvars import ContextVar
 from urllib.parse import quote
 from urllib.parse import urljoin
 
 from django import template
 from django.apps import apps
+from django.conf import settings
 from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
 from django.templatetags.static import PrefixNode
 from django.templatetags.static import StaticNode
+from django.utils.html import format_html_join
 
+from npm_mjs.manifest import get_entrypoint_files
+from npm_mjs.manifest import get_file_hash
+from npm_mjs.manifest import get_preload_files
+from npm_mjs.manifest import load_manifest
+from npm_mjs.paths import MANIFEST_PATH
+from npm_mjs.paths import TRANSPILE_TIME_PATH
+from npm_mjs.stat_cache import StatCache
 from npm_mjs.tools import get_last_run
 
 register = template.Library()
 
+# (paths, rel) -> (manifest, files, rendered tags) for transpile_preload
+_preload_tags = {}
+
+# The static paths rendered while TranspileLinkMiddleware handles a request
+referenced_paths: ContextVar[list | None] = ContextVar(
+    "referenced_paths",
+    default=None,
+)
+
+# path -> (normalized path, url) for the static tag. The URLs change when
+# transpile writes a new time file or manifest.
+_urls = StatCache(
+    [TRANSPILE_TIME_PATH, MANIFEST_PATH],
+    max_size=getattr(settings, "TRANSPILE_STATIC_URL_CACHE_SIZE", 1024),
+    interval=getattr(settings, "TRANSPILE_STATIC_CHECK_INTERVAL", 1),
+)
+
+
+def record_paths(paths):
+    """Record paths for TranspileLinkMiddleware if it handles a request."""
+    recorded = referenced_paths.get()
+    if recorded is not None:
+        recorded.extend(paths)
+
+
+def get_version(path):
+    # Files generated by transpile have their own hash. All other files use
+    # the version of the last transpile run.
+    return get_file_hash(MANIFEST_PATH, path) or get_last_run("transpile")
+
+
+def get_static_url(path):
+    path = re.sub(r"^js/(.*)\.mjs", r"js/\1.js", path)
+    if apps.is_installed("django.contrib.staticfiles"):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        if isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            return path, staticfiles_storage.url(path)
+        else:
+            return path, staticfiles_storage.url(path) + "?v=%s" % get_version(path)
+    else:
+        return path, urljoin(
+            PrefixNode.handle_simple("STATIC_URL"),
+            quote(path),
+        ) + "?v=%s" % get_version(path)
+
 
 class StaticTranspileNode(StaticNode):
     @classmethod
     def handle_simple(cls, path):
-        path = re.sub(r"^js/(.*)\.mjs", r"js/\1.js", path)
-        if apps.is_installed("django.contrib.staticfiles"):
-            from django.contrib.staticfiles.storage import staticfiles_storage
-
-            if isinstance(staticfiles_storage, ManifestStaticFilesStorage):
-                return staticfiles_storage.url(path)
-            else:
-                return staticfiles_storage.url(path) + "?v=%s" % get_last_run(
-                    "transpile",
-                )
+        if getattr(settings, "TRANSPILE_STATIC_URL_CACHE", True):
+            path, url = _urls.get(path, get_static_url)
         else:
-            return urljoin(
-                PrefixNode.handle_simple("STATIC_URL"),
-                quote(path),
-            ) + "?v=%s" % get_last_run("transpile")
+            path, url = get_static_url(path)
+        record_paths([path])
+        return url
 
 
 @register.tag
@@ -41,9 +89,72 @@ def static(parser, token):
     Usage::
         {% static path [as varname] %}
     Examples::
-        {% static "js/index.mjs" %} # turns into js/index.js?v=213...
+        {% static "js/index.mjs" %} # turns into js/index.js?v=3f2a...
         {% static "css/style.css" %} # turns into css/style.css?v=213...
         {% static variable_with_path %}
         {% static variable_with_path as varname %}
     """
     return StaticTranspileNode.handle_token(parser, token)
+
+
+@register.simple_tag
+def transpile_scripts(*paths):
+    """
+    Render script tags for the given entry files and the files they depend
+    on, such as the runtime and vendor chunks when TRANSPILE_SPLIT_CHUNKS is
+    set. Files shared by several entries are only included once.
+    Usage::
+        {% transpile_scripts path [path ...] %}
+    Examples::
+        {% transpile_scripts "js/index.mjs" %}
+        {% transpile_scripts "js/editor.mjs" "js/document.mjs" %}
+    """
+    files = []
+    for path in paths:
+        name = posixpath.basename(path).split(".")[0]
+        for file_path in get_entrypoint_files(MANIFEST_PATH, name) or [path]:
+            if file_path not in files:
+                files.append(file_path)
+    return format_html_join(
+        "\n",
+        '<script type="text/javascript" src="{}"></script>',
+        ((StaticTranspileNode.handle_simple(x),) for x in files),
+    )
+
+
+@register.simple_tag
+def transpile_preload(*paths, rel="preload"):
+    """
+    Render link tags that preload all files that the given entry files load,
+    including the chunks they only load on demand, so that the browser does
+    not have to discover them one level at a time. rel can be "preload" or
+    "modulepreload" for outputs that are ES modules.
+    Usage::
+        {% transpile_preload path [path ...] [rel="modulepreload"] %}
+    Examples::
+        {% transpile_preload "js/editor.mjs" %}
+    """
+    # The tags are rendered once per process and manifest.
+    manifest = load_manifest(MANIFEST_PATH)
+    cached = _preload_tags.get((paths, rel))
+    if cached and cached[0] is manifest:
+        # The middleware still needs to know which files are referenced.
+        record_paths(cached[1])
+        return cached[2]
+    if rel == "modulepreload":
+        link = '<link rel="modulepreload" href="{}">'
+    else:
+        link = '<link rel="preload" href="{}" as="script">'
+    files = []
+    for path in paths:
+        name = posixpath.basename(path).split(".")[0]
+        for file_path in get_preload_files(MANIFEST_PATH, name):
+            if file_path not in files:
+                files.append(file_path)
+    tags = format_html_join(
+        "\n",
+        link,
+        ((StaticTranspileNode.handle_simple(x),) for x in files),
+    )
+    _preload_tags[(paths, rel)] = (manifest, files, tags)
+    return tags
@@ -1,3 +1,34 @@
 """
 Test suite for django-npm-mjs package.
 """
+
+import atexit
+import shutil
+import tempfile
+
+
+def configure_settings():
+    """
+    Configure Django for the tests of the commands and the middleware, with
+    a temporary project folder. The paths in npm_mjs.paths are derived from
+    the settings when that module is first imported, so this has to be
+    called before.
+    """
+    import django
+    from django.conf import settings
+
+    if settings.configured:
+        return
+    project_path = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, project_path, True)
+    settings.configure(
+        PROJECT_PATH=project_path,
+        INSTALLED_APPS=["django.contrib.staticfiles", "npm_mjs"],
+        STATIC_URL="/static/",
+        STATIC_ROOT=project_path + "/static-collected",
+        TEMPLATES=[{"BACKEND": "django.template.backends.django.DjangoTemplates"}],
+        TRANSPILE_HISTORY=False,
+        TRANSPILE_BUILD_CACHE=None,
+        TRANSPILE_RSPACK_CACHE=False,
+    )
+    django.setup()
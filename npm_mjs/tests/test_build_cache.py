@@ -0,0 +1,124 @@
+"""
+Tests for the content-addressed build cache.
+"""
+
+import os
+import stat
+import tempfile
+import unittest
+
+from npm_mjs.build_cache import BuildCache
+from npm_mjs.build_cache import get_build_key
+from npm_mjs.utils import DIR_MODE
+
+
+class TestGetBuildKey(unittest.TestCase):
+    """Test that the key covers all inputs of a build."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.lockfile = os.path.join(self.tmp_dir.name, "pnpm-lock.yaml")
+        self.args = [
+            "config",
+            {"index": "index.mjs"},
+            {"index.mjs": "a", "modules/a.js": "b"},
+            "packages",
+            self.lockfile,
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_inputs_same_key(self):
+        """Test that the key is stable."""
+        self.assertEqual(get_build_key(*self.args), get_build_key(*self.args))
+
+    def test_inputs_change_key(self):
+        """Test that changing any input changes the key."""
+        key = get_build_key(*self.args)
+        for index, value in enumerate(
+            ["other", {"main": "index.mjs"}, {"index.mjs": "c"}, "other"],
+        ):
+            args = list(self.args)
+            args[index] = value
+            self.assertNotEqual(get_build_key(*args), key)
+
+    def test_lockfile_changes_key(self):
+        """Test that the content of the lockfile is part of the key."""
+        key = get_build_key(*self.args)
+        with open(self.lockfile, "w") as f:
+            f.write("lockfileVersion: '9.0'\n")
+        locked_key = get_build_key(*self.args)
+        self.assertNotEqual(locked_key, key)
+        with open(self.lockfile, "a") as f:
+            f.write("packages: {}\n")
+        self.assertNotEqual(get_build_key(*self.args), locked_key)
+
+
+class TestBuildCache(unittest.TestCase):
+    """Test storing, restoring and pruning builds."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = BuildCache(os.path.join(self.tmp_dir.name, "cache"), 2)
+        self.out_dir = os.path.join(self.tmp_dir.name, "out")
+        self.write(os.path.join(self.out_dir, "index.js"), "index")
+        self.write(os.path.join(self.out_dir, "chunks", "1-1.js"), "chunk")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_miss(self):
+        """Test that an unknown key is not restored."""
+        self.assertIsNone(self.cache.restore("ab" * 32, self.out_dir))
+
+    def test_roundtrip(self):
+        """Test that stored outputs and metadata are restored."""
+        self.cache.store("ab" * 32, self.out_dir, {"version": 1})
+        restore_dir = os.path.join(self.tmp_dir.name, "restored")
+        self.assertEqual(self.cache.restore("ab" * 32, restore_dir), {"version": 1})
+        self.assertEqual(self.read(os.path.join(restore_dir, "index.js")), "index")
+        self.assertEqual(
+            self.read(os.path.join(restore_dir, "chunks", "1-1.js")),
+            "chunk",
+        )
+
+    def test_store_permissions(self):
+        """Test that a stored entry can be read by others and leaves nothing behind."""
+        self.cache.store("ab" * 32, self.out_dir, {})
+        entry_path = self.cache._entry_path("ab" * 32)
+        self.assertEqual(stat.S_IMODE(os.stat(entry_path).st_mode), DIR_MODE)
+        self.assertEqual(os.listdir(os.path.dirname(entry_path)), ["ab" * 32])
+
+    def test_restored_files_are_copies(self):
+        """Test that changing restored files does not change the cache."""
+        self.cache.store("ab" * 32, self.out_dir, {})
+        restore_dir = os.path.join(self.tmp_dir.name, "restored")
+        self.cache.restore("ab" * 32, restore_dir)
+        self.write(os.path.join(restore_dir, "index.js"), "changed")
+        restore_dir = os.path.join(self.tmp_dir.name, "restored-again")
+        self.cache.restore("ab" * 32, restore_dir)
+        self.assertEqual(self.read(os.path.join(restore_dir, "index.js")), "index")
+
+    def test_prune(self):
+        """Test that the least recently used builds are removed."""
+        keys = ["%02d" % i * 32 for i in range(3)]
+        for mtime, key in enumerate(keys):
+            self.cache.store(key, self.out_dir, {})
+            os.utime(self.cache._entry_path(key), (mtime, mtime))
+        self.cache.prune()
+        self.assertIsNone(self.cache.restore(keys[0], self.out_dir))
+        self.assertIsNotNone(self.cache.restore(keys[2], self.out_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for the lock that keeps concurrent transpile runs apart.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from npm_mjs.build_lock import LockTimeout
+from npm_mjs.build_lock import build_lock
+from npm_mjs.build_lock import read_holder
+
+
+def hold_lock(path, locked, release):
+    with build_lock(path, "transpile"):
+        locked.set()
+        release.wait(10)
+
+
+class TestBuildLock(unittest.TestCase):
+    """Test taking, waiting for and sharing the build lock."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, ".transpile", "build.lock")
+        self.locked = multiprocessing.Event()
+        self.release = multiprocessing.Event()
+        self.process = None
+
+    def tearDown(self):
+        self.release.set()
+        if self.process:
+            self.process.join(10)
+        self.tmp_dir.cleanup()
+
+    def start_holder(self):
+        self.process = multiprocessing.Process(
+            target=hold_lock,
+            args=(self.path, self.locked, self.release),
+        )
+        self.process.start()
+        self.assertTrue(self.locked.wait(10))
+
+    def test_holder_is_recorded(self):
+        with build_lock(self.path, "npm_install"):
+            holder = read_holder(self.path)
+            self.assertEqual(holder["command"], "npm_install")
+            self.assertEqual(holder["pid"], os.getpid())
+        self.assertEqual(read_holder(self.path), {})
+
+    def test_lock_is_reentrant(self):
+        with build_lock(self.path, "transpile"):
+            with build_lock(self.path, "npm_install", wait=False):
+                pass
+            self.assertEqual(read_holder(self.path)["command"], "transpile")
+
+    def test_no_wait(self):
+        self.start_holder()
+        with self.assertRaises(LockTimeout) as cm:
+            with build_lock(self.path, "transpile", wait=False):
+                pass
+        self.assertEqual(cm.exception.holder["pid"], self.process.pid)
+
+    def test_timeout(self):
+        self.start_holder()
+        holders = []
+        start = time.monotonic()
+        with self.assertRaises(LockTimeout):
+            with build_lock(self.path, "transpile", 0.3, on_wait=holders.append):
+                pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(holders[0]["command"], "transpile")
+
+    def test_wait_for_holder(self):
+        self.start_holder()
+        waited = []
+
+        def on_wait(holder):
+            waited.append(holder)
+            self.release.set()
+
+        with build_lock(self.path, "npm_install", 10, on_wait=on_wait):
+            self.assertEqual(read_holder(self.path)["command"], "npm_install")
+        self.assertEqual(len(waited), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Tests for the analysis of rspack stats.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.bundle_stats import analyze_stats
+from npm_mjs.bundle_stats import check_budgets
+from npm_mjs.bundle_stats import get_package
+
+PNPM_PATH = "./node_modules/.pnpm/%s@%s/node_modules/%s/index.js"
+
+
+class TestBundleStats(unittest.TestCase):
+    """Test sizes, duplicate packages and budgets."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = self.tmp_dir.name
+        for name, size in [("a.js", 100), ("b.js", 50), ("shared-1.js", 30)]:
+            with open(os.path.join(self.out_dir, name), "w") as f:
+                f.write("x" * size)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_package(self):
+        """Test that packages and their versions are found in module names."""
+        self.assertEqual(
+            get_package(PNPM_PATH % ("@scope+pkg", "1.2.3", "@scope/pkg")),
+            ("@scope/pkg", "1.2.3"),
+        )
+        self.assertEqual(
+            get_package("./node_modules/a/node_modules/b/index.js"),
+            ("b", "./node_modules/a/node_modules/b/"),
+        )
+        self.assertIsNone(get_package("./js/app.js"))
+
+    def test_analyze_stats(self):
+        """Test entry sizes, concatenated modules and duplicates."""
+        stats = {
+            "entrypoints": {
+                "a": {
+                    "assets": [{"name": "shared-1.js"}, {"name": "a.js"}],
+                    "chunks": [1, 2],
+                },
+                "b": {
+                    "assets": [{"name": "b.js"}, {"name": "b.js.map"}],
+                    "chunks": [3],
+                },
+            },
+            "chunks": [
+                {"id": 1, "names": [], "files": ["shared-1.js"]},
+                {"id": 2, "names": ["a"], "files": ["a.js"]},
+                {"id": 3, "names": ["b"], "files": ["b.js"]},
+            ],
+            "modules": [
+                {
+                    "name": "./a.js + 2 modules",
+                    "chunks": [2],
+                    "modules": [
+                        {"name": "./a.js", "size": 10},
+                        {"name": PNPM_PATH % ("dep", "1.0.0", "dep"), "size": 60},
+                    ],
+                },
+                {
+                    "name": PNPM_PATH % ("dep", "2.0.0", "dep"),
+                    "size": 40,
+                    "chunks": [3],
+                },
+                {
+                    "name": PNPM_PATH % ("once", "1.0.0", "once"),
+                    "size": 5,
+                    "chunks": [1],
+                },
+            ],
+        }
+        analysis = analyze_stats([stats], self.out_dir, top=2)
+        self.assertEqual(analysis["entries"]["a"]["size"], 130)
+        self.assertEqual(analysis["entries"]["b"]["files"], ["b.js"])
+        self.assertEqual(analysis["chunks"][0]["entries"], ["a"])
+        self.assertEqual(
+            [x["size"] for x in analysis["largest_modules"]],
+            [60, 40],
+        )
+        self.assertEqual(
+            analysis["duplicates"],
+            {"dep": {"copies": ["1.0.0", "2.0.0"], "entries": ["a", "b"]}},
+        )
+
+    def test_duplicates_across_processes(self):
+        """Test that the same package built by two processes is found."""
+        module = {"name": PNPM_PATH % ("dep", "1.0.0", "dep"), "size": 1, "chunks": [1]}
+        stats = {"chunks": [{"id": 1, "files": ["a.js"]}], "modules": [module]}
+        analysis = analyze_stats([stats, stats], self.out_dir)
+        self.assertEqual(list(analysis["duplicates"]), ["dep"])
+
+    def test_modules_of_package_in_several_chunks(self):
+        """Test that different modules of a package in different chunks are no duplicate."""
+        path = "./node_modules/lodash/%s.js"
+        stats = {
+            "chunks": [{"id": 1, "files": ["a.js"]}, {"id": 2, "files": ["b.js"]}],
+            "modules": [
+                {"name": path % "debounce", "size": 1, "chunks": [1]},
+                {"name": path % "throttle", "size": 1, "chunks": [2]},
+            ],
+        }
+        analysis = analyze_stats([stats], self.out_dir)
+        self.assertEqual(analysis["duplicates"], {})
+        stats["modules"].append({"name": path % "debounce", "size": 1, "chunks": [2]})
+        analysis = analyze_stats([stats], self.out_dir)
+        self.assertEqual(list(analysis["duplicates"]), ["lodash"])
+
+    def test_budgets(self):
+        """Test that raw and gzipped sizes are checked against budgets."""
+        entries = {"a": {"size": 100, "gzip": 20}, "b": {"size": 50, "gzip": 10}}
+        self.assertEqual(
+            len(check_budgets(entries, {"a": 99, "b": {"size": 60, "gzip": 5}})),
+            2,
+        )
+        self.assertEqual(check_budgets(entries, {"a": {"gzip": 20}, "c": 1}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
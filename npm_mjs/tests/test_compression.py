@@ -0,0 +1,102 @@
+"""
+Tests for the precompressed copies of transpile outputs.
+"""
+
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from npm_mjs import compression
+from npm_mjs.compression import compress_outputs
+from npm_mjs.compression import get_formats
+from npm_mjs.utils import hash_file
+
+
+class TestCompression(unittest.TestCase):
+    """Test writing, reusing and removing compressed copies."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self.tmp_dir.name, "js")
+        self.cache_dir = os.path.join(self.tmp_dir.name, "compressed")
+        os.makedirs(self.out_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.out_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def compress(self):
+        files = {}
+        for name in os.listdir(self.out_dir):
+            if name.endswith(compression.SIDECAR_EXTENSIONS):
+                continue
+            path = os.path.join(self.out_dir, name)
+            files[name] = {
+                "hash": hash_file(path)[:12],
+                "size": os.path.getsize(path),
+            }
+        return compress_outputs(
+            self.out_dir,
+            files,
+            ["gzip"],
+            self.cache_dir,
+            min_size=100,
+            jobs=1,
+        )
+
+    def test_formats(self):
+        """Test that unknown formats are rejected."""
+        self.assertEqual(get_formats(False), [])
+        self.assertIn("gzip", get_formats(True))
+        with self.assertRaises(ValueError):
+            get_formats(["lzma"])
+
+    def test_compress_outputs(self):
+        """Test that large enough outputs get a compressed copy."""
+        path = self.write("index.js", "let a = 1\n" * 100)
+        self.write("small.js", "let b = 2\n")
+        self.write("style.png", "x" * 1000)
+        results = self.compress()
+        self.assertEqual(list(results), ["index.js"])
+        self.assertFalse(results["index.js"]["reused"])
+        with gzip.open(path + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "let a = 1\n" * 100)
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)),
+            ["index.js", "index.js.gz", "small.js", "style.png"],
+        )
+
+    def test_reuse_after_rebuild(self):
+        """Test that unchanged files are not compressed again."""
+        path = self.write("index.js", "let a = 1\n" * 100)
+        self.compress()
+        # The output dir is rebuilt from scratch with the same content.
+        os.remove(path + ".gz")
+        with mock.patch.object(compression, "compress_file") as compress_file:
+            results = self.compress()
+        compress_file.assert_not_called()
+        self.assertTrue(results["index.js"]["reused"])
+        self.assertTrue(os.path.isfile(path + ".gz"))
+
+    def test_outdated_copies_are_removed(self):
+        """Test that copies of removed or changed files do not linger."""
+        self.write("index.js", "let a = 1\n" * 100)
+        path = self.write("chunk.js", "let c = 3\n" * 100)
+        self.compress()
+        os.remove(path)
+        self.write("index.js", "let a = 2\n" * 100)
+        results = self.compress()
+        self.assertFalse(results["index.js"]["reused"])
+        self.assertEqual(sorted(os.listdir(self.out_dir)), ["index.js", "index.js.gz"])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests for the discovery of JavaScript entries and sources.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.discovery import discover
+from npm_mjs.source_index import SourceIndex
+
+
+class TestDiscovery(unittest.TestCase):
+    """Test classification and overrides of discovered files."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # The parent folder name contains "static/js" on purpose.
+        self.base = os.path.join(self.tmp_dir.name, "static", "jsx")
+        self.app_a = os.path.join(self.base, "app_a", "static", "js")
+        self.app_b = os.path.join(self.base, "app_b", "static", "js")
+        self.libs = os.path.join(self.base, "app_b", "static-libs", "js")
+        self.write(self.app_a, "index.mjs", "import './modules/a'")
+        self.write(self.app_a, "modules/a.js", "export const a = 'a'")
+        self.write(self.app_b, "modules/a.js", "export const a = 'b'")
+        self.write(self.app_b, "plugins/menu/init.js", "")
+        self.write(self.app_b, "plugins/menu/items.js", "")
+        self.write(self.app_b, "modules/readme.txt", "")
+        self.write(self.libs, "lib.js", "")
+        self.write(self.libs, "modules/a.js", "export const a = 'lib'")
+        self.index = SourceIndex(os.path.join(self.tmp_dir.name, "index.json"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, root, relative_path, content):
+        path = os.path.join(root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def discover(self, jobs=1):
+        # Reverse order of precedence, as transpile passes them.
+        return discover([self.libs, self.app_b, self.app_a], self.index, jobs)
+
+    def test_classification(self):
+        """Test that files are classified by the folder they are found in."""
+        discovery = self.discover()
+        self.assertEqual(
+            discovery.entries,
+            [os.path.join(self.app_a, "index.mjs")],
+        )
+        self.assertEqual(len(discovery.sources), 5)
+        self.assertEqual(
+            sorted(discovery.lib_sources),
+            [
+                os.path.join(self.libs, "lib.js"),
+                os.path.join(self.libs, "modules", "a.js"),
+            ],
+        )
+
+    def test_overrides(self):
+        """Test that earlier apps override later apps and libs."""
+        staged_files = self.discover().staged_files
+        self.assertEqual(
+            staged_files["modules/a.js"],
+            os.path.join(self.app_a, "modules", "a.js"),
+        )
+        self.assertEqual(staged_files["lib.js"], os.path.join(self.libs, "lib.js"))
+        self.assertNotIn("modules/readme.txt", staged_files)
+
+    def test_plugin_dirs(self):
+        """Test that plugin modules apart from init are collected."""
+        self.assertEqual(self.discover().plugin_dirs, {"plugins/menu": ["items"]})
+
+    def test_plugin_meta(self):
+        """Test that metadata files of plugin modules are noted and staged."""
+        self.write(self.app_b, "plugins/menu/items.meta.json", "{}")
+        self.write(self.app_b, "modules/data.meta.json", "{}")
+        discovery = self.discover()
+        self.assertEqual(discovery.plugin_dirs, {"plugins/menu": ["items"]})
+        self.assertEqual(discovery.plugin_meta, {"plugins/menu": ["items"]})
+        self.assertIn("plugins/menu/items.meta.json", discovery.staged_files)
+        self.assertNotIn("modules/data.meta.json", discovery.staged_files)
+
+    def test_threads(self):
+        """Test that checking files in threads gives the same result."""
+        discovery = self.discover(jobs=4)
+        self.assertEqual(len(discovery.changes.added), 8)
+        self.assertEqual(len(discovery.staged_files), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
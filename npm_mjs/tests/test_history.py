@@ -0,0 +1,94 @@
+"""
+Tests for the build history and the detection of regressions.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.history import BuildHistory
+from npm_mjs.history import find_regressions
+from npm_mjs.history import get_entry_bytes
+from npm_mjs.timing import BuildTrace
+
+
+def make_build(number, duration, output_bytes=None, kind="full"):
+    return {
+        "id": number,
+        "command": "transpile",
+        "kind": kind,
+        "duration": duration,
+        "output_bytes": output_bytes or {},
+    }
+
+
+class TestBuildHistory(unittest.TestCase):
+    """Test recording runs and finding regressions."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "history.sqlite3")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_add_and_get_builds(self):
+        """Test that records are returned oldest first with their values."""
+        history = BuildHistory(self.path)
+        trace = BuildTrace()
+        with trace.phase("rspack"):
+            pass
+        history.add(
+            "transpile",
+            "full",
+            trace,
+            entries=2,
+            output_bytes={"index": 100},
+            revision="abc",
+        )
+        history.add("npm_install", "skipped", BuildTrace())
+        builds = history.get_builds()
+        self.assertEqual([x["command"] for x in builds], ["transpile", "npm_install"])
+        self.assertEqual(builds[0]["entries"], 2)
+        self.assertEqual(builds[0]["output_bytes"], {"index": 100})
+        self.assertEqual(list(builds[0]["phases"]), ["rspack"])
+        self.assertEqual(builds[0]["revision"], "abc")
+        self.assertEqual(len(history.get_builds("npm_install")), 1)
+
+    def test_entry_bytes(self):
+        """Test that the sizes of all files of an entry are added up."""
+        manifest = {
+            "files": {"js/a.js": {"size": 10}, "js/vendor.js": {"size": 5}},
+            "entrypoints": {"a": ["js/vendor.js", "js/a.js"]},
+        }
+        self.assertEqual(get_entry_bytes(manifest), {"a": 15})
+
+    def test_duration_regression(self):
+        """Test that durations are compared with runs of the same kind."""
+        builds = [
+            make_build(1, 10),
+            make_build(2, 12),
+            make_build(3, 1, kind="partial"),
+            make_build(4, 11),
+            make_build(5, 16),
+            make_build(6, 2, kind="partial"),
+        ]
+        regressions = find_regressions(builds, window=5, threshold=0.3)
+        self.assertEqual(
+            regressions,
+            {5: [("duration", 16, 11)], 6: [("duration", 2, 1)]},
+        )
+
+    def test_size_regression(self):
+        """Test that output sizes are compared per entry."""
+        builds = [
+            make_build(1, 10, {"a": 100, "b": 100}),
+            make_build(2, 10, {"a": 100, "b": 140}),
+            make_build(3, 10, {"a": 120}),
+        ]
+        regressions = find_regressions(builds, threshold=0.3)
+        self.assertEqual(regressions, {2: [("b", 140, 100)]})
+
+
+if __name__ == "__main__":
+    unittest.main()
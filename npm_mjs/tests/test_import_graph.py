@@ -0,0 +1,147 @@
+"""
+Tests for the import graph used to rebuild only affected entries.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.import_graph import ImportGraph
+from npm_mjs.import_graph import find_imports
+
+
+class TestFindImports(unittest.TestCase):
+    """Test the detection of import specifiers."""
+
+    def test_static_imports(self):
+        """Test default, named, namespace and side effect imports."""
+        source = """
+        import a from "./a"
+        import {b, c as d} from './b'
+        import {
+            e,
+            f
+        } from "./e"
+        import * as g from "../g"
+        import "./h"
+        """
+        self.assertEqual(
+            find_imports(source),
+            ["./a", "./b", "./e", "../g", "./h"],
+        )
+
+    def test_reexports(self):
+        """Test export ... from statements."""
+        source = """
+        export * from "./a"
+        export * as b from "./b"
+        export {c, d as e} from "./c"
+        export const f = 1
+        """
+        self.assertEqual(find_imports(source), ["./a", "./b", "./c"])
+
+    def test_dynamic_imports_and_workers(self):
+        """Test import() and worker URLs."""
+        source = """
+        import("./lazy").then(module => module.run())
+        import(/* webpackChunkName: "plugin" */ "./plugin")
+        new Worker(new URL("./worker.js", import.meta.url))
+        """
+        self.assertEqual(
+            find_imports(source),
+            ["./lazy", "./plugin", "./worker.js"],
+        )
+
+    def test_bare_specifiers_are_ignored(self):
+        """Test that npm package imports are not part of the graph."""
+        source = 'import {EditorState} from "prosemirror-state"'
+        self.assertEqual(find_imports(source), [])
+
+
+class TestImportGraph(unittest.TestCase):
+    """Test resolution and the selection of affected entries."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "js")
+        self.files = {
+            "editor.mjs": 'import {menu} from "./modules/menu"',
+            "document.mjs": 'import {base} from "./modules/base"',
+            "modules/menu/index.js": 'import {base} from "../base"',
+            "modules/base.js": "export const base = 1",
+            "modules/unused.js": "export const unused = 1",
+        }
+        for relative_path, content in self.files.items():
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+        self.graph = ImportGraph(os.path.join(self.tmp_dir.name, "graph.json"))
+        self.graph.update(self.root, dict.fromkeys(self.files, "hash"))
+        self.entries = {"editor": "editor.mjs", "document": "document.mjs"}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resolve(self):
+        """Test that extensions and index files are resolved."""
+        self.assertEqual(
+            self.graph.resolve("editor.mjs", "./modules/menu"),
+            "modules/menu/index.js",
+        )
+        self.assertEqual(
+            self.graph.resolve("modules/menu/index.js", "../base"),
+            "modules/base.js",
+        )
+        self.assertIsNone(self.graph.resolve("editor.mjs", "./missing"))
+
+    def test_affected_entries(self):
+        """Test that only entries reaching a changed file are selected."""
+        self.assertEqual(
+            self.graph.affected({"modules/menu/index.js"}, self.entries),
+            {"editor"},
+        )
+        self.assertEqual(
+            self.graph.affected({"modules/base.js"}, self.entries),
+            {"editor", "document"},
+        )
+
+    def test_unreachable_file_rebuilds_everything(self):
+        """Test that an unreachable changed file selects all entries."""
+        self.assertIsNone(self.graph.affected({"modules/unused.js"}, self.entries))
+
+    def test_update_only_reads_changed_files(self):
+        """Test that files with unchanged hashes are not parsed again."""
+        path = os.path.join(self.root, "document.mjs")
+        with open(path, "w") as f:
+            f.write('import {menu} from "./modules/menu"')
+        self.graph.update(self.root, dict.fromkeys(self.files, "hash"))
+        self.assertEqual(self.graph.files["document.mjs"][1], ["./modules/base"])
+        self.graph.update(
+            self.root,
+            {**dict.fromkeys(self.files, "hash"), "document.mjs": "new"},
+        )
+        self.assertEqual(self.graph.files["document.mjs"][1], ["./modules/menu"])
+
+    def test_update_reads_sources(self):
+        """Test that files are read from their sources if they are given."""
+        source_path = os.path.join(self.tmp_dir.name, "app", "document.mjs")
+        os.makedirs(os.path.dirname(source_path))
+        with open(source_path, "w") as f:
+            f.write('import {menu} from "./modules/menu"')
+        self.graph.update(
+            self.root,
+            {**dict.fromkeys(self.files, "hash"), "document.mjs": "new"},
+            {"document.mjs": source_path},
+        )
+        self.assertEqual(self.graph.files["document.mjs"][1], ["./modules/menu"])
+
+    def test_persistence(self):
+        """Test that a saved graph is loaded again."""
+        self.graph.save()
+        graph = ImportGraph(self.graph.path)
+        self.assertEqual(graph.files, self.graph.files)
+
+
+if __name__ == "__main__":
+    unittest.main()
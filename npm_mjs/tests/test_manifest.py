@@ -0,0 +1,97 @@
+"""
+Tests for the manifest of generated files.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from npm_mjs import manifest
+from npm_mjs.manifest import get_entrypoint_files
+from npm_mjs.manifest import get_file_hash
+from npm_mjs.manifest import get_preload_files
+from npm_mjs.manifest import load_manifest
+from npm_mjs.manifest import write_manifest
+
+
+class TestManifest(unittest.TestCase):
+    """Test writing and loading the manifest."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = os.path.join(self.tmp_dir.name, "js")
+        self.path = os.path.join(self.tmp_dir.name, "manifest.json")
+        self.write("index.js", "index")
+        self.write("1-1.js", "chunk")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, relative_path, content):
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, relative_path), "w") as f:
+            f.write(content)
+
+    def test_files(self):
+        """Test that every file has a hash and size."""
+        files = write_manifest(self.path, self.out_dir)["files"]
+        self.assertEqual(sorted(files), ["js/1-1.js", "js/index.js"])
+        self.assertEqual(files["js/index.js"]["size"], 5)
+        self.assertNotEqual(files["js/index.js"]["hash"], files["js/1-1.js"]["hash"])
+
+    def test_unknown_file(self):
+        """Test that files that are not generated have no hash."""
+        write_manifest(self.path, self.out_dir)
+        self.assertIsNone(get_file_hash(self.path, "css/style.css"))
+        self.assertIsNone(get_file_hash(self.path + ".missing", "js/index.js"))
+
+    def test_reload_only_when_changed(self):
+        """Test that the manifest is only read again after it changed."""
+        write_manifest(self.path, self.out_dir)
+        old_hash = get_file_hash(self.path, "js/index.js")
+        with mock.patch("builtins.open", wraps=open) as mocked_open:
+            load_manifest(self.path)
+            load_manifest(self.path)
+        mocked_open.assert_not_called()
+        self.write("index.js", "changed")
+        write_manifest(self.path, self.out_dir)
+        self.assertNotEqual(get_file_hash(self.path, "js/index.js"), old_hash)
+
+    def test_entrypoints(self):
+        """Test that the files of every entry are listed in order."""
+        write_manifest(
+            self.path,
+            self.out_dir,
+            {"index": ["runtime-1.js", "vendor-1.js", "index.js"]},
+        )
+        self.assertEqual(
+            get_entrypoint_files(self.path, "index"),
+            ["js/runtime-1.js", "js/vendor-1.js", "js/index.js"],
+        )
+        self.assertIsNone(get_entrypoint_files(self.path, "other"))
+
+    def test_preload_files(self):
+        """Test that chunks loaded on demand are preloaded after the entry."""
+        write_manifest(
+            self.path,
+            self.out_dir,
+            {"index": ["vendor-1.js", "index.js"]},
+            lazy_chunks={"index": ["1-1.js", "vendor-1.js"]},
+        )
+        self.assertEqual(
+            get_preload_files(self.path, "index"),
+            ["js/vendor-1.js", "js/index.js", "js/1-1.js"],
+        )
+        self.assertEqual(get_preload_files(self.path, "other"), [])
+
+    def test_invalid_manifest(self):
+        """Test that an unreadable manifest is treated as empty."""
+        with open(self.path, "w") as f:
+            f.write("{")
+        manifest._manifests.pop(self.path, None)
+        self.assertEqual(load_manifest(self.path)["files"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for the middleware that sends Link headers for transpiled entries.
+"""
+
+import os
+import shutil
+import unittest
+
+from npm_mjs.tests import configure_settings
+
+configure_settings()
+
+from django.http import HttpResponse  # noqa: E402
+from django.template import engines  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from npm_mjs.manifest import write_manifest  # noqa: E402
+from npm_mjs.middleware import TranspileLinkMiddleware  # noqa: E402
+from npm_mjs.paths import MANIFEST_PATH  # noqa: E402
+from npm_mjs.paths import PROJECT_PATH  # noqa: E402
+from npm_mjs.paths import TRANSPILE_CACHE_PATH  # noqa: E402
+
+
+class TestTranspileLinkMiddleware(unittest.TestCase):
+    """Test the Link headers for the entries a response refers to."""
+
+    def setUp(self):
+        self.out_dir = os.path.join(PROJECT_PATH, "static-transpile", "js")
+        os.makedirs(self.out_dir)
+        os.makedirs(TRANSPILE_CACHE_PATH)
+        self.build("main")
+        self.request = RequestFactory().get("/")
+        with override_settings(TRANSPILE_STATIC_CHECK_INTERVAL=0):
+            self.middleware = TranspileLinkMiddleware(self.render)
+        self.template = "{% load transpile %}{% static 'js/main.mjs' %}"
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(PROJECT_PATH, "static-transpile"))
+        shutil.rmtree(TRANSPILE_CACHE_PATH)
+
+    def build(self, content):
+        for name in ("runtime.js", "main.js"):
+            with open(os.path.join(self.out_dir, name), "w") as f:
+                f.write(content)
+        write_manifest(
+            MANIFEST_PATH,
+            self.out_dir,
+            {"main": ["runtime.js", "main.js"]},
+            lazy_chunks={"main": ["chunk.js"]},
+        )
+
+    def render(self, request):
+        response = HttpResponse(
+            engines["django"].from_string(self.template).render({}),
+        )
+        response["Link"] = "</style.css>; rel=preload; as=style"
+        return response
+
+    def get_links(self):
+        return self.middleware(self.request)["Link"].split(", ")
+
+    def test_static(self):
+        """Test that the files of an entry rendered by static are linked."""
+        links = self.get_links()
+        self.assertEqual(len(links), 3)
+        self.assertEqual(links[0], "</style.css>; rel=preload; as=style")
+        self.assertTrue(links[1].startswith("</static/js/runtime.js?v="))
+        self.assertTrue(links[2].endswith("; rel=preload; as=script"))
+
+    def test_cached_preload_tags(self):
+        """Test that every response with cached preload tags is linked."""
+        self.template = "{% load transpile %}{% transpile_preload 'js/main.mjs' %}"
+        self.assertEqual(len(self.get_links()), 3)
+        self.assertEqual(len(self.get_links()), 3)
+
+    def test_new_manifest(self):
+        """Test that the links follow a new manifest."""
+        links = self.get_links()
+        self.build("changed")
+        new_links = self.get_links()
+        self.assertNotEqual(new_links[1], links[1])
+        self.assertEqual(new_links[0], links[0])
+
+    def test_no_entries(self):
+        """Test that responses without entries are left alone."""
+        self.template = "{% load transpile %}{% static 'css/style.css' %}"
+        self.assertEqual(self.get_links(), ["</style.css>; rel=preload; as=style"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Tests for the versioned output dirs of transpile.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.output_dirs import OutputDirs
+
+
+class TestOutputDirs(unittest.TestCase):
+    """Test creating, activating and pruning output dirs."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.link_path = os.path.join(self.tmp_dir.name, "static-transpile")
+        self.versions_path = os.path.join(self.tmp_dir.name, ".transpile", "outputs")
+        self.output_dirs = OutputDirs(self.link_path, self.versions_path, keep=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, path, name, content="x"):
+        file_path = os.path.join(path, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(content)
+
+    def build(self, files):
+        path = self.output_dirs.create()
+        for name in files:
+            self.write(path, name, name)
+        self.output_dirs.activate(path, files)
+        return path
+
+    def test_activate_switches_link(self):
+        path = self.build(["js/index.js"])
+        self.assertTrue(os.path.islink(self.link_path))
+        self.assertEqual(self.output_dirs.get_current(), os.path.realpath(path))
+        # The link is relative, so the project can be moved.
+        self.assertFalse(os.path.isabs(os.readlink(self.link_path)))
+        with open(os.path.join(self.link_path, "js/index.js")) as f:
+            self.assertEqual(f.read(), "js/index.js")
+
+    def test_replaces_plain_dir(self):
+        self.write(self.link_path, "js/old.js")
+        self.build(["js/index.js"])
+        self.assertTrue(os.path.islink(self.link_path))
+        self.assertEqual(os.listdir(os.path.join(self.link_path, "js")), ["index.js"])
+
+    def test_create_copies_current_files(self):
+        self.build(["js/index.js", "js/editor.js"])
+        path = self.output_dirs.create(["js/editor.js"])
+        self.assertEqual(os.listdir(os.path.join(path, "js")), ["editor.js"])
+        # The current outputs are not touched by the new build.
+        self.write(path, "js/editor.js", "new")
+        with open(os.path.join(self.link_path, "js/editor.js")) as f:
+            self.assertEqual(f.read(), "js/editor.js")
+
+    def test_files_of_kept_builds_are_carried_over(self):
+        self.build(["js/index.js", "js/1-chunk.js"])
+        path = self.output_dirs.create()
+        self.write(path, "js/index.js", "new")
+        self.write(path, "js/2-chunk.js")
+        carried = self.output_dirs.activate(path, ["js/index.js", "js/2-chunk.js"])
+        self.assertEqual(carried, 1)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.link_path, "js"))),
+            ["1-chunk.js", "2-chunk.js", "index.js"],
+        )
+        with open(os.path.join(self.link_path, "js/index.js")) as f:
+            self.assertEqual(f.read(), "new")
+
+    def test_old_builds_are_pruned(self):
+        first = self.build(["js/1.js"])
+        second = self.build(["js/2.js"])
+        failed = self.output_dirs.create()
+        self.output_dirs.discard(failed)
+        third = self.build(["js/3.js"])
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(failed))
+        self.assertTrue(os.path.exists(second))
+        # Files of builds that are no longer kept are not carried over.
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(third, "js"))),
+            ["2.js", "3.js"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
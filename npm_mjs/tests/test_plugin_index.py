@@ -0,0 +1,50 @@
+"""
+Tests for the index.js files of plugin dirs.
+"""
+
+import unittest
+
+from npm_mjs.plugin_index import render_plugin_index
+
+
+class TestPluginIndex(unittest.TestCase):
+    """Test the eager and lazy formats of plugin indexes."""
+
+    def test_eager(self):
+        """Test that the eager format re-exports every module and ignores metadata."""
+        self.assertEqual(
+            render_plugin_index("plugins/menu", ["items", "tools"], ["tools"]),
+            'export * from "./items"\nexport * from "./tools"\n',
+        )
+
+    def test_lazy(self):
+        """Test the loaders, chunk names and metadata of the lazy format."""
+        index_js = render_plugin_index(
+            "plugins/menu",
+            ["items", "tools"],
+            ["tools"],
+            "lazy",
+        )
+        self.assertEqual(
+            index_js,
+            'import meta0 from "./tools.meta.json"\n'
+            "export const plugins = {\n"
+            '    "items": () => import(/* webpackChunkName: "plugins/menu/items" */ '
+            '"./items"),\n'
+            '    "tools": () => import(/* webpackChunkName: "plugins/menu/tools" */ '
+            '"./tools"),\n'
+            "}\n"
+            "export const meta = {\n"
+            '    "tools": meta0,\n'
+            "}\n",
+        )
+
+    def test_lazy_ignores_meta_without_module(self):
+        """Test that metadata of a module that does not exist is left out."""
+        index_js = render_plugin_index("plugins/menu", ["items"], ["gone"], "lazy")
+        self.assertNotIn("gone", index_js)
+        self.assertIn("export const meta = {\n}\n", index_js)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the management of the persistent rspack cache.
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from npm_mjs.rspack_cache import RspackCache
+from npm_mjs.rspack_cache import get_cache_version
+from npm_mjs.rspack_cache import load_cache_stats
+
+
+class TestRspackCache(unittest.TestCase):
+    """Test cache versions, pruning and statistics."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "rspack-cache")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def add_version(self, cache, version, size, age):
+        cache_dir = cache.get_dir(version, "default")
+        with open(os.path.join(cache_dir, "data"), "wb") as f:
+            f.write(b"x" * size)
+        mtime = time.time() - age
+        os.utime(os.path.join(self.path, version), (mtime, mtime))
+
+    def test_cache_version(self):
+        """Test that the version depends on the config and the lockfile."""
+        lockfile = os.path.join(self.tmp_dir.name, "pnpm-lock.yaml")
+        version = get_cache_version("config", lockfile)
+        self.assertNotEqual(get_cache_version("other", lockfile), version)
+        with open(lockfile, "w") as f:
+            f.write("lockfileVersion: '9.0'\n")
+        self.assertNotEqual(get_cache_version("config", lockfile), version)
+
+    def test_prune_by_age(self):
+        """Test that versions unused for too long are removed."""
+        cache = RspackCache(self.path, max_size=1000, max_age=60)
+        self.add_version(cache, "old", 10, 120)
+        self.add_version(cache, "recent", 10, 10)
+        self.add_version(cache, "current", 10, 120)
+        self.assertEqual(cache.prune("current"), ["old"])
+        self.assertEqual(sorted(os.listdir(self.path)), ["current", "recent"])
+
+    def test_prune_by_size(self):
+        """Test that the least recently used versions are removed first."""
+        cache = RspackCache(self.path, max_size=25, max_age=3600)
+        self.add_version(cache, "a", 10, 30)
+        self.add_version(cache, "b", 10, 20)
+        self.add_version(cache, "c", 10, 10)
+        self.add_version(cache, "current", 100, 0)
+        self.assertEqual(cache.prune("current"), ["a"])
+        self.assertEqual(sorted(os.listdir(self.path)), ["b", "c", "current"])
+
+    def test_load_cache_stats(self):
+        """Test that the statistics of several processes are added up."""
+        paths = []
+        for number, stats in enumerate(
+            [{"modules": 10, "cached": 8}, {"modules": 5, "cached": 0}],
+        ):
+            path = os.path.join(self.tmp_dir.name, "stats-%d.json" % number)
+            with open(path, "w") as f:
+                json.dump(stats, f)
+            paths.append(path)
+        paths.append(os.path.join(self.tmp_dir.name, "missing.json"))
+        self.assertEqual(load_cache_stats(paths), (8, 15))
+
+
+if __name__ == "__main__":
+    unittest.main()
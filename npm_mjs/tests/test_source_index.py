@@ -0,0 +1,91 @@
+"""
+Tests for the persistent source index used by transpile to detect changes.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.source_index import SourceIndex
+
+
+class TestSourceIndex(unittest.TestCase):
+    """Test change detection of the source index."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "static", "js")
+        os.makedirs(os.path.join(self.root, "modules"))
+        self.index_path = os.path.join(self.tmp_dir.name, "index.json")
+        self.write("index.mjs", "import './modules/a'")
+        self.write("modules/a.js", "export const a = 1")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, relative_path, content, mtime_ns=None):
+        path = os.path.join(self.root, relative_path)
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def scan(self):
+        index = SourceIndex(self.index_path)
+        changes = index.scan([self.root])
+        index.save()
+        return changes
+
+    def test_first_scan_adds_everything(self):
+        """Test that all files are reported as added on the first scan."""
+        changes = self.scan()
+        self.assertEqual(len(changes.added), 2)
+        self.assertEqual(changes.changed, [])
+        self.assertEqual(changes.removed, [])
+
+    def test_unchanged_tree(self):
+        """Test that a second scan of an unchanged tree reports nothing."""
+        self.scan()
+        self.assertFalse(self.scan())
+
+    def test_changed_file(self):
+        """Test that a modified file is reported as changed."""
+        self.scan()
+        path = self.write("modules/a.js", "export const a = 2", 10**9)
+        changes = self.scan()
+        self.assertEqual(changes.changed, [path])
+        self.assertEqual(changes.added, [])
+
+    def test_restored_file_with_old_mtime(self):
+        """Test that a file restored with an older mtime is detected."""
+        path = self.write("modules/a.js", "export const a = 1", 2 * 10**9)
+        self.scan()
+        self.write("modules/a.js", "export const a = 3", 10**9)
+        self.assertEqual(self.scan().changed, [path])
+
+    def test_touched_file_is_not_changed(self):
+        """Test that a new mtime without new content is not a change."""
+        self.scan()
+        self.write("modules/a.js", "export const a = 1", 10**9)
+        self.assertFalse(self.scan())
+
+    def test_removed_file(self):
+        """Test that deleted files are reported as removed."""
+        self.scan()
+        path = os.path.join(self.root, "modules", "a.js")
+        os.remove(path)
+        changes = self.scan()
+        self.assertEqual(changes.removed, [path])
+        self.assertEqual(changes.added, [])
+
+    def test_added_file_in_new_dir(self):
+        """Test that files in newly created directories are found."""
+        self.scan()
+        os.makedirs(os.path.join(self.root, "plugins", "x"))
+        path = self.write("plugins/x/b.js", "export const b = 1")
+        self.assertEqual(self.scan().added, [path])
+
+
+if __name__ == "__main__":
+    unittest.main()
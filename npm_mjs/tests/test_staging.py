@@ -0,0 +1,163 @@
+"""
+Tests for the incremental sync of the transpile staging dir.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.source_index import SourceIndex
+from npm_mjs.staging import StagingArea
+from npm_mjs.staging import get_staged_sources
+
+
+class TestStagingArea(unittest.TestCase):
+    """Test that only changed files are copied and gone files removed."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp_dir.name, "static", "js")
+        self.staging_dir = os.path.join(self.tmp_dir.name, "staging")
+        os.makedirs(os.path.join(self.source_dir, "modules"))
+        self.manifest_path = os.path.join(self.tmp_dir.name, "staging.json")
+        self.index = SourceIndex(os.path.join(self.tmp_dir.name, "index.json"))
+        self.write("index.mjs", "import './modules/a'")
+        self.write("modules/a.js", "export const a = 1")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, relative_path, content):
+        with open(os.path.join(self.source_dir, relative_path), "w") as f:
+            f.write(content)
+
+    def sync(self, generated=None, method="auto"):
+        self.index.scan([self.source_dir])
+        files = {
+            os.path.relpath(path, self.source_dir): path for path in self.index.files
+        }
+        staging = StagingArea(self.staging_dir, self.manifest_path, method)
+        staging.sync(files, self.index)
+        for relative_path, content in (generated or {}).items():
+            staging.write_text(relative_path, content)
+        staging.remove_stale()
+        staging.save()
+        self.updated = staging.updated
+        return staging.stats
+
+    def test_initial_sync_copies_everything(self):
+        """Test that all files are copied into an empty staging dir."""
+        stats = self.sync()
+        self.assertEqual(stats.copied, 2)
+        self.assertEqual(stats.skipped, 0)
+        with open(os.path.join(self.staging_dir, "modules", "a.js")) as f:
+            self.assertEqual(f.read(), "export const a = 1")
+
+    def test_unchanged_files_are_skipped(self):
+        """Test that a second sync does not copy anything."""
+        self.sync()
+        stats = self.sync()
+        self.assertEqual(stats.copied, 0)
+        self.assertEqual(stats.skipped, 2)
+        self.assertEqual(stats.bytes_skipped, 38)
+
+    def test_changed_file_is_copied(self):
+        """Test that only the changed file is copied again."""
+        self.sync()
+        self.write("modules/a.js", "export const a = 22")
+        stats = self.sync()
+        self.assertEqual(stats.copied, 1)
+        self.assertEqual(stats.bytes_copied, 19)
+        with open(os.path.join(self.staging_dir, "modules", "a.js")) as f:
+            self.assertEqual(f.read(), "export const a = 22")
+
+    def test_damaged_copies_are_restored(self):
+        """Test that staged files deleted or truncated since are copied again."""
+        self.sync({"plugins/x/index.js": 'export * from "./a"\n'})
+        os.remove(os.path.join(self.staging_dir, "modules", "a.js"))
+        open(os.path.join(self.staging_dir, "index.mjs"), "w").close()
+        os.remove(os.path.join(self.staging_dir, "plugins", "x", "index.js"))
+        stats = self.sync({"plugins/x/index.js": 'export * from "./a"\n'})
+        self.assertEqual(stats.copied, 2)
+        self.assertEqual(
+            self.updated,
+            {"index.mjs", "modules/a.js", "plugins/x/index.js"},
+        )
+        with open(os.path.join(self.staging_dir, "modules", "a.js")) as f:
+            self.assertEqual(f.read(), "export const a = 1")
+
+    def test_removed_file_is_deleted(self):
+        """Test that files gone from the sources are removed from staging."""
+        self.sync()
+        os.remove(os.path.join(self.source_dir, "modules", "a.js"))
+        stats = self.sync()
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.staging_dir, "modules")))
+
+    def test_unknown_files_are_removed_without_manifest(self):
+        """Test that leftovers from older runs are removed on the first sync."""
+        os.makedirs(self.staging_dir)
+        leftover = os.path.join(self.staging_dir, "old.js")
+        with open(leftover, "w") as f:
+            f.write("old")
+        self.sync()
+        self.assertFalse(os.path.exists(leftover))
+
+    def test_generated_files_are_kept(self):
+        """Test that generated files are only written when they change."""
+        self.sync({"plugins/x/index.js": 'export * from "./a"\n'})
+        path = os.path.join(self.staging_dir, "plugins", "x", "index.js")
+        mtime = os.stat(path).st_mtime_ns
+        self.sync({"plugins/x/index.js": 'export * from "./a"\n'})
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+        self.sync()
+        self.assertFalse(os.path.exists(path))
+
+    def test_method_none_does_not_copy(self):
+        """Test that sources are not copied, but changes are still noted."""
+        stats = self.sync({"plugins/x/index.js": 'export * from "./a"\n'}, "none")
+        self.assertEqual(stats.copied, 0)
+        self.assertEqual(
+            os.listdir(self.staging_dir),
+            ["plugins"],
+        )
+        self.write("modules/a.js", "export const a = 22")
+        self.sync(method="none")
+        self.assertEqual(self.updated, {os.path.join("modules", "a.js")})
+
+    def test_switching_method_restages(self):
+        """Test that copies are removed and restored when the method changes."""
+        self.sync()
+        self.sync(method="none")
+        self.assertFalse(os.path.exists(os.path.join(self.staging_dir, "index.mjs")))
+        stats = self.sync()
+        self.assertEqual(stats.copied, 2)
+        self.assertTrue(os.path.exists(os.path.join(self.staging_dir, "index.mjs")))
+
+    def test_staged_sources(self):
+        """Test mapping staged names to real source paths."""
+        link = os.path.join(self.tmp_dir.name, "link")
+        os.symlink(self.source_dir, link)
+        staged_sources = get_staged_sources(
+            self.staging_dir,
+            {"modules/a.js": os.path.join(link, "modules", "a.js")},
+            ["plugins/x/index.js"],
+        )
+        self.assertEqual(
+            staged_sources,
+            {
+                "modules/a.js": os.path.join(
+                    os.path.realpath(self.source_dir),
+                    "modules",
+                    "a.js",
+                ),
+                "plugins/x/index.js": os.path.join(
+                    os.path.realpath(self.staging_dir),
+                    "plugins/x/index.js",
+                ),
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
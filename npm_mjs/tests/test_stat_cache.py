@@ -0,0 +1,84 @@
+"""
+Tests for the in-process cache that is cleared when files change.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from npm_mjs import stat_cache
+from npm_mjs.stat_cache import StatCache
+
+
+class TestStatCache(unittest.TestCase):
+    """Test keeping, evicting and clearing cached values."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "manifest.json")
+        self.write("1")
+        self.calls = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, content):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+    def compute(self, key):
+        self.calls.append(key)
+        return key.upper()
+
+    def test_values_are_computed_once(self):
+        cache = StatCache([self.path], interval=0)
+        self.assertEqual(cache.get("a", self.compute), "A")
+        self.assertEqual(cache.get("a", self.compute), "A")
+        self.assertEqual(self.calls, ["a"])
+
+    def test_oldest_values_are_evicted(self):
+        cache = StatCache([self.path], max_size=2, interval=0)
+        for key in ["a", "b", "c", "b", "a"]:
+            cache.get(key, self.compute)
+        self.assertEqual(self.calls, ["a", "b", "c", "a"])
+        self.assertEqual(len(cache.values), 2)
+
+    def test_change_clears_cache(self):
+        on_change = mock.Mock()
+        cache = StatCache([self.path], interval=0, on_change=on_change)
+        cache.get("a", self.compute)
+        on_change.assert_not_called()
+        # Replacing the file is a change even with the same size and time.
+        stat = os.stat(self.path)
+        self.write("2")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        cache.get("a", self.compute)
+        self.assertEqual(self.calls, ["a", "a"])
+        on_change.assert_called_once_with()
+
+    def test_created_file_clears_cache(self):
+        missing_path = os.path.join(self.tmp_dir.name, "time")
+        cache = StatCache([missing_path], interval=0)
+        cache.get("a", self.compute)
+        with open(missing_path, "w") as f:
+            f.write("1")
+        cache.get("a", self.compute)
+        self.assertEqual(self.calls, ["a", "a"])
+
+    def test_files_are_checked_once_per_interval(self):
+        cache = StatCache([self.path], interval=10)
+        with mock.patch.object(stat_cache.time, "monotonic", return_value=100):
+            cache.get("a", self.compute)
+            self.write("22")
+            cache.get("a", self.compute)
+        self.assertEqual(self.calls, ["a"])
+        with mock.patch.object(stat_cache.time, "monotonic", return_value=110):
+            cache.get("a", self.compute)
+        self.assertEqual(self.calls, ["a", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for the JSON state store shared between processes.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from npm_mjs.state import StateStore
+
+
+def write_values(path, name, count):
+    store = StateStore(path)
+    for number in range(count):
+        store.update({"%s-%d" % (name, number): number})
+
+
+class TestStateStore(unittest.TestCase):
+    """Test reading, writing and batching values."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, ".transpile", "time")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_missing_file(self):
+        self.assertEqual(StateStore(self.path).get("transpile", 0), 0)
+
+    def test_update_is_written_as_json(self):
+        StateStore(self.path).update({"transpile": 1})
+        StateStore(self.path).update({"npm_install": 2})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"transpile": 1, "npm_install": 2})
+
+    def test_reader_sees_replaced_file(self):
+        reader = StateStore(self.path)
+        StateStore(self.path).update({"transpile": 1})
+        self.assertEqual(reader.get("transpile"), 1)
+        StateStore(self.path).update({"transpile": 2})
+        self.assertEqual(reader.get("transpile"), 2)
+
+    def test_batch_writes_once(self):
+        store = StateStore(self.path)
+        with store.batch():
+            store.update({"npm_install": 1})
+            store.update({"transpile": 2})
+            self.assertEqual(store.get("transpile"), 2)
+            self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(StateStore(self.path).get("npm_install"), 1)
+        self.assertEqual(StateStore(self.path).get("transpile"), 2)
+
+    def test_batch_is_written_on_error(self):
+        store = StateStore(self.path)
+        with self.assertRaises(RuntimeError), store.batch():
+            store.update({"npm_install": 1})
+            raise RuntimeError
+        self.assertEqual(StateStore(self.path).get("npm_install"), 1)
+
+    def test_legacy_pickle(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "wb") as f:
+            pickle.dump({"transpile": 5}, f)
+        store = StateStore(self.path)
+        self.assertEqual(store.get("transpile"), 5)
+        store.update({"npm_install": 6})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"transpile": 5, "npm_install": 6})
+
+    def test_invalid_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write("[1, 2")
+        self.assertEqual(StateStore(self.path).get("transpile", 0), 0)
+
+    def test_concurrent_writers_keep_all_values(self):
+        with ProcessPoolExecutor(4) as executor:
+            list(
+                executor.map(
+                    write_values,
+                    [self.path] * 4,
+                    ["a", "b", "c", "d"],
+                    [25] * 4,
+                ),
+            )
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
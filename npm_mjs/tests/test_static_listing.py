@@ -0,0 +1,71 @@
+"""
+Tests for the cached listing of static files.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from npm_mjs import static_listing
+from npm_mjs.static_listing import StaticListing
+
+
+class TestStaticListing(unittest.TestCase):
+    """Test listing static folders and reusing the cached listings."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp_dir.name, "static")
+        self.path = os.path.join(self.tmp_dir.name, "static_listing.json")
+        for name in ["css/a.css", "img/sub/b.png", "img/a.png~", "js/app.mjs"]:
+            self.write(name)
+        # Directories keep the modification times of the first listing, even
+        # if they are changed again within the resolution of the clock.
+        for root, _dirnames, _filenames in os.walk(self.root):
+            os.utime(root, ns=(0, 0))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(name)
+
+    def get_files(self, ignore_patterns=("*~", "js")):
+        listing = StaticListing(self.path, list(ignore_patterns))
+        files = listing.get_files(self.root)
+        listing.save()
+        return sorted(files)
+
+    def test_ignore_patterns(self):
+        """Test that ignored files and folders are left out."""
+        self.assertEqual(self.get_files(), ["css/a.css", "img/sub/b.png"])
+        self.assertEqual(
+            self.get_files(["img/sub/*"]),
+            ["css/a.css", "img/a.png~", "js/app.mjs"],
+        )
+
+    def test_unchanged_folders_are_not_listed(self):
+        """Test that the cached listing is used while no directory changed."""
+        self.get_files()
+        with mock.patch.object(static_listing, "list_dir") as list_dir:
+            self.assertEqual(self.get_files(), ["css/a.css", "img/sub/b.png"])
+        list_dir.assert_not_called()
+
+    def test_added_and_removed_files(self):
+        """Test that files added to or removed from a subfolder are found."""
+        self.get_files()
+        self.write("img/sub/c.png")
+        self.assertEqual(
+            self.get_files(),
+            ["css/a.css", "img/sub/b.png", "img/sub/c.png"],
+        )
+        os.remove(os.path.join(self.root, "css/a.css"))
+        self.assertEqual(self.get_files(), ["img/sub/b.png", "img/sub/c.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
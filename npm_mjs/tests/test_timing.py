@@ -0,0 +1,67 @@
+"""
+Tests for the timing of build phases.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from npm_mjs.timing import BuildTrace
+
+
+class TestBuildTrace(unittest.TestCase):
+    """Test recording phases and writing reports."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_phase_counts(self):
+        """Test that phases are recorded in order with their counts."""
+        trace = BuildTrace()
+        with trace.phase("discovery", files=3) as counts:
+            counts["entries"] = 1
+        with trace.phase("rspack"):
+            pass
+        self.assertEqual([x["name"] for x in trace.phases], ["discovery", "rspack"])
+        self.assertEqual(trace.phases[0]["counts"], {"files": 3, "entries": 1})
+        self.assertLessEqual(
+            trace.phases[0]["start"] + trace.phases[0]["duration"],
+            trace.phases[1]["start"],
+        )
+        self.assertGreaterEqual(trace.duration, trace.phases[1]["start"])
+
+    def test_failed_phase(self):
+        """Test that a phase that raises is still timed."""
+        trace = BuildTrace()
+        with self.assertRaises(ValueError):
+            with trace.phase("staging"):
+                raise ValueError
+        self.assertEqual(len(trace.phases), 1)
+        self.assertGreaterEqual(trace.phases[0]["duration"], 0)
+
+    def test_write_report_and_trace(self):
+        """Test the JSON report and the trace event output."""
+        trace = BuildTrace()
+        with trace.phase("manifest", files=2, bytes=100):
+            pass
+        report_path = os.path.join(self.tmp_dir.name, "report.json")
+        trace_path = os.path.join(self.tmp_dir.name, "trace.json")
+        trace.write_report(report_path)
+        trace.write_trace(trace_path)
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report["phases"][0]["counts"], {"files": 2, "bytes": 100})
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["name"], "manifest")
+        self.assertEqual(events[0]["ph"], "X")
+        self.assertEqual(events[0]["args"], {"files": 2, "bytes": 100})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,415 @@
+"""
+Tests for the transpile command.
+"""
+
+import glob
+import io
+import json
+import os
+import shutil
+import subprocess
+import unittest
+from unittest import mock
+
+from npm_mjs.tests import configure_settings
+
+configure_settings()
+
+from django.core.management.base import CommandError  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from npm_mjs.management.commands import transpile  # noqa: E402
+from npm_mjs.manifest import write_manifest  # noqa: E402
+from npm_mjs.paths import BUILD_STATE_PATH  # noqa: E402
+from npm_mjs.paths import LOCKFILE_PATH  # noqa: E402
+from npm_mjs.paths import MANIFEST_PATH  # noqa: E402
+from npm_mjs.paths import PROJECT_PATH  # noqa: E402
+from npm_mjs.paths import SOURCE_INDEX_PATH  # noqa: E402
+from npm_mjs.paths import STAGED_SOURCES_PATH  # noqa: E402
+from npm_mjs.paths import TRANSPILE_CACHE_PATH  # noqa: E402
+
+TRANSPILE_PATH = os.path.join(PROJECT_PATH, "static-transpile")
+
+# Loads the rspack config with a stand-in for @rspack/core, applies its
+# StagedSourcesPlugin to a stand-in compiler and resolves the requests given
+# as [request, issuer] pairs with it.
+RESOLVE_JS = """
+const Module = require("module")
+const load = Module._load
+Module._load = function (request, ...args) {
+    if (request === "@rspack/core") {
+        return {DefinePlugin: class {}}
+    }
+    return load.call(this, request, ...args)
+}
+const config = require(process.argv[1])
+const hooks = {}
+const tap = name => ({tap: (plugin, callback) => (hooks[name] = callback)})
+config.plugins
+    .find(plugin => plugin.constructor.name === "StagedSourcesPlugin")
+    .apply({hooks: {thisCompilation: tap("compilation"), normalModuleFactory: tap("factory")}})
+hooks.compilation({fileDependencies: new Set()})
+hooks.factory({hooks: {beforeResolve: tap("beforeResolve")}})
+const requests = JSON.parse(process.argv[2]).map(([request, issuer]) => {
+    const data = {request, contextInfo: {issuer}}
+    hooks.beforeResolve(data)
+    return data.request
+})
+console.log(JSON.stringify({modules: config.resolve.modules, requests}))
+"""
+
+
+class Command(transpile.Command):
+    """transpile with a fake rspack that writes one file per entry."""
+
+    def render_rspack_config(self, transpile_vars):
+        self.transpile_vars = transpile_vars
+        return super().render_rspack_config(transpile_vars)
+
+    def run_rspack(self, args, cwd):
+        out_dir = self.transpile_vars["OUT_DIR"]
+        for name in self.transpile_vars["ENTRIES"]:
+            with open(os.path.join(out_dir, name + ".js"), "w") as f:
+                f.write("console.log(%r)" % name)
+        if self.transpile_vars["STATS_PATH"]:
+            with open(self.transpile_vars["STATS_PATH"], "w") as f:
+                json.dump(
+                    {
+                        "entrypoints": {
+                            name: {"assets": [name + ".js"]}
+                            for name in self.transpile_vars["ENTRIES"]
+                        },
+                    },
+                    f,
+                )
+        self.builds += 1
+        return self.returncode
+
+    def finish(self, trace, options, kind, **values):
+        self.kind = kind
+        return super().finish(trace, options, kind, **values)
+
+
+class TestTranspile(unittest.TestCase):
+    """Test when transpile runs rspack and when it can skip it."""
+
+    def setUp(self):
+        self.js_path = os.path.join(PROJECT_PATH, "app", "static", "js")
+        os.makedirs(self.js_path)
+        self.write("main.mjs", 'import "./modules/a"')
+        self.write("modules/a.js", "export const a = 1")
+        self.command = Command()
+        self.command.builds = 0
+        self.command.returncode = 0
+        for target, kwargs in (
+            ("install_npm", {"return_value": False}),
+            ("call", {"side_effect": self.command.run_rspack}),
+        ):
+            patcher = mock.patch.object(transpile, target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            Command,
+            "find_js_paths",
+            return_value=[self.js_path],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        for name in os.listdir(PROJECT_PATH):
+            path = os.path.join(PROJECT_PATH, name)
+            if os.path.islink(path):
+                os.remove(path)
+            else:
+                shutil.rmtree(path)
+
+    def write(self, relative_path, content):
+        path = os.path.join(self.js_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def transpile(self, force=False, strict=False):
+        self.command.transpile(
+            {
+                "force": force,
+                "no_cache": True,
+                "jobs": 1,
+                "verbosity": 0,
+                "trace": None,
+                "strict": strict,
+            },
+        )
+        return self.command.kind
+
+    def test_outputs_intact(self):
+        """Test that missing and changed outputs are noticed."""
+        self.assertEqual(self.transpile(), "full")
+        entries = {"main": "main.mjs"}
+        self.assertTrue(self.command.outputs_intact(TRANSPILE_PATH, entries))
+        self.assertFalse(
+            self.command.outputs_intact(TRANSPILE_PATH, {**entries, "new": "new.mjs"}),
+        )
+        with open(os.path.join(TRANSPILE_PATH, "js", "main.js"), "a") as f:
+            f.write(";")
+        self.assertFalse(self.command.outputs_intact(TRANSPILE_PATH, entries))
+        os.remove(os.path.join(TRANSPILE_PATH, "js", "main.js"))
+        self.assertFalse(self.command.outputs_intact(TRANSPILE_PATH, entries))
+        write_manifest(MANIFEST_PATH, os.path.join(TRANSPILE_PATH, "js/"))
+        self.assertFalse(self.command.outputs_intact(TRANSPILE_PATH, entries))
+
+    def test_unchanged(self):
+        """Test that rspack does not run again if nothing has changed."""
+        self.assertEqual(self.transpile(), "full")
+        self.assertEqual(self.transpile(), "unchanged")
+        self.assertEqual(self.command.builds, 1)
+        os.remove(os.path.join(TRANSPILE_PATH, "js", "main.js"))
+        self.assertEqual(self.transpile(), "full")
+        self.assertEqual(self.transpile(force=True), "full")
+        self.assertEqual(self.command.builds, 3)
+
+    def test_settings_changed(self):
+        """Test that a changed setting is noticed without source changes."""
+        self.assertEqual(self.transpile(), "full")
+        with override_settings(TRANSPILE_SPLIT_CHUNKS=True):
+            self.assertEqual(self.transpile(), "full")
+            self.assertEqual(self.transpile(), "unchanged")
+        with override_settings(TRANSPILE_VERSION="inputs"):
+            self.assertEqual(self.transpile(), "full")
+        self.assertEqual(self.command.builds, 3)
+
+    def test_up_to_date(self):
+        """Test that rspack does not run if the sources are new to the index only."""
+        self.assertEqual(self.transpile(), "full")
+        os.remove(SOURCE_INDEX_PATH)
+        self.assertEqual(self.transpile(), "up-to-date")
+        self.assertEqual(self.transpile(), "unchanged")
+        self.assertEqual(self.command.builds, 1)
+        self.write("modules/a.js", "export const a = 2")
+        self.assertEqual(self.transpile(), "partial")
+        self.assertEqual(self.command.builds, 2)
+
+    def test_strict_budgets(self):
+        """Test that a build over its budgets is neither used nor recorded with --strict."""
+        self.assertEqual(self.transpile(), "full")
+        self.write("modules/a.js", "export const a = 2")
+        with override_settings(TRANSPILE_SIZE_BUDGETS={"main": 1}):
+            for _run in range(2):
+                with self.assertRaises(CommandError):
+                    self.transpile(strict=True)
+                self.assertEqual(self.command.kind, "failed")
+            self.assertEqual(self.command.builds, 3)
+        self.assertEqual(self.transpile(strict=True), "full")
+        self.assertEqual(self.transpile(strict=True), "unchanged")
+
+    def test_print_cache_key(self):
+        """Test that --cache-key prints the key of the build, given a lockfile."""
+        command = Command(stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            command.print_cache_key()
+        os.makedirs(os.path.dirname(LOCKFILE_PATH), exist_ok=True)
+        with open(LOCKFILE_PATH, "w") as f:
+            f.write("lockfileVersion: '9.0'\n")
+        command.print_cache_key()
+        self.assertEqual(self.transpile(), "full")
+        with open(BUILD_STATE_PATH) as f:
+            self.assertEqual(command.stdout.getvalue().strip(), json.load(f)["key"])
+
+    def test_retry_after_failed_build(self):
+        """Test that changes staged by a failed build are built by the next one."""
+        self.assertEqual(self.transpile(), "full")
+        self.write("modules/a.js", "export const a = 2")
+        self.command.returncode = 1
+        self.assertEqual(self.transpile(), "failed")
+        self.command.returncode = 0
+        self.assertEqual(self.transpile(), "full")
+        self.assertEqual(self.command.transpile_vars["ENTRIES"], {"main": mock.ANY})
+
+    def test_removed_module_without_copies(self):
+        """Test that removing an imported module rebuilds all entries in none mode."""
+        self.write("modules/a.js", 'import "./b"')
+        self.write("modules/b.js", "export const b = 1")
+        with override_settings(TRANSPILE_COPY_METHOD="none"):
+            self.assertEqual(self.transpile(), "full")
+            os.remove(os.path.join(self.js_path, "modules", "b.js"))
+            self.assertEqual(self.transpile(), "full")
+            self.assertEqual(self.command.transpile_vars["ENTRIES"], {"main": mock.ANY})
+
+
+@unittest.skipUnless(shutil.which("node"), "node is not installed")
+class TestStagedSources(unittest.TestCase):
+    """Test how the rspack config resolves imports of sources that are not copied."""
+
+    def setUp(self):
+        os.makedirs(TRANSPILE_CACHE_PATH)
+        self.addCleanup(shutil.rmtree, TRANSPILE_CACHE_PATH)
+
+    def test_resolve(self):
+        """Test relative imports, bare imports and the node_modules folder."""
+        command = transpile.Command()
+        with override_settings(TRANSPILE_COPY_METHOD="none"):
+            transpile_vars = command.get_transpile_vars(
+                {"main": os.path.join(TRANSPILE_CACHE_PATH, "js", "main.mjs")},
+                os.path.join(TRANSPILE_PATH, "js/"),
+                1,
+            )
+            config_js = command.render_rspack_config(transpile_vars)
+        config_path = os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.js")
+        with open(config_path, "w") as f:
+            f.write(config_js)
+        with open(STAGED_SOURCES_PATH, "w") as f:
+            json.dump(
+                {
+                    "main.mjs": "/app/js/main.mjs",
+                    "modules/a.js": "/lib/js/modules/a.js",
+                },
+                f,
+            )
+        requests = [
+            [transpile_vars["STAGING_DIR"] + "main.mjs", ""],
+            ["./modules/a", "/app/js/main.mjs"],
+            ["prosemirror-model", "/app/js/main.mjs"],
+        ]
+        result = json.loads(
+            subprocess.check_output(
+                ["node", "-e", RESOLVE_JS, config_path, json.dumps(requests)],
+                text=True,
+            ),
+        )
+        self.assertEqual(
+            result["requests"],
+            ["/app/js/main.mjs", "/lib/js/modules/a.js", "prosemirror-model"],
+        )
+        self.assertEqual(
+            result["modules"],
+            [os.path.join(TRANSPILE_CACHE_PATH, "node_modules"), "node_modules"],
+        )
+
+
+class TestCompiledSuccessfully(unittest.TestCase):
+    """Test which watch mode output counts as a successful rebuild."""
+
+    def test_compiled_successfully(self):
+        """Test that compilations with errors are not successful."""
+        for line in (
+            "Rspack compiled successfully in 85 ms",
+            "\x1b[32mRspack compiled\x1b[39m \x1b[32msuccessfully\x1b[39m in 1.2 s",
+            "Rspack compiled with 2 warnings in 90 ms",
+        ):
+            self.assertTrue(transpile.compiled_successfully(line), line)
+        for line in (
+            "Rspack compiled with 1 error in 40 ms",
+            "Rspack compiled with 1 error and 1 warning in 40 ms",
+            "Module not found: ./compiled",
+        ):
+            self.assertFalse(transpile.compiled_successfully(line), line)
+
+
+class TestSplitEntries(unittest.TestCase):
+    """Test that entries are split into groups of about the same size."""
+
+    def test_sizes(self):
+        """Test that the largest entries are spread over the groups first."""
+        entries = {x: x + ".mjs" for x in "abcde"}
+        sizes = {"a": 50, "b": 40, "c": 30, "d": 20, "e": 10}
+        shards = transpile.split_entries(entries, sizes, 2)
+        self.assertEqual([sorted(x) for x in shards], [["a", "d", "e"], ["b", "c"]])
+        self.assertEqual(shards[0]["a"], "a.mjs")
+
+    def test_unknown_sizes(self):
+        """Test that entries without a size are given the average size."""
+        entries = {x: x + ".mjs" for x in "abcd"}
+        shards = transpile.split_entries(entries, {"a": 90, "b": 10}, 2)
+        self.assertEqual([sorted(x) for x in shards], [["a", "b"], ["c", "d"]])
+        shards = transpile.split_entries(entries, {}, 2)
+        self.assertEqual([len(x) for x in shards], [2, 2])
+
+    def test_more_jobs_than_entries(self):
+        """Test that there is no empty group and that one entry stays alone."""
+        entries = {"a": "a.mjs", "b": "b.mjs"}
+        self.assertEqual(
+            transpile.split_entries(entries, {}, 8),
+            [{"a": "a.mjs"}, {"b": "b.mjs"}],
+        )
+        self.assertEqual(
+            transpile.split_entries({"a": "a.mjs"}, {"a": 5}, 4),
+            [{"a": "a.mjs"}],
+        )
+        self.assertEqual(transpile.split_entries(entries, {}, 0), [entries])
+
+
+class Process:
+    """Stands in for an rspack process that has already exited."""
+
+    def __init__(self, args, cwd):
+        self.args = args
+
+    def poll(self):
+        return 1 if self.args[-1].endswith("-2.js") else 0
+
+
+class TestRunShards(unittest.TestCase):
+    """Test the configs that the rspack processes of a sharded build get."""
+
+    def setUp(self):
+        os.makedirs(TRANSPILE_CACHE_PATH)
+        self.command = Command(stdout=open(os.devnull, "w"))
+        self.addCleanup(self.command.stdout.close)
+        self.command.rendered = []
+        patcher = mock.patch.object(
+            Command,
+            "render_rspack_config",
+            side_effect=lambda x: self.command.rendered.append(x) or "",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(transpile.subprocess, "Popen", Process)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(TRANSPILE_CACHE_PATH)
+
+    def test_run_shards(self):
+        """Test the config files and the names of the files of every shard."""
+        old_config_path = os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.shard-3.js")
+        open(old_config_path, "w").close()
+        cache_dir = os.path.join(TRANSPILE_CACHE_PATH, "rspack-cache", "default")
+        returncode = self.command.run_shards(
+            {
+                "VERSION": 7,
+                "ENTRIES": {"a": "a.mjs", "b": "b.mjs"},
+                "STATS_PATH": os.path.join(TRANSPILE_CACHE_PATH, "stats.json"),
+                "CACHE_DIR": cache_dir,
+            },
+            [{"a": "a.mjs"}, {"b": "b.mjs"}],
+        )
+        self.assertEqual(returncode, 1)
+        self.assertEqual(
+            sorted(glob.glob(os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.*"))),
+            [
+                os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.shard-1.js"),
+                os.path.join(TRANSPILE_CACHE_PATH, "rspack.config.shard-2.js"),
+            ],
+        )
+        first, second = self.command.rendered
+        self.assertEqual(first["ENTRIES"], {"a": "a.mjs"})
+        self.assertEqual(second["ENTRIES"], {"b": "b.mjs"})
+        self.assertNotEqual(first["UNIQUE_NAME"], second["UNIQUE_NAME"])
+        self.assertEqual(second["CHUNK_PREFIX"], "7-2")
+        for name in ("entrypoints", "lazy_chunks", "cache_stats", "stats"):
+            path_name = (name + "_path").upper()
+            self.assertEqual(
+                os.path.basename(second[path_name]),
+                name + ".shard-2.json",
+            )
+        self.assertEqual(
+            second["CACHE_DIR"],
+            os.path.join(TRANSPILE_CACHE_PATH, "rspack-cache", "shard-2"),
+        )
+        self.assertTrue(os.path.isdir(second["CACHE_DIR"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests for the file helpers shared by the transpile modules.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import unittest
+
+from npm_mjs.utils import FILE_MODE
+from npm_mjs.utils import copy_file
+from npm_mjs.utils import hash_file
+from npm_mjs.utils import write_json_atomic
+
+
+class TestWriteJsonAtomic(unittest.TestCase):
+    """Test the atomic JSON writer."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "data.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write(self):
+        """Test that the data is written with the permissions of a new file."""
+        write_json_atomic(self.path, {"a": 1})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"a": 1})
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), FILE_MODE)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["data.json"])
+
+    def test_failed_write(self):
+        """Test that a failed write keeps the old file and no temporary one."""
+        write_json_atomic(self.path, {"a": 1})
+        with self.assertRaises(TypeError):
+            write_json_atomic(self.path, {"a": object()})
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"a": 1})
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["data.json"])
+
+
+class TestHashFile(unittest.TestCase):
+    """Test the content hash of files."""
+
+    def test_hash(self):
+        """Test that the hash is the MD5 digest of the content."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "a.js")
+            with open(path, "wb") as f:
+                f.write(b"export default 1")
+            self.assertEqual(
+                hash_file(path),
+                hashlib.md5(b"export default 1").hexdigest(),
+            )
+
+
+class TestCopyFile(unittest.TestCase):
+    """Test the copy helper with all methods."""
+
+    def test_methods(self):
+        """Test that every method produces an identical copy."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src = os.path.join(tmp_dir, "src.js")
+            with open(src, "w") as f:
+                f.write("export default 1")
+            for method in ("auto", "link", "copy"):
+                dst = os.path.join(tmp_dir, "%s.js" % method)
+                copy_file(src, dst, method)
+                with open(dst) as f:
+                    self.assertEqual(f.read(), "export default 1")
+            self.assertEqual(
+                stat.S_IMODE(os.stat(os.path.join(tmp_dir, "copy.js")).st_mode),
+                FILE_MODE,
+            )
+            self.assertEqual(len(os.listdir(tmp_dir)), 4)
+
+    def test_existing_hardlink_is_not_written_through(self):
+        """Test that replacing a hardlinked copy leaves the old source alone."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            old_src = os.path.join(tmp_dir, "old.js")
+            new_src = os.path.join(tmp_dir, "new.js")
+            dst = os.path.join(tmp_dir, "dst.js")
+            with open(old_src, "w") as f:
+                f.write("old")
+            with open(new_src, "w") as f:
+                f.write("new")
+            copy_file(old_src, dst, "link")
+            copy_file(new_src, dst, "copy")
+            with open(old_src) as f:
+                self.assertEqual(f.read(), "old")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for content-derived transpile versions.
+"""
+
+import os
+import tempfile
+import unittest
+
+from npm_mjs.versioning import VERSION_PLACEHOLDER
+from npm_mjs.versioning import apply_version
+from npm_mjs.versioning import get_key_version
+from npm_mjs.versioning import get_output_version
+
+P = str(VERSION_PLACEHOLDER)
+
+
+class TestVersioning(unittest.TestCase):
+    """Test hashing outputs and replacing the placeholder."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.out_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, relative_path, content):
+        with open(os.path.join(self.out_dir, relative_path), "w") as f:
+            f.write(content)
+
+    def read(self, relative_path):
+        with open(os.path.join(self.out_dir, relative_path)) as f:
+            return f.read()
+
+    def build(self, content="a"):
+        """Write outputs like a build that used the placeholder."""
+        self.write("index.js", f'load("{P}-1.js?v={P}")')
+        self.write(P + "-1.js", content)
+
+    def test_key_version_is_exact_in_javascript(self):
+        """Test that versions stay below 2 ** 53."""
+        self.assertLess(get_key_version("f" * 64), 2**53)
+
+    def test_identical_outputs_keep_version(self):
+        """Test that the version only depends on the outputs."""
+        self.build()
+        version = get_output_version(self.out_dir)
+        self.assertEqual(get_output_version(self.out_dir), version)
+        self.build("b")
+        self.assertNotEqual(get_output_version(self.out_dir), version)
+
+    def test_apply_version(self):
+        """Test that the placeholder is replaced in names and contents."""
+        self.build()
+        version = get_output_version(self.out_dir)
+        apply_version(self.out_dir, version)
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)),
+            ["%s-1.js" % version, "index.js"],
+        )
+        self.assertEqual(
+            self.read("index.js"),
+            f'load("{version}-1.js?v={version}")',
+        )
+
+    def test_partial_build(self):
+        """Test that a partial build with identical outputs keeps the version."""
+        self.build()
+        version = get_output_version(self.out_dir)
+        apply_version(self.out_dir, version)
+        # Only the chunk is built again, with the same content.
+        self.write(P + "-1.js", "a")
+        self.assertEqual(get_output_version(self.out_dir, version), version)
+        apply_version(self.out_dir, version, version)
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)),
+            ["%s-1.js" % version, "index.js"],
+        )
+        # The chunk changes, so the old copy is replaced.
+        self.write(P + "-1.js", "b")
+        new_version = get_output_version(self.out_dir, version)
+        self.assertNotEqual(new_version, version)
+        apply_version(self.out_dir, new_version, version)
+        self.assertEqual(
+            sorted(os.listdir(self.out_dir)),
+            ["%s-1.js" % new_version, "index.js"],
+        )
+        self.assertEqual(self.read("%s-1.js" % new_version), "b")
+        self.assertIn("%s-1.js" % new_version, self.read("index.js"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for the file system watchers of transpile --watch.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+from npm_mjs.watch import InotifyWatcher
+from npm_mjs.watch import PollingWatcher
+from npm_mjs.watch import wait_for_changes
+
+
+class WatcherTestMixin:
+    """Tests that are run for every watcher."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.js_dir = os.path.join(self.tmp_dir.name, "static", "js")
+        os.makedirs(self.js_dir)
+        self.package_file = os.path.join(self.tmp_dir.name, "package.json5")
+        self.watcher = self.create_watcher([self.js_dir], [self.package_file])
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content="export default 1"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def test_timeout_without_changes(self):
+        """Test that wait returns nothing when nothing changes."""
+        self.assertEqual(self.watcher.wait(0.1), set())
+
+    def test_new_file(self):
+        """Test that a new file in a watched folder is reported."""
+        path = os.path.join(self.js_dir, "index.mjs")
+        self.write(path)
+        self.assertIn(path, self.watcher.wait(2))
+
+    def test_new_file_in_new_folder(self):
+        """Test that files in folders created after the start are reported."""
+        dir_path = os.path.join(self.js_dir, "modules")
+        os.makedirs(dir_path)
+        self.watcher.wait(2)
+        path = os.path.join(dir_path, "a.js")
+        self.write(path)
+        self.assertIn(path, self.watcher.wait(2))
+
+    def test_single_file(self):
+        """Test that a single file is reported when it is created."""
+        self.write(self.package_file, "{}")
+        self.assertIn(self.package_file, self.watcher.wait(2))
+
+    def test_debounce(self):
+        """Test that a burst of changes is reported at once."""
+        paths = [os.path.join(self.js_dir, "%d.js" % i) for i in range(3)]
+
+        def write_all():
+            for path in paths:
+                self.write(path)
+
+        timer = threading.Timer(0.05, write_all)
+        timer.start()
+        changed = wait_for_changes(self.watcher, 0.6)
+        timer.join()
+        self.assertTrue(set(paths) <= changed)
+
+
+class TestPollingWatcher(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self, dirs, files):
+        return PollingWatcher(dirs, files, interval=0.05)
+
+    def write(self, path, content="export default 1"):
+        super().write(path, content)
+        # Make sure that the mtime differs even on coarse file systems.
+        os.utime(path, ns=(0, 0))
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify requires Linux")
+class TestInotifyWatcher(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self, dirs, files):
+        return InotifyWatcher(dirs, files)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Timing of the phases of a transpile run.
+
+Every phase records when it started, how long it took and what it processed,
+such as the number of files and bytes. The result can be written as a JSON
+report and in the trace event format that chrome://tracing and Perfetto
+load.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from .utils import write_json_atomic
+
+
+class BuildTrace:
+    """
+    Usage::
+        trace = BuildTrace()
+        with trace.phase("staging") as counts:
+            ...
+            counts["files"] = 12
+        trace.write_report(path)
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.phases: list[dict] = []
+        # Further results of the run for the report, by name
+        self.results: dict = {}
+
+    @contextmanager
+    def phase(self, name: str, **counts):
+        """Time the code in the with block as phase name."""
+        phase = {
+            "name": name,
+            "start": time.perf_counter() - self.start,
+            "duration": 0.0,
+            "counts": counts,
+        }
+        self.phases.append(phase)
+        try:
+            yield counts
+        finally:
+            phase["duration"] = time.perf_counter() - self.start - phase["start"]
+
+    @property
+    def duration(self) -> float:
+        return time.perf_counter() - self.start
+
+    def get_report(self) -> dict:
+        return {
+            "started": self.started,
+            "duration": self.duration,
+            "phases": self.phases,
+            **self.results,
+        }
+
+    def get_trace_events(self) -> dict:
+        """Return the phases in the Chrome trace event format."""
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": phase["name"],
+                    "cat": "transpile",
+                    "ph": "X",
+                    "ts": round(phase["start"] * 1e6),
+                    "dur": round(phase["duration"] * 1e6),
+                    "pid": pid,
+                    "tid": 1,
+                    "args": phase["counts"],
+                }
+                for phase in self.phases
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write_report(self, path: str) -> None:
+        write_json_atomic(path, self.get_report())
+
+    def write_trace(self, path: str) -> None:
+        write_json_atomic(path, self.get_trace_events())
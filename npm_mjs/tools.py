@@ -1,31 +1,17 @@
-import pickle
-
 from .paths import TRANSPILE_TIME_PATH
+from .state import StateStore
 
-_last_run = {}
-
-
-def load_last_name():
-    global _last_run
-    try:
-        with open(TRANSPILE_TIME_PATH, "rb") as f:
-            _last_run = {**_last_run, **pickle.load(f)}
-    except (EOFError, OSError, TypeError):
-        pass
+_last_run = StateStore(TRANSPILE_TIME_PATH)
 
 
 def get_last_run(name):
-    global _last_run
-    if name not in _last_run:
-        load_last_name()
-        if name not in _last_run:
-            return 0
-    return _last_run[name]
+    return _last_run.get(name, 0)
 
 
 def set_last_run(name, timestamp):
-    global _last_run
-    load_last_name()
-    _last_run[name] = timestamp
-    with open(TRANSPILE_TIME_PATH, "wb") as f:
-        pickle.dump(_last_run, f)
+    _last_run.update({name: timestamp})
+
+
+def batch_last_runs():
+    # The times set within the block are written at once at its end.
+    return _last_run.batch()
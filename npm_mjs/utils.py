@@ -0,0 +1,150 @@
+"""
+File helpers shared by the transpile modules.
+
+Files are replaced atomically: the new content is written to a temporary
+file in the same folder, which is then renamed over the destination. The
+temporary names come from tempfile, so that concurrent writers never share
+one, not even threads of the same process.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# ioctl request number to clone a file on Linux (btrfs, XFS, ...).
+FICLONE = 0x40049409
+
+# mkstemp and mkdtemp create files that only the owner can read. Outputs are
+# served by the web server, so temporary files and folders get the
+# permissions of new ones.
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+DIR_MODE = 0o777 & ~_umask
+
+
+def make_temp_file(path: str) -> str:
+    """
+    Create an empty temporary file next to path and return its path.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path),
+        prefix=os.path.basename(path) + ".",
+        suffix=".tmp",
+    )
+    os.close(fd)
+    os.chmod(tmp_path, FILE_MODE)
+    return tmp_path
+
+
+def make_temp_dir(path: str) -> str:
+    """
+    Create an empty temporary folder next to path and return its path.
+    """
+    tmp_path = tempfile.mkdtemp(
+        dir=os.path.dirname(path),
+        prefix=os.path.basename(path) + ".",
+        suffix=".tmp",
+    )
+    os.chmod(tmp_path, DIR_MODE)
+    return tmp_path
+
+
+@contextmanager
+def replacing(path: str):
+    """
+    Yield the path of a new temporary file next to path, which replaces path
+    when the block finishes and is removed if the block fails.
+
+    Usage::
+        with replacing(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+    """
+    tmp_path = make_temp_file(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def hash_file(path: str) -> str:
+    """Return the hex digest of the content of the file at path."""
+    hash_md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write data as JSON to path by writing a temporary file and renaming it."""
+    with replacing(path) as tmp_path:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+
+
+def _reflink(src_fd, dst_fd):
+    import fcntl
+
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    copied = 0
+    while copied < size:
+        count = os.copy_file_range(src_fd, dst_fd, size - copied)
+        if count == 0:
+            break
+        copied += count
+    if copied < size:
+        raise OSError(errno.EIO, "copy_file_range stopped early")
+
+
+def _copy_to(src: str, tmp_dst: str, method: str) -> str:
+    if method == "link":
+        try:
+            # The temporary file only reserves the name.
+            os.remove(tmp_dst)
+            os.link(src, tmp_dst)
+            return "link"
+        except OSError:
+            pass
+    elif method == "auto" and sys.platform.startswith("linux"):
+        for technique in ("reflink", "copy_file_range"):
+            try:
+                with open(src, "rb") as fsrc, open(tmp_dst, "wb") as fdst:
+                    if technique == "reflink":
+                        _reflink(fsrc.fileno(), fdst.fileno())
+                    else:
+                        size = os.fstat(fsrc.fileno()).st_size
+                        _copy_file_range(fsrc.fileno(), fdst.fileno(), size)
+                return technique
+            except (OSError, AttributeError):
+                continue
+    shutil.copyfile(src, tmp_dst)
+    return "copy"
+
+
+def copy_file(src: str, dst: str, method: str = "auto") -> str:
+    """
+    Copy src to dst and return the technique that was used.
+
+    With method "link" a hardlink is created if possible. With "auto" a
+    reflink is tried first and then copy_file_range, both of which avoid
+    moving the data through userspace. "copy" and all failed attempts fall
+    back to shutil.copyfile. The destination is replaced atomically, so an
+    existing hardlink never gets written through.
+    """
+    with replacing(dst) as tmp_dst:
+        return _copy_to(src, tmp_dst, method)
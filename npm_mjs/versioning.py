@@ -0,0 +1,130 @@
+"""
+Content-derived versions for transpile outputs.
+
+By default, the version of a transpile run is the time at which it started.
+With the TRANSPILE_VERSION setting, it can instead be derived from the build
+inputs or from the generated outputs, so that a build with identical results
+keeps the version, chunk file names and ?v= query strings of the previous
+one.
+
+The version is embedded in the outputs, so an output-derived version cannot
+be known when rspack starts. The build therefore runs with VERSION_PLACEHOLDER,
+which is replaced in the names and contents of the output files once the
+outputs have been hashed.
+"""
+
+import hashlib
+import os
+
+from .compression import SIDECAR_EXTENSIONS
+from .utils import replacing
+
+VERSION_MODES = ("time", "inputs", "outputs")
+
+# An integer that is unlikely to appear in any output by chance. It has no
+# trailing zeros, so that minifiers do not rewrite it in exponent notation,
+# and it stays below 2 ** 53, so JavaScript represents it exactly.
+VERSION_PLACEHOLDER = 8642097531864209
+
+
+def get_key_version(key: str) -> int:
+    """
+    Return a version for a hex digest. 52 bits are used, so that the version
+    is represented exactly as a JavaScript number.
+    """
+    return int(key[:13], 16)
+
+
+def replace_all(value, replacements):
+    for old, new in replacements:
+        if isinstance(value, bytes):
+            value = value.replace(old.encode(), new.encode())
+        else:
+            value = value.replace(old, new)
+    return value
+
+
+def get_output_files(
+    out_dir: str,
+    previous_version: int | None = None,
+) -> tuple[dict[str, str], list[str]]:
+    """
+    Return the files of out_dir by their name with the placeholder in place
+    of previous_version, and the files that are outdated because a file of
+    the last build has the same name.
+    """
+    replacements = []
+    if previous_version is not None:
+        replacements.append((str(previous_version), str(VERSION_PLACEHOLDER)))
+    files = {}
+    outdated = []
+    for root, _dirnames, filenames in os.walk(out_dir):
+        for filename in filenames:
+            if filename.endswith(SIDECAR_EXTENSIONS):
+                # Compressed copies are written once the version is final.
+                continue
+            relative_path = os.path.relpath(os.path.join(root, filename), out_dir)
+            name = replace_all(relative_path, replacements)
+            if name not in files:
+                files[name] = relative_path
+            elif name == relative_path:
+                # The file of the last build has the placeholder in its name.
+                outdated.append(files[name])
+                files[name] = relative_path
+            else:
+                outdated.append(relative_path)
+    return files, outdated
+
+
+def get_output_version(out_dir: str, previous_version: int | None = None) -> int:
+    """
+    Return a version for the contents of out_dir. Files that still contain
+    previous_version instead of the placeholder, because they were not part
+    of the last build, are hashed as if they contained the placeholder.
+    """
+    replacements = []
+    if previous_version is not None:
+        replacements.append((str(previous_version), str(VERSION_PLACEHOLDER)))
+    files, _outdated = get_output_files(out_dir, previous_version)
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        with open(os.path.join(out_dir, files[name]), "rb") as f:
+            data = f.read()
+        digest.update(name.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(replace_all(data, replacements)).digest())
+    return get_key_version(digest.hexdigest())
+
+
+def apply_version(
+    out_dir: str,
+    version: int,
+    previous_version: int | None = None,
+) -> int:
+    """
+    Replace the placeholder and previous_version with version in the names
+    and contents of all files in out_dir. Outdated files whose name would
+    collide with a file of the last build are removed. Returns the number of
+    files that were changed.
+    """
+    replacements = [(str(VERSION_PLACEHOLDER), str(version))]
+    if previous_version is not None and previous_version != version:
+        replacements.append((str(previous_version), str(version)))
+    files, outdated = get_output_files(out_dir, previous_version)
+    for relative_path in outdated:
+        os.remove(os.path.join(out_dir, relative_path))
+    changed = 0
+    for relative_path in files.values():
+        path = os.path.join(out_dir, relative_path)
+        new_path = os.path.join(out_dir, replace_all(relative_path, replacements))
+        with open(path, "rb") as f:
+            data = f.read()
+        new_data = replace_all(data, replacements)
+        if new_data == data and new_path == path:
+            continue
+        with replacing(new_path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(new_data)
+        if new_path != path:
+            os.remove(path)
+        changed += 1
+    return changed
@@ -0,0 +1,224 @@
+"""
+File system watchers used by ./manage.py transpile --watch.
+
+On Linux, changes are reported through inotify. Everywhere else, and if
+inotify cannot be used, the watched folders are polled.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+IGNORED_DIRS = {"__pycache__", "node_modules", ".git"}
+
+
+def is_ignored(path: str) -> bool:
+    return any(x in IGNORED_DIRS for x in path.split(os.sep))
+
+
+class PollingWatcher:
+    """
+    Detect changes by comparing the size and mtime of all watched files.
+
+    Args:
+        dirs: Folders that are watched recursively
+        files: Single files that are watched, whether they exist or not
+        interval: Seconds between two polls
+    """
+
+    def __init__(self, dirs: list[str], files: list[str], interval: float = 0.5):
+        self.dirs = dirs
+        self.files = files
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        paths = list(self.files)
+        for dir_path in self.dirs:
+            for root, dirnames, filenames in os.walk(dir_path):
+                dirnames[:] = [x for x in dirnames if x not in IGNORED_DIRS]
+                paths += [os.path.join(root, x) for x in filenames]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout: float | None = None) -> set[str]:
+        """
+        Block until a change is detected or timeout seconds have passed.
+        Returns the changed paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._snapshot()
+            changed = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return changed
+                time.sleep(min(self.interval, remaining))
+            else:
+                time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Detect changes with the inotify API of the Linux kernel.
+
+    Args:
+        dirs: Folders that are watched recursively
+        files: Single files that are watched. Their parent folders are
+            watched so that files that are replaced or created are noticed.
+    """
+
+    def __init__(self, dirs: list[str], files: list[str]):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> (dir path, recursive)
+        self.watches: dict[int, tuple[str, bool]] = {}
+        self.files = set(files)
+        for dir_path in dirs:
+            self._add_tree(dir_path)
+        for dir_path in {os.path.dirname(x) for x in files}:
+            self._add_watch(dir_path, False)
+
+    def _add_watch(self, dir_path: str, recursive: bool) -> None:
+        wd = self.libc.inotify_add_watch(
+            self.fd,
+            os.fsencode(dir_path),
+            WATCH_MASK,
+        )
+        if wd >= 0:
+            # A folder may be watched both recursively and for single files.
+            recursive = recursive or self.watches.get(wd, ("", False))[1]
+            self.watches[wd] = (dir_path, recursive)
+
+    def _add_tree(self, dir_path: str) -> None:
+        for root, dirnames, _filenames in os.walk(dir_path):
+            dirnames[:] = [x for x in dirnames if x not in IGNORED_DIRS]
+            self._add_watch(root, True)
+
+    def _read_events(self) -> set[str]:
+        changed = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            end = offset + length
+            name = os.fsdecode(data[offset:end].rstrip(b"\0"))
+            offset = end
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, report every watched folder.
+                changed.update(x[0] for x in self.watches.values())
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            dir_path, recursive = self.watches[wd]
+            path = os.path.join(dir_path, name) if name else dir_path
+            if is_ignored(path):
+                continue
+            if not recursive and path not in self.files:
+                continue
+            changed.add(path)
+            if recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+        return changed
+
+    def wait(self, timeout: float | None = None) -> set[str]:
+        """
+        Block until a change is detected or timeout seconds have passed.
+        Returns the changed paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return set()
+            readable, _w, _x = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return set()
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(dirs: list[str], files: list[str], polling: bool = False):
+    """
+    Return an InotifyWatcher where possible and a PollingWatcher otherwise.
+    """
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs, files)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(dirs, files)
+
+
+def wait_for_changes(watcher, debounce: float) -> set[str]:
+    """
+    Block until something changes and then collect further changes until
+    nothing has changed for debounce seconds.
+    """
+    changed = watcher.wait()
+    while True:
+        more = watcher.wait(debounce)
+        if not more:
+            return changed
+        changed |= more